@@ -1,89 +1,263 @@
 import os
-import shutil
-import tempfile
+import time
+from functools import partial
+from concurrent.futures.process import BrokenProcessPool
 import streamlit as st
-from funciones_asistencia import generar_asistencia
-from funciones_op1 import generar_op1
-from funciones_op2 import generar_op2
-from openpyxl import load_workbook
-import io
+# Los generadores (pandas / openpyxl) se importan al usarlos, no al arrancar
+from funciones_artefactos import (
+    clave_combinada, existe_artefacto, leer_artefacto, ruta_artefacto, ruta_existente,
+)
+from funciones_clasificacion import clasificar_archivos, fragmentos
+from funciones_cola import enviar_combinacion, enviar_precarga, enviar_reporte, obtener_cola, texto_estado
+from funciones_errores import ErrorReporte
+from funciones_paralelo import REPORTES, esperar_precarga, lanzar_precarga, precalentar, reportes_disponibles
+from funciones_plantilla import obtener_plantilla
 
 # ---------------- CONFIGURACIÓN ---------------- #
 st.set_page_config(page_title="Sistema PE", layout="wide")
 
-# Variables de sesión
+# Variables de sesión (los reportes se guardan como clave del almacén de artefactos)
 for key in ["asistencia_generada", "op1_generada", "op2_generada"]:
     if key not in st.session_state:
         st.session_state[key] = None
+for key in ["mediciones", "detalles", "precarga", "trabajos"]:
+    if key not in st.session_state:
+        st.session_state[key] = {}
 
 # Plantilla base
 PLANTILLA_PATH = os.path.join("plantillas", "PE3 - Reporte.xlsx")
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_DATOS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet", "json": "application/json"}
+
+# Leer los archivos en el pool apenas se suben (PE_PRECARGAR=0 lo desactiva)
+PRECARGAR = os.environ.get("PE_PRECARGAR", "1") != "0"
+
+# Cada cuánto se refresca el estado de los trabajos en la cola (segundos)
+INTERVALO_ESTADO = 0.5
 
 
 # ---------------- FUNCIONES AUXILIARES ---------------- #
-def get_temp_copy():
-    """Crea una copia temporal de la plantilla PE3 - Reporte.xlsx."""
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-    shutil.copyfile(PLANTILLA_PATH, tmp.name)
-    return tmp.name
-
-
-def clasificar_archivos(lista_archivos):
-    """Clasifica los archivos según su nombre."""
-    resultado = {
-        "asc": None, "nom": None, "acc": None,
-        "asc_inst": None, "nom_inst": None, "acc_inst": None,
-        "asc_fa": None, "acc_fa": None,
-    }
-
-    for file in lista_archivos:
-        nombre = file.name.upper().replace(" ", "")
-        if "POSTULANTE" in nombre:
-            if "ASC" in nombre:
-                resultado["asc"] = file
-            elif "NOM" in nombre:
-                resultado["nom"] = file
-            elif "ACC" in nombre:
-                resultado["acc"] = file
-        elif "INSTRUMENTO" in nombre:
-            if "ASC" in nombre:
-                resultado["asc_inst"] = file
-            elif "NOM" in nombre:
-                resultado["nom_inst"] = file
-            elif "ACC" in nombre:
-                resultado["acc_inst"] = file
-        elif "FA" in nombre:
-            if "ASC" in nombre:
-                resultado["asc_fa"] = file
-            elif "ACC" in nombre:
-                resultado["acc_fa"] = file
-    return resultado
-
-
-def combinar_reportes(plantilla_path, asistencia, op1, op2):
-    """Combina los tres reportes (Asistencia, OP1, OP2) en una sola plantilla Excel."""
-    wb_final = load_workbook(plantilla_path)
-
-    wb_a = load_workbook(asistencia)
-    wb_op1 = load_workbook(op1)
-    wb_op2 = load_workbook(op2)
-
-    # Copiar cada hoja de los reportes al archivo final
-    for workbook in [wb_a, wb_op1, wb_op2]:
-        for ws_name in workbook.sheetnames:
-            ws = workbook[ws_name]
-            if ws_name not in wb_final.sheetnames:
-                target = wb_final.create_sheet(ws_name)
-            else:
-                target = wb_final[ws_name]
-            for r_idx, row in enumerate(ws.iter_rows(values_only=True), 1):
-                for c_idx, value in enumerate(row, 1):
-                    target.cell(row=r_idx, column=c_idx, value=value)
-
-    output = io.BytesIO()
-    wb_final.save(output)
-    output.seek(0)
-    return output
+def obtener_ejecutor():
+    """Pool de procesos de la cola de trabajos, compartido por todas las sesiones."""
+    return obtener_cola().ejecutor()
+
+
+@st.cache_resource
+def precalentar_servidor():
+    """
+    Una vez por servidor, en segundo plano: importa los generadores, separa la
+    plantilla por hoja y arranca el pool. Se desactiva con PE_PRECALENTAR=0.
+    """
+    return precalentar(PLANTILLA_PATH, obtener_ejecutor())
+
+
+def precargar(clasificados):
+    """Encola (una sola vez por archivo) la lectura en segundo plano de los archivos clasificados."""
+    try:
+        st.session_state["precarga"] = lanzar_precarga(enviar_precarga, clasificados, st.session_state["precarga"])
+    except BrokenProcessPool:
+        obtener_cola().descartar_ejecutor()
+        st.session_state["precarga"] = {}
+
+
+def esperar_archivos(claves=None):
+    """Antes de generar: espera que termine la lectura en segundo plano de esos archivos."""
+    trabajos = st.session_state["precarga"]
+    if any(not t.listo.is_set() for (clave, *_), t in trabajos.items() if claves is None or clave in claves):
+        with st.spinner("📖 Terminando de leer los archivos..."):
+            esperar_precarga(trabajos, claves)
+
+
+def estado_precarga(clave, archivo):
+    """Texto con el avance de la lectura de un archivo."""
+    trabajo = st.session_state["precarga"].get((clave, archivo.name, getattr(archivo, "file_id", None)))
+    if trabajo is None:
+        return ""
+    if not trabajo.listo.is_set():
+        return f"⏳ {texto_estado(obtener_cola().estado(trabajo))}"
+    if trabajo.error is not None:
+        return "⚠️ no se pudo leer (se reintentará al generar)"
+    filas, segundos = trabajo.resultado
+    return f"📖 leído en {segundos} s ({filas} grupos)"
+
+
+def panel_archivos(clasificados):
+    """Archivos detectados con el avance de su lectura; se refresca solo mientras haya lecturas pendientes."""
+    pendientes = any(not t.listo.is_set() for t in st.session_state["precarga"].values())
+
+    def panel():
+        cols = st.columns(3)
+        for i, (k, v) in enumerate(clasificados.items()):
+            if v:
+                partes = fragmentos(v)
+                titulo = f"✅ **{k.upper()}**" + (f" ({len(partes)} fragmentos)" if len(partes) > 1 else "")
+                lineas = "".join(f"<br><small>{f.name}</small><br><small>{estado_precarga(k, f)}</small>" for f in partes)
+                with cols[i % 3]:
+                    st.markdown(titulo + lineas, unsafe_allow_html=True)
+        if pendientes and not any(not t.listo.is_set() for t in st.session_state["precarga"].values()):
+            st.rerun()  # terminó la última lectura: deja de refrescar
+
+    st.fragment(panel, run_every=1 if pendientes else None)()
+
+
+def seguir_trabajos(trabajos):
+    """
+    Muestra un st.status por trabajo ({hoja: trabajo}) con su posición en la
+    cola y su avance, y vuelve cuando terminaron todos. Devuelve los st.status.
+    """
+    cola = obtener_cola()
+    cajas = {hoja: st.status(f"{hoja}: en cola...", state="running") for hoja in trabajos}
+    barras = {hoja: cajas[hoja].progress(0.0) for hoja in trabajos}
+    pendientes = dict(trabajos)
+    while pendientes:
+        for hoja, trabajo in list(pendientes.items()):
+            estado = cola.estado(trabajo)
+            if trabajo.listo.is_set():
+                del pendientes[hoja]
+                barras[hoja].empty()
+                continue
+            cajas[hoja].update(label=f"{hoja}: {texto_estado(estado)}")
+            progreso = estado["progreso"]
+            barras[hoja].progress(progreso or 0.0, text=None if progreso is not None else "calculando...")
+        if pendientes:
+            time.sleep(INTERVALO_ESTADO)
+    return cajas
+
+
+def aplicar_reporte(hoja, trabajo, nuevo=True):
+    """
+    Guarda en la sesión el resultado de un reporte terminado (clave del libro,
+    detalle y mediciones) y devuelve sus avisos; lanza su error si falló.
+    """
+    st.session_state["trabajos"].pop(hoja, None)
+    resultado = trabajo.esperar()
+    # Si otra sesión pidió antes el mismo trabajo, sus filas cambiadas son respecto de otro libro
+    cambios = resultado["filas_cambiadas"] if nuevo else None
+    st.session_state[REPORTES[hoja][0]] = resultado["clave"]
+    st.session_state["detalles"][hoja] = {"validaciones": resultado["validaciones"], "filas_cambiadas": cambios}
+    st.session_state["mediciones"][hoja] = resultado["etapas"]
+    return resultado["avisos"]
+
+
+def seguir_y_aplicar(trabajos):
+    """Muestra el avance de los reportes en la cola ({hoja: (trabajo, nuevo)}) y guarda sus resultados."""
+    estados = seguir_trabajos({hoja: trabajo for hoja, (trabajo, _) in trabajos.items()})
+    generados = []
+    for hoja, (trabajo, nuevo) in trabajos.items():
+        try:
+            avisos = aplicar_reporte(hoja, trabajo, nuevo)
+        except ErrorReporte as e:
+            estados[hoja].update(label=f"{hoja}: {e}", state="error")
+            continue
+        except Exception as e:
+            estados[hoja].update(label=f"❌ Error inesperado al generar {hoja}: {e}", state="error")
+            continue
+        segundos = obtener_cola().estado(trabajo)["segundos"]
+        estados[hoja].update(label=f"{hoja}: generado ✅ ({segundos} s)", state="complete")
+        for aviso in avisos:
+            estados[hoja].warning(aviso)
+        generados.append(hoja)
+    return generados
+
+
+def generar_reportes(hojas, clasificados):
+    """
+    Encola los reportes `hojas` en la cola compartida (el trabajo corre en el
+    pool, no en esta sesión), muestra el estado de cada uno y devuelve los
+    que se generaron.
+    """
+    esperar_archivos([k for hoja in hojas for k in REPORTES[hoja][1]])
+    trabajos = {}
+    for hoja in hojas:
+        clave_sesion, claves = REPORTES[hoja]
+        # El último libro de cada reporte permite reescribir solo las filas que cambiaron
+        anterior = ruta_existente(st.session_state[clave_sesion])
+        try:
+            trabajos[hoja] = enviar_reporte(
+                hoja, obtener_plantilla(hoja, PLANTILLA_PATH), [clasificados[k] for k in claves], anterior
+            )
+        except ErrorReporte as e:  # ColaLlena o plantilla sin la hoja
+            st.error(f"{hoja}: {e}")
+    st.session_state["trabajos"].update(trabajos)
+    return seguir_y_aplicar(trabajos)
+
+
+def reanudar_trabajos():
+    """Si la página se recargó mientras se generaba, sigue esperando los reportes pendientes."""
+    if st.session_state["trabajos"]:
+        seguir_y_aplicar(dict(st.session_state["trabajos"]))
+
+
+def carga_servidor():
+    """Trabajos en proceso y en espera en la cola compartida."""
+    carga = obtener_cola().resumen()
+    if carga["en_proceso"] or carga["en_cola"]:
+        st.caption(f"🖥️ Servidor: {carga['en_proceso']}/{carga['procesos']} procesos ocupados · "
+                   f"{carga['en_cola']} trabajos en espera")
+
+
+def datos_reporte(clave, formato):
+    """Datos por sede / local del reporte con clave `clave`, en `formato`."""
+    from funciones_exportacion import leer_tabla, serializar_tabla
+
+    return serializar_tabla(leer_tabla(clave), formato)
+
+
+def boton_descarga(etiqueta, hoja, nombre_archivo, formato_datos=None):
+    """
+    Botón que lee el reporte del disco recién al hacer clic, con el conteo de
+    validaciones y, si fue una actualización incremental, las filas que cambiaron.
+    Con `formato_datos` se agrega la descarga de sus datos en ese formato.
+    """
+    clave_sesion, _ = REPORTES[hoja]
+    clave = st.session_state.get(clave_sesion)
+    if not clave:
+        return
+    if not existe_artefacto(clave):
+        # Desalojado del almacén (TTL o tamaño): hay que volver a generarlo
+        st.session_state[clave_sesion] = None
+        st.caption(f"⌛ {etiqueta}: el archivo expiró, vuelve a generarlo.")
+        return
+    st.download_button(etiqueta, partial(leer_artefacto, clave), file_name=nombre_archivo,
+                       mime=MIME_XLSX, use_container_width=True)
+    from funciones_exportacion import EXTENSION_TABLA
+    if formato_datos and existe_artefacto(clave, EXTENSION_TABLA):
+        st.download_button(f"📊 Datos ({formato_datos.upper()})", partial(datos_reporte, clave, formato_datos),
+                           file_name=f"{os.path.splitext(nombre_archivo)[0]}.{formato_datos}",
+                           mime=MIME_DATOS[formato_datos], use_container_width=True)
+    detalle = st.session_state["detalles"].get(hoja)
+    if not detalle:
+        return
+    conteo = detalle["validaciones"]
+    st.caption(f"🟩 {conteo['OK']} OK · 🟥 {conteo['ERR']} ERR")
+    cambios = detalle["filas_cambiadas"]
+    if cambios is not None:
+        with st.expander(f"🔁 Actualización incremental: {len(cambios)} filas cambiaron"):
+            st.dataframe(
+                [{"fila": fila, "clave": " / ".join(clave) if isinstance(clave, tuple) else clave} for fila, clave in cambios],
+                hide_index=True, use_container_width=True,
+            )
+
+
+def mostrar_mediciones():
+    """Panel lateral con el tiempo, CPU y memoria de cada etapa de la última generación."""
+    import pandas as pd
+
+    with st.sidebar:
+        if not st.toggle("⏱️ Tiempos por etapa", value=False):
+            return
+        if not st.session_state["mediciones"]:
+            st.caption("Aún no se generó ningún reporte.")
+        for reporte, etapas in st.session_state["mediciones"].items():
+            st.markdown(f"**{reporte}**")
+            tabla = pd.DataFrame(etapas)
+            tabla["etapa"] = ["· " * n + e for n, e in zip(tabla.pop("nivel"), tabla["etapa"])]
+            st.dataframe(tabla, hide_index=True, use_container_width=True)
+        st.caption("Memoria: PE_MEDIR_MEMORIA=1 · Perfil cProfile: PE_PERFIL=carpeta")
+
+
+if os.environ.get("PE_PRECALENTAR", "1") != "0":
+    precalentar_servidor()
 
 
 # ---------------- ESTILO GENERAL ---------------- #
@@ -132,13 +306,11 @@ with st.expander("📁 Subir o revisar archivos cargados", expanded=True):
 
 if archivos:
     clasificados = clasificar_archivos(archivos)
+    if PRECARGAR:
+        precargar(clasificados)
 
     with st.expander("📄 Archivos detectados y clasificados automáticamente", expanded=False):
-        cols = st.columns(3)
-        for i, (k, v) in enumerate(clasificados.items()):
-            if v:
-                with cols[i % 3]:
-                    st.markdown(f"✅ **{k.upper()}**<br><small>{v.name}</small>", unsafe_allow_html=True)
+        panel_archivos(clasificados)
 else:
     st.info("Sube los archivos .xlsx correspondientes.", icon="📂")
 
@@ -146,72 +318,74 @@ else:
 # ---------------- GENERAR REPORTES ---------------- #
 if archivos:
     st.markdown("### ⚙️ Generar")
+    carga_servidor()
+    reanudar_trabajos()
+
+    if st.button("🚀 Generar todo", use_container_width=True, type="primary",
+                 disabled=not reportes_disponibles(clasificados)):
+        generar_reportes(reportes_disponibles(clasificados), clasificados)
 
     col1, col2, col3 = st.columns(3)
 
     with col1:
         if st.button("🟢 Asistencia", use_container_width=True,
                      disabled=not all([clasificados["asc"], clasificados["nom"], clasificados["acc"]])):
-            base = get_temp_copy()
-            generar_asistencia(base, clasificados["asc"], clasificados["nom"], clasificados["acc"])
-            st.toast("Reporte Asistencia generado ✅", icon="✅")
+            if generar_reportes(["ASISTENCIA"], clasificados):
+                st.toast("Reporte Asistencia generado ✅", icon="✅")
 
     with col2:
         if st.button("🟦 OP1", use_container_width=True,
                      disabled=not all([clasificados["asc_inst"], clasificados["nom_inst"], clasificados["asc_fa"]])):
-            base = get_temp_copy()
-            generar_op1(base, clasificados["asc_fa"], clasificados["asc_inst"], clasificados["nom_inst"])
-            st.toast("Reporte OP1 generado ✅", icon="✅")
+            if generar_reportes(["OP1"], clasificados):
+                st.toast("Reporte OP1 generado ✅", icon="✅")
 
     with col3:
         if st.button("🟣 OP2", use_container_width=True,
                      disabled=not all([clasificados["acc_inst"], clasificados["acc_fa"]])):
-            base = get_temp_copy()
-            generar_op2(base, clasificados["acc_fa"], clasificados["acc_inst"])
-            st.toast("Reporte OP2 generado ✅", icon="✅")
+            if generar_reportes(["OP2"], clasificados):
+                st.toast("Reporte OP2 generado ✅", icon="✅")
 
 
     # ---------------- DESCARGAS ---------------- #
     st.divider()
     st.markdown("### ⬇️ Descargas")
+    from funciones_exportacion import formatos_disponibles
+    formato_datos = st.radio("Formato de los datos por sede / local", formatos_disponibles(), horizontal=True)
 
     cols_dl = st.columns(3)
     with cols_dl[0]:
-        if st.session_state.get("asistencia_generada"):
-            st.download_button("Descargar Asistencia", st.session_state["asistencia_generada"],
-                               file_name="PE - Reporte_ASISTENCIA.xlsx", use_container_width=True)
+        boton_descarga("Descargar Asistencia", "ASISTENCIA", "PE - Reporte_ASISTENCIA.xlsx", formato_datos)
     with cols_dl[1]:
-        if st.session_state.get("op1_generada"):
-            st.download_button("Descargar OP1", st.session_state["op1_generada"],
-                               file_name="PE - Reporte_OP1.xlsx", use_container_width=True)
+        boton_descarga("Descargar OP1", "OP1", "PE - Reporte_OP1.xlsx", formato_datos)
     with cols_dl[2]:
-        if st.session_state.get("op2_generada"):
-            st.download_button("Descargar OP2", st.session_state["op2_generada"],
-                               file_name="PE - Reporte_OP2.xlsx", use_container_width=True)
+        boton_descarga("Descargar OP2", "OP2", "PE - Reporte_OP2.xlsx", formato_datos)
 
 
     # ---------------- COMBINAR REPORTES ---------------- #
     st.divider()
     st.markdown("### 📘 Combinar Reportes en una sola plantilla")
 
-    if (
-        st.session_state.get("asistencia_generada")
-        and st.session_state.get("op1_generada")
-        and st.session_state.get("op2_generada")
-    ):
-        combinado = combinar_reportes(
-            PLANTILLA_PATH,
-            st.session_state["asistencia_generada"],
-            st.session_state["op1_generada"],
-            st.session_state["op2_generada"],
-        )
+    claves = [st.session_state.get(k) for k in ["asistencia_generada", "op1_generada", "op2_generada"]]
+    if all(existe_artefacto(c) for c in claves):
+        clave_final = clave_combinada(PLANTILLA_PATH, os.stat(PLANTILLA_PATH).st_mtime_ns, *claves)
+        mediciones = st.session_state["mediciones"]
+
+        def reporte_final():
+            # Se combina recién al hacer clic (en la cola compartida) y queda en el almacén
+            if not existe_artefacto(clave_final):
+                trabajo, _ = enviar_combinacion(PLANTILLA_PATH, [ruta_artefacto(c) for c in claves], clave_final)
+                mediciones["FINAL"] = trabajo.esperar()["etapas"]
+            return leer_artefacto(clave_final)
+
         st.download_button(
             "⬇️ Descargar Reporte Final (Asistencia + OP1 + OP2)",
-            combinado,
+            reporte_final,
             file_name="PE - Reporte_Final.xlsx",
+            mime=MIME_XLSX,
             use_container_width=True,
         )
     else:
         st.info("Genera los tres reportes (Asistencia, OP1, OP2) antes de combinarlos.", icon="ℹ️")
 
 
+mostrar_mediciones()
@@ -0,0 +1,13 @@
+# benchmark
+# ============================================================
+# Medición de los generadores de reportes con datos sintéticos
+#
+# Uso:
+#   python -m benchmark --locales 100 1000 --filas 10000 100000
+#   python -m benchmark --locales 1000 --guardar-referencia ref.json
+#   python -m benchmark --locales 1000 --referencia ref.json
+#
+# --guardar-referencia guarda celda por celda (valores y fórmulas) lo que
+# producen los generadores actuales; --referencia compara contra ese archivo
+# para comprobar que un motor más rápido da exactamente el mismo resultado.
+# ============================================================
@@ -0,0 +1,129 @@
+# benchmark/__main__.py
+# ============================================================
+# python -m benchmark: mide cada escenario y guarda los tiempos en JSON
+# ============================================================
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+from benchmark.datos import generar_conjunto
+from benchmark.equivalencia import cargar_referencia, comparar, guardar_referencia, instantanea
+from benchmark.medicion import medir_escenario, medir_lectores
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _minimo(repeticiones):
+    """
+    Por etapa, el menor tiempo entre repeticiones (el menos afectado por
+    ruido). Una etapa que no aparece en todas (p. ej. la lectura cuando hubo
+    caché) toma el mínimo de las repeticiones donde sí está.
+    """
+    minimos = {}
+    for tiempos in repeticiones:
+        for reporte, etapas in tiempos.items():
+            for etapa, segundos in etapas.items():
+                previo = minimos.setdefault(reporte, {}).get(etapa)
+                minimos[reporte][etapa] = round(segundos if previo is None else min(previo, segundos), 4)
+    return minimos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Mide los generadores de reportes PE.")
+    parser.add_argument("--locales", type=int, nargs="+", default=[100], help="Cantidad de locales por escenario")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000], help="Filas por archivo de inventario")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--datos", default=os.path.join(tempfile.gettempdir(), "pe_benchmark"),
+                        help="Carpeta donde se generan (y reutilizan) los archivos sintéticos")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="JSON con los tiempos")
+    parser.add_argument("--lectores", nargs="+", choices=["openpyxl", "calamine", "pandas"],
+                        help="Mide además la lectura de las entradas con cada lector de Excel")
+    parser.add_argument("--guardar-referencia", help="Guarda la salida actual como referencia (.json o .json.gz)")
+    parser.add_argument("--referencia", help="Compara la salida celda por celda contra esta referencia")
+    args = parser.parse_args(argv)
+
+    referencia = cargar_referencia(args.referencia) if args.referencia else None
+    nueva_referencia = {}
+    resultados = []
+    diferencias_totales = 0
+
+    carpeta_cache = tempfile.mkdtemp(prefix="pe_benchmark_cache_")
+    for locales in args.locales:
+        for filas in args.filas:
+            escenario = f"{locales}x{filas}-s{args.semilla}"
+            print(f"⚙️  {escenario}: generando datos...")
+            rutas = generar_conjunto(os.path.join(args.datos, escenario), locales, filas, args.semilla)
+
+            repeticiones = []
+            for _ in range(max(1, args.repeticiones)):
+                tiempos, libros = medir_escenario(rutas, carpeta_cache)
+                repeticiones.append(tiempos)
+            tiempos = _minimo(repeticiones)
+
+            resultado = {"escenario": escenario, "locales": locales, "filas": filas, "tiempos": tiempos}
+            print(f"⏱️  {escenario}: " + ", ".join(f"{r} {t['total']:.2f} s" for r, t in tiempos.items()))
+
+            if args.lectores:
+                resultado["lectores"] = medir_lectores(rutas, args.lectores)
+                for lector, t in resultado["lectores"].items():
+                    print(f"   📖 {lector}: {t['total']:.2f} s{'' if t['igual'] else '  ❌ resultado distinto'}")
+
+            if args.guardar_referencia or referencia is not None:
+                instantaneas = {reporte: instantanea(contenido) for reporte, contenido in libros.items()}
+                nueva_referencia[escenario] = instantaneas
+
+                if referencia is not None:
+                    if escenario not in referencia:
+                        print(f"⚠️  {escenario}: no está en la referencia, no se compara")
+                    else:
+                        diferencias = {}
+                        for reporte, esperado in referencia[escenario].items():
+                            total, ejemplos = comparar(esperado, instantaneas.get(reporte, {}))
+                            if total:
+                                diferencias[reporte] = total
+                                for hoja, celda, a, b in ejemplos:
+                                    print(f"   {reporte} {hoja}!{celda}: {a!r} ≠ {b!r}")
+                        resultado["diferencias"] = diferencias
+                        diferencias_totales += sum(diferencias.values())
+                        print(f"{'❌' if diferencias else '✅'} {escenario}: {sum(diferencias.values())} celdas distintas")
+
+            resultados.append(resultado)
+
+    if args.guardar_referencia:
+        guardar_referencia(args.guardar_referencia, nueva_referencia)
+        print(f"📄 Referencia: {args.guardar_referencia}")
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "openpyxl": openpyxl.__version__,
+            "repeticiones": args.repeticiones,
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"📄 Tiempos: {args.salida}")
+
+    return 1 if diferencias_totales else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# benchmark/datos.py
+# ============================================================
+# Generador de archivos sintéticos (Postulantes, Instrumentos, FA)
+#
+# Reproduce las particularidades de los archivos reales: filas de
+# preámbulo antes del encabezado ('N' / 'Sede Operativa'), tipos con y
+# sin tildes, espacios y mayúsculas variables en sede y local.
+# ============================================================
+
+import json
+import os
+import random
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.formula.translate import Translator
+
+
+PLANTILLA_PATH = os.path.join("plantillas", "PE3 - Reporte.xlsx")
+
+REGIONES = ["AMAZONAS", "ÁNCASH", "APURÍMAC", "AREQUIPA", "AYACUCHO", "CAJAMARCA", "CUSCO",
+            "HUÁNUCO", "JUNÍN", "LA LIBERTAD", "LIMA", "LORETO", "PIURA", "PUNO", "SAN MARTÍN"]
+
+TIPOS_INSTRUMENTOS = [
+    "CUADERNILLO DE CONOCIMIENTOS PEDAGÓGICOS",
+    "Cuadernillo de Conocimientos Pedagogicos",
+    "CUADERNILLO DE HABILIDADES GENERALES",
+    "FICHA DE RESPUESTA",
+    "Ficha de Respuesta - ÓPTICA",
+]
+
+TIPOS_FA = [
+    "ACTA DE RECEPCIÓN/DEVOLUCIÓN",
+    "ACTA DE RECEPCION/DEVOLUCION",
+    "ACTA DE APLICACIÓN DEL AULA",
+    "LISTA DE ASISTENCIA",
+    "LISTA DE RETIRO DE CUADERNILLOS",
+    "ACTA DE RESPUESTA A OBSERVACIONES DEL DOCENTE",
+    "REGISTRO DE ENTREGA INSTRUMENTOS ADICIONALES",
+    "ACTA DE INCIDENCIAS DEL CAE",
+    "ACTA DE INCUMPLIMIENTO DE PROCEDIMIENTOS",
+    "ACTA DE INCIDENCIAS DE SALUD",
+    "ACTA DE INCIDENCIAS DEL LOCAL DE EVALUACIÓN",
+    "ACTA FISCAL",
+    "SOBRES",
+    "SOBRE MANILA",
+    "OTRO FORMATO",
+]
+
+# Hoja de la plantilla → columnas clave que se reescriben
+CLAVES_PLANTILLA = {"ASISTENCIA": ["B"], "OP1": ["B", "C"], "OP2": ["B", "C"]}
+
+
+# ============================================================
+# CLAVES (SEDES Y LOCALES)
+# ============================================================
+
+def crear_claves(locales, rnd):
+    """Devuelve (sedes, pares (sede, local)) con ~8 locales por sede."""
+    sedes = [
+        f"{REGIONES[i % len(REGIONES)]}-SEDE {i // len(REGIONES) + 1:03d}"
+        for i in range(max(1, locales // 8))
+    ]
+    pares = [(rnd.choice(sedes), f"IE N° {j + 1} - JOSÉ MARÍA ARGUEDAS") for j in range(locales)]
+    return sedes, pares
+
+
+def _variar(texto, rnd):
+    """Misma clave escrita como en los archivos reales: espacios y mayúsculas variables."""
+    x = rnd.random()
+    if x < 0.1:
+        return f" {texto} "
+    if x < 0.2:
+        return texto.lower()
+    return texto
+
+
+# ============================================================
+# ARCHIVOS DE ENTRADA
+# ============================================================
+
+def escribir_postulantes(ruta, sedes, rnd, filas_por_sede=3):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["REPORTE DE POSTULANTES"])
+    ws.append(["Fecha de corte", "2025-07-13"])
+    ws.append([])
+    ws.append(["N", "Sede de Evaluación", "Postulantes", "Asistencia al Local",
+               "Asistencia en Aula", "Casos de inconsistencia", "Observación"])
+    n = 1
+    for sede in sedes:
+        for _ in range(filas_por_sede):
+            postulantes = rnd.randint(0, 500)
+            local = rnd.randint(0, postulantes)
+            ws.append([n, sede, postulantes, local, rnd.randint(0, local), rnd.randint(0, 3), ""])
+            n += 1
+    wb.save(ruta)
+
+
+def escribir_inventario(ruta, pares, tipos, filas, rnd):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["INVENTARIO DE MATERIAL EN CAMPO"])
+    ws.append(["Generado", "2025-07-13"])
+    ws.append([])
+    ws.append(["Nro", "Sede Operativa ", "Local", "Tipo", "Inventario en campo", "Estado"])
+    for n in range(1, filas + 1):
+        sede, local = rnd.choice(pares)
+        inventario = rnd.randint(0, 50) if rnd.random() > 0.05 else None
+        ws.append([n, _variar(sede, rnd), _variar(local, rnd), rnd.choice(tipos), inventario, "RECIBIDO"])
+    wb.save(ruta)
+
+
+def escribir_plantilla(ruta, sedes, pares, origen=PLANTILLA_PATH):
+    """
+    Copia la plantilla real y reemplaza sus claves por las sintéticas. Las demás
+    columnas de la fila 2 se repiten en cada fila (fórmulas trasladadas).
+    """
+    wb = load_workbook(origen)
+    for hoja, columnas in CLAVES_PLANTILLA.items():
+        ws = wb[hoja]
+        claves = [(s,) for s in sedes] if len(columnas) == 1 else pares
+        modelo = {c.column_letter: c.value for c in ws[2] if c.value is not None}
+
+        for r in range(2, max(ws.max_row, len(claves) + 1) + 1):
+            if r - 2 >= len(claves):
+                for col in columnas:
+                    ws[f"{col}{r}"].value = None
+                continue
+            for col, valor in modelo.items():
+                if isinstance(valor, str) and valor.startswith("="):
+                    valor = Translator(valor, origin=f"{col}2").translate_formula(f"{col}{r}")
+                ws[f"{col}{r}"].value = valor
+            ws[f"A{r}"].value = r - 1
+            for col, valor in zip(columnas, claves[r - 2]):
+                ws[f"{col}{r}"].value = valor
+    wb.save(ruta)
+
+
+# ============================================================
+# CONJUNTO COMPLETO
+# ============================================================
+
+ARCHIVOS = {
+    "asc": "ASC - POSTULANTES.xlsx",
+    "nom": "NOM - POSTULANTES.xlsx",
+    "acc": "ACC - POSTULANTES.xlsx",
+    "asc_inst": "ASC - INSTRUMENTOS.xlsx",
+    "nom_inst": "NOM - INSTRUMENTOS.xlsx",
+    "acc_inst": "ACC - INSTRUMENTOS.xlsx",
+    "asc_fa": "ASC - FA.xlsx",
+    "acc_fa": "ACC - FA.xlsx",
+    "plantilla": "PE3 - Reporte.xlsx",
+}
+
+
+def generar_conjunto(carpeta, locales=100, filas=10_000, semilla=1):
+    """
+    Escribe en `carpeta` la plantilla y los ocho archivos de entrada para la
+    escala pedida y devuelve {clave: ruta}. Si la carpeta ya tiene un conjunto
+    con los mismos parámetros, se reutiliza.
+    """
+    parametros = {"locales": locales, "filas": filas, "semilla": semilla}
+    rutas = {k: os.path.join(carpeta, nombre) for k, nombre in ARCHIVOS.items()}
+    ruta_parametros = os.path.join(carpeta, "parametros.json")
+
+    try:
+        with open(ruta_parametros, encoding="utf-8") as f:
+            if json.load(f) == parametros and all(os.path.exists(r) for r in rutas.values()):
+                return rutas
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(carpeta, exist_ok=True)
+    rnd = random.Random(semilla)
+    sedes, pares = crear_claves(locales, rnd)
+
+    escribir_plantilla(rutas["plantilla"], sedes, pares)
+    for clave in ["asc", "nom", "acc"]:
+        escribir_postulantes(rutas[clave], sedes, rnd)
+    for clave in ["asc_inst", "nom_inst", "acc_inst"]:
+        escribir_inventario(rutas[clave], pares, TIPOS_INSTRUMENTOS, filas, rnd)
+    for clave in ["asc_fa", "acc_fa"]:
+        escribir_inventario(rutas[clave], pares, TIPOS_FA, filas, rnd)
+
+    with open(ruta_parametros, "w", encoding="utf-8") as f:
+        json.dump(parametros, f)
+    return rutas
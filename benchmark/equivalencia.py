@@ -0,0 +1,76 @@
+# benchmark/equivalencia.py
+# ============================================================
+# Comparación celda por celda contra una referencia guardada
+# ============================================================
+
+import gzip
+import json
+from io import BytesIO
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+
+HOJAS = ["ASISTENCIA", "OP1", "OP2"]
+
+
+def _valor(v):
+    """Valor comparable y serializable: números como float, fórmulas como texto."""
+    if isinstance(v, bool) or v is None:
+        return v
+    if isinstance(v, (int, float)):
+        return float(v)
+    return str(v)
+
+
+def instantanea(contenido):
+    """{hoja: filas de valores / fórmulas} de un libro generado."""
+    wb = load_workbook(BytesIO(contenido))
+    return {
+        ws.title: [[_valor(v) for v in fila] for fila in ws.iter_rows(values_only=True)]
+        for ws in wb.worksheets
+        if ws.title in HOJAS
+    }
+
+
+def _abrir(ruta, modo):
+    if ruta.endswith(".gz"):
+        return gzip.open(ruta, modo + "t", encoding="utf-8")
+    return open(ruta, modo, encoding="utf-8")
+
+
+def guardar_referencia(ruta, escenarios):
+    """Guarda {escenario: {reporte: instantánea}} (comprimido si la ruta termina en .gz)."""
+    with _abrir(ruta, "w") as f:
+        json.dump(escenarios, f, ensure_ascii=False)
+
+
+def cargar_referencia(ruta):
+    with _abrir(ruta, "r") as f:
+        return json.load(f)
+
+
+def comparar(esperado, obtenido, limite=20):
+    """
+    Devuelve las diferencias entre dos instantáneas como
+    (total, [(hoja, celda, esperado, obtenido), ...]) con a lo sumo `limite` ejemplos.
+    """
+    total, ejemplos = 0, []
+
+    def anotar(hoja, celda, a, b):
+        nonlocal total
+        total += 1
+        if len(ejemplos) < limite:
+            ejemplos.append((hoja, celda, a, b))
+
+    for hoja in sorted(set(esperado) | set(obtenido)):
+        filas_a, filas_b = esperado.get(hoja, []), obtenido.get(hoja, [])
+        for r in range(max(len(filas_a), len(filas_b))):
+            fila_a = filas_a[r] if r < len(filas_a) else []
+            fila_b = filas_b[r] if r < len(filas_b) else []
+            for c in range(max(len(fila_a), len(fila_b))):
+                a = fila_a[c] if c < len(fila_a) else None
+                b = fila_b[c] if c < len(fila_b) else None
+                if a != b:
+                    anotar(hoja, f"{get_column_letter(c + 1)}{r + 1}", a, b)
+    return total, ejemplos
@@ -0,0 +1,109 @@
+# benchmark/importacion.py
+# ============================================================
+# Costo de importación de cada módulo (python -X importtime)
+#
+# Uso:
+#   python -m benchmark.importacion [modulo ...] [--json salida.json]
+#
+# Cada módulo se importa en un proceso nuevo, así que el tiempo incluye
+# todas sus dependencias (como en el arranque en frío de un contenedor).
+# "app" mide las importaciones del encabezado de app_pe3.py sin ejecutar
+# la app (importar el script correría toda la interfaz de Streamlit).
+# ============================================================
+
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+# Dependencias externas que interesa ver por separado
+DEPENDENCIAS = ["streamlit", "pandas", "openpyxl"]
+
+_LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def modulos_del_proyecto(raiz="."):
+    return sorted(os.path.basename(p)[:-3] for p in glob.glob(os.path.join(raiz, "funciones_*.py")))
+
+
+def importaciones_app(ruta="app_pe3.py"):
+    """Código con las sentencias import del nivel superior de la app."""
+    with open(ruta, encoding="utf-8") as f:
+        fuente = f.read()
+    return "\n".join(
+        ast.get_source_segment(fuente, nodo) for nodo in ast.parse(fuente).body
+        if isinstance(nodo, (ast.Import, ast.ImportFrom))
+    )
+
+
+def _importtime(codigo, modulo):
+    """(acumulado en µs, sangría, nombre) de cada línea de -X importtime al ejecutar `codigo`."""
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"❌ No se pudo importar {modulo}: {proceso.stderr.strip().splitlines()[-1]}")
+    return [(int(m[2]), len(m[3]), m[4]) for m in map(_LINEA.match, proceso.stderr.splitlines()) if m]
+
+
+def medir_importacion(modulo):
+    """
+    Importa `modulo` ("app": las importaciones de app_pe3.py) en un proceso
+    nuevo y devuelve {"modulo", "ms" (acumulado), "dependencias": {paquete
+    de primer nivel: ms}}.
+    """
+    if modulo == "app":
+        # Todo lo de nivel 0 es dependencia directa, menos lo que carga el intérprete al arrancar
+        arranque = {nombre for _, _, nombre in _importtime("pass", "python")}
+        dependencias = {}
+        for acumulado, sangria, nombre in _importtime(importaciones_app(), modulo):
+            if sangria == 0 and nombre not in arranque:
+                raiz = nombre.split(".")[0]
+                dependencias[raiz] = dependencias.get(raiz, 0) + acumulado
+        total = sum(dependencias.values())
+    else:
+        # Cada módulo aparece después de sus dependencias, con dos espacios más de sangría
+        total, dependencias, pendientes = 0, {}, {}
+        for acumulado, sangria, nombre in _importtime(f"import {modulo}", modulo):
+            if sangria == 0:
+                if nombre == modulo:
+                    total, dependencias = acumulado, pendientes
+                pendientes = {}
+            elif sangria == 2:
+                raiz = nombre.split(".")[0]
+                pendientes[raiz] = pendientes.get(raiz, 0) + acumulado
+
+    return {
+        "modulo": modulo,
+        "ms": round(total / 1000, 1),
+        "dependencias": {
+            k: round(v / 1000, 1) for k, v in sorted(dependencias.items(), key=lambda x: -x[1]) if v >= 1000
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark.importacion",
+                                     description="Tiempo de importación por módulo.")
+    parser.add_argument("modulos", nargs="*", help="Por defecto: app, funciones_*.py y dependencias externas")
+    parser.add_argument("--json", help="Guarda el reporte en JSON")
+    args = parser.parse_args(argv)
+
+    modulos = args.modulos or ["app"] + DEPENDENCIAS + modulos_del_proyecto()
+    reporte = [medir_importacion(m) for m in modulos]
+
+    ancho = max(len(m) for m in modulos)
+    for fila in sorted(reporte, key=lambda r: -r["ms"]):
+        detalle = ", ".join(f"{k} {v:.0f}" for k, v in list(fila["dependencias"].items())[:4])
+        print(f"{fila['modulo']:<{ancho}}  {fila['ms']:>8.1f} ms   {detalle}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmark/medicion.py
+# ============================================================
+# Tiempos por etapa de cada generador
+#
+# Cada reporte se genera una vez con generar_reporte / generar_final y se
+# informan las etapas que registran los propios generadores
+# (funciones_instrumentacion), p. ej.:
+#   lectura    → archivos de entrada a DataFrame
+#   agregacion → normalización y tablas por (sede, local, categoría)
+#   plantilla  → abrir la hoja de la plantilla
+#   llenado    → escribir valores y fórmulas
+#   calculo    → evaluar las fórmulas (valores en caché)
+#   guardado   → serializar el libro
+#   total      → la ejecución completa, cuya salida es la que se compara
+# ============================================================
+
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import funciones_cache
+import funciones_carga
+import funciones_combinar
+from funciones_carga import cargar_excel_con_encabezado_correcto, cargar_postulantes
+from funciones_plantilla import preparar_plantilla
+from funciones_reportes import generar_final, generar_reporte
+
+
+@contextmanager
+def cronometro(tiempos, etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[etapa] = tiempos.get(etapa, 0) + time.perf_counter() - inicio
+
+
+def sin_cache(carpeta):
+    """Desvía las cachés a un directorio nuevo dentro de `carpeta` y vacía la memoria, para medir en frío."""
+    funciones_cache.CACHE_DIR = tempfile.mkdtemp(dir=carpeta)
+    funciones_cache.limpiar_cache()
+    funciones_combinar._resultados.clear()
+
+
+def _por_etapa(etapas):
+    """Segundos por nombre de etapa (las que se repiten, p. ej. por fragmento, se suman)."""
+    tiempos = {}
+    for registro in etapas:
+        tiempos[registro["etapa"]] = tiempos.get(registro["etapa"], 0) + registro["segundos"]
+    return tiempos
+
+
+# ============================================================
+# MEDICIONES POR REPORTE
+# ============================================================
+
+def medir_reporte(hoja, rutas):
+    resultado = generar_reporte(hoja, rutas, rutas["plantilla"])
+    return _por_etapa(resultado["etapas"]), resultado["contenido"]
+
+
+def medir_combinar(rutas, asistencia, op1, op2):
+    resultado = generar_final({"ASISTENCIA": asistencia, "OP1": op1, "OP2": op2}, rutas["plantilla"])
+    return _por_etapa(resultado["etapas"]), resultado["contenido"]
+
+
+def medir_lectores(rutas, lectores):
+    """
+    Tiempo de lectura de cada archivo de entrada con cada lector de Excel.
+    Devuelve {lector: {archivo: segundos}} y marca "igual": False si algún
+    resultado difiere del de openpyxl; los lectores no instalados se omiten.
+    """
+    cargadores = {k: cargar_postulantes for k in ["asc", "nom", "acc"]}
+    cargadores.update({k: cargar_excel_con_encabezado_correcto for k in ["asc_inst", "nom_inst", "acc_inst", "asc_fa", "acc_fa"]})
+
+    referencia, resultados = {}, {}
+    for lector in ["openpyxl"] + [l for l in lectores if l != "openpyxl"]:
+        try:
+            filas = funciones_carga.LECTORES[lector](rutas["asc"])
+            try:
+                next(filas, None)  # el libro de openpyxl se cierra al cerrar un iterador ya empezado
+            finally:
+                filas.close()
+        except Exception as e:
+            print(f"⚠️  Lector '{lector}' no disponible: {e}")
+            continue
+
+        tiempos, igual = {}, True
+        funciones_carga.LECTOR, anterior = lector, funciones_carga.LECTOR
+        try:
+            for clave, cargar in cargadores.items():
+                with cronometro(tiempos, clave):
+                    df = cargar(rutas[clave])
+                if lector == "openpyxl":
+                    referencia[clave] = df
+                else:
+                    try:
+                        pd.testing.assert_frame_equal(df, referencia[clave], check_dtype=False)
+                    except AssertionError:
+                        igual = False
+        finally:
+            funciones_carga.LECTOR = anterior
+
+        if lector in lectores:
+            resultados[lector] = {**{k: round(v, 4) for k, v in tiempos.items()},
+                                  "total": round(sum(tiempos.values()), 4), "igual": igual}
+    return resultados
+
+
+def medir_escenario(rutas, carpeta_cache):
+    """
+    Mide los tres reportes y la combinación. Devuelve ({reporte: tiempos},
+    {reporte: bytes del libro}); la caché de archivos se vacía antes de cada uno.
+    """
+    preparar_plantilla(rutas["plantilla"])  # como la app al arrancar: no se mide
+    tiempos, libros = {}, {}
+    for hoja in ["ASISTENCIA", "OP1", "OP2"]:
+        sin_cache(carpeta_cache)
+        tiempos[hoja], libros[hoja] = medir_reporte(hoja, rutas)
+    sin_cache(carpeta_cache)
+    tiempos["FINAL"], libros["FINAL"] = medir_combinar(rutas, libros["ASISTENCIA"], libros["OP1"], libros["OP2"])
+    return tiempos, libros
@@ -0,0 +1,131 @@
+# funciones_artefactos.py
+# ============================================================
+# Almacén en disco de los reportes generados
+#
+# La sesión guarda solo la clave (SHA-256 del contenido); el libro vive en
+# disco y se lee al descargarlo. Junto a un libro pueden guardarse otros
+# artefactos con la misma clave y otra extensión (p. ej. el estado para la
+# regeneración incremental). Los archivos se desalojan por antigüedad (TTL
+# desde el último uso) y por tamaño total. La carpeta es privada del
+# usuario (funciones_directorios): otro usuario no puede reemplazar las
+# descargas ni el estado guardado.
+# ============================================================
+
+import hashlib
+import os
+import tempfile
+import time
+
+from funciones_directorios import carpeta_usuario, directorio_privado
+
+ARTEFACTOS_DIR = os.environ.get("PE_ARTEFACTOS_DIR", carpeta_usuario("artefactos"))
+TTL_ARTEFACTOS = float(os.environ.get("PE_ARTEFACTOS_TTL_H", 24)) * 3600
+LIMITE_ARTEFACTOS = int(os.environ.get("PE_ARTEFACTOS_MB", 2048)) * 1024 * 1024
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def ruta_artefacto(clave, extension=".xlsx"):
+    return os.path.join(ARTEFACTOS_DIR, f"{clave}{extension}")
+
+
+def clave_combinada(*partes):
+    """Clave estable para un artefacto derivado de otros (p. ej. el reporte final)."""
+    sha = hashlib.sha256()
+    for parte in partes:
+        sha.update(parte if isinstance(parte, bytes) else str(parte).encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def desalojar_artefactos():
+    """Borra los artefactos sin uso por más de TTL y luego los menos usados hasta quedar bajo el límite."""
+    try:
+        entradas = list(os.scandir(ARTEFACTOS_DIR))
+    except FileNotFoundError:
+        return
+
+    ahora = time.time()
+    vigentes = []
+    for entrada in entradas:
+        if entrada.name.endswith(".tmp"):
+            continue
+        try:
+            info = entrada.stat()
+            if ahora - info.st_mtime > TTL_ARTEFACTOS:
+                os.remove(entrada.path)
+            else:
+                vigentes.append((info.st_mtime, info.st_size, entrada.path))
+        except OSError:
+            pass
+
+    total = sum(tamano for _, tamano, _ in vigentes)
+    for _, tamano, ruta in sorted(vigentes):
+        if total <= LIMITE_ARTEFACTOS:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamano
+        except OSError:
+            pass
+
+
+# ============================================================
+# FUNCIONES PRINCIPALES
+# ============================================================
+
+def guardar_artefacto(contenido, clave=None, extension=".xlsx"):
+    """
+    Guarda un libro (bytes o BytesIO) y devuelve su clave. Si no se indica
+    clave se usa el SHA-256 del contenido, así que guardar dos veces lo
+    mismo no ocupa más espacio.
+    """
+    if hasattr(contenido, "getvalue"):
+        contenido = contenido.getvalue()
+    clave = clave or hashlib.sha256(contenido).hexdigest()
+    ruta = ruta_artefacto(clave, extension)
+    directorio_privado(ARTEFACTOS_DIR)
+
+    if os.path.exists(ruta):
+        os.utime(ruta)
+        return clave
+
+    fd, tmp = tempfile.mkstemp(dir=ARTEFACTOS_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(contenido)
+        os.replace(tmp, ruta)  # atómico: nadie ve un archivo a medio escribir
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    desalojar_artefactos()
+    return clave
+
+
+def existe_artefacto(clave, extension=".xlsx"):
+    return bool(clave) and os.path.exists(ruta_artefacto(clave, extension))
+
+
+def ruta_existente(clave, extension=".xlsx"):
+    """Ruta del artefacto si sigue en el almacén; si no (o sin clave), None."""
+    if not existe_artefacto(clave, extension):
+        return None
+    directorio_privado(ARTEFACTOS_DIR)
+    return ruta_artefacto(clave, extension)
+
+
+def leer_artefacto(clave, extension=".xlsx"):
+    """
+    Contenido de un artefacto, leído desde disco al momento de descargarlo.
+    Lanza FileNotFoundError si ya fue desalojado.
+    """
+    ruta = ruta_artefacto(clave, extension)
+    directorio_privado(ARTEFACTOS_DIR)
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+    os.utime(ruta)  # marca de uso para el TTL y el desalojo por tamaño
+    return contenido
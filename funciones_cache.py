@@ -0,0 +1,224 @@
+# funciones_cache.py
+# ============================================================
+# Caché de archivos ya procesados (memoria + disco)
+#
+# En disco las tablas se guardan en Parquet (con pyarrow) en una carpeta
+# privada del usuario (funciones_directorios): lo que se lee de ahí no
+# ejecuta código, y otro usuario no puede dejar archivos en ella.
+# ============================================================
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from importlib.util import find_spec
+
+import pandas as pd
+
+from funciones_directorios import carpeta_usuario, directorio_privado
+
+
+# Se incrementa cuando cambia el formato de lo que devuelven los cargadores
+VERSION_CACHE = 3
+
+CACHE_DIR = os.environ.get("PE_CACHE_DIR", carpeta_usuario("cache"))
+LIMITE_MEMORIA = int(os.environ.get("PE_CACHE_MEMORIA_MB", 256)) * 1024 * 1024
+LIMITE_DISCO = int(os.environ.get("PE_CACHE_DISCO_MB", 2048)) * 1024 * 1024
+
+# Parquet si hay pyarrow; si no, pickle (solo se lee desde la carpeta privada)
+EXTENSION_DISCO = ".parquet" if find_spec("pyarrow") is not None else ".pkl"
+
+_memoria = OrderedDict()  # clave → (DataFrame, bytes)
+_bytes_memoria = 0
+_lock = threading.Lock()
+
+# Huellas de archivos en disco ya calculadas: ruta → (firma de stat, SHA-256)
+_huellas = OrderedDict()
+LIMITE_HUELLAS = 4096
+
+
+# ============================================================
+# HUELLA DEL ARCHIVO
+# ============================================================
+
+def firma_archivo(ruta):
+    """Tamaño, fechas de modificación e inodo: cambian si el archivo se reescribe."""
+    info = os.stat(ruta)
+    return (info.st_size, info.st_mtime_ns, info.st_ctime_ns, info.st_ino)
+
+
+def huella_archivo(file, tamano_bloque=1024 * 1024):
+    """
+    SHA-256 del contenido de un archivo subido o de una ruta en disco. Una
+    ruta ya leída no se vuelve a leer mientras su firma_archivo no cambie.
+    """
+    sha = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        ruta = os.path.abspath(file)
+        firma = firma_archivo(ruta)
+        with _lock:
+            previa = _huellas.get(ruta)
+        if previa is not None and previa[0] == firma:
+            return previa[1]
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(tamano_bloque), b""):
+                sha.update(bloque)
+        with _lock:
+            _huellas[ruta] = (firma, sha.hexdigest())
+            _huellas.move_to_end(ruta)
+            while len(_huellas) > LIMITE_HUELLAS:
+                _huellas.popitem(last=False)
+        return sha.hexdigest()
+
+    file.seek(0)
+    for bloque in iter(lambda: file.read(tamano_bloque), b""):
+        sha.update(bloque)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+# ============================================================
+# NIVEL 1: MEMORIA DEL PROCESO (LRU)
+# ============================================================
+
+def _leer_memoria(clave):
+    with _lock:
+        if clave not in _memoria:
+            return None
+        _memoria.move_to_end(clave)
+        return _memoria[clave][0]
+
+
+def _guardar_memoria(clave, df):
+    global _bytes_memoria
+    tamano = int(df.memory_usage(deep=True).sum())
+    if tamano > LIMITE_MEMORIA:
+        return
+    with _lock:
+        if clave in _memoria:
+            _bytes_memoria -= _memoria.pop(clave)[1]
+        _memoria[clave] = (df, tamano)
+        _bytes_memoria += tamano
+        while _bytes_memoria > LIMITE_MEMORIA:
+            _, (_, liberado) = _memoria.popitem(last=False)
+            _bytes_memoria -= liberado
+
+
+# ============================================================
+# NIVEL 2: DISCO (COMPARTIDO ENTRE SESIONES Y REINICIOS)
+# ============================================================
+
+def _ruta_disco(clave):
+    return os.path.join(CACHE_DIR, f"{clave}{EXTENSION_DISCO}")
+
+
+def _carpeta_segura():
+    """True si CACHE_DIR es una carpeta privada (se crea si falta); si no, no se usa el disco."""
+    try:
+        directorio_privado(CACHE_DIR)
+        return True
+    except OSError:
+        return False
+
+
+def _leer_disco(clave):
+    ruta = _ruta_disco(clave)
+    if not os.path.exists(ruta) or not _carpeta_segura():
+        return None
+    try:
+        df = pd.read_parquet(ruta) if EXTENSION_DISCO == ".parquet" else pd.read_pickle(ruta)
+        os.utime(ruta)  # marca de uso para el desalojo LRU
+        return df
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Archivo corrupto o de otra versión de pandas: se descarta
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+        return None
+
+
+def _guardar_disco(clave, df):
+    """Escritura atómica: otro proceso nunca ve un archivo a medio escribir."""
+    tmp = None
+    if not _carpeta_segura():
+        return
+    try:
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        if EXTENSION_DISCO == ".parquet":
+            df.to_parquet(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, _ruta_disco(clave))
+        _desalojar_disco()
+    except Exception:
+        # La caché en disco es opcional: si falla, solo se pierde el atajo
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _desalojar_disco():
+    """Elimina los archivos menos usados hasta quedar bajo LIMITE_DISCO."""
+    archivos = []
+    for entrada in os.scandir(CACHE_DIR):
+        if entrada.name.endswith(EXTENSION_DISCO):
+            info = entrada.stat()
+            archivos.append((info.st_mtime, info.st_size, entrada.path))
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, ruta in sorted(archivos):
+        if total <= LIMITE_DISCO:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamano
+        except OSError:
+            pass
+
+
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
+
+def _clave(tipo, file):
+    return f"{tipo}-v{VERSION_CACHE}-{huella_archivo(file)}"
+
+
+def en_cache(tipo, file):
+    """True si el archivo ya fue procesado con ese tipo (en memoria o en disco)."""
+    clave = _clave(tipo, file)
+    with _lock:
+        if clave in _memoria:
+            return True
+    return os.path.exists(_ruta_disco(clave))
+
+
+def cargar_con_cache(tipo, file, cargador):
+    """
+    Devuelve cargador(file) reutilizando el resultado si el mismo contenido
+    ya fue procesado con el mismo tipo de cargador ('postulantes',
+    'instrumento', 'fa'). Busca primero en memoria y luego en disco.
+
+    Se devuelve una copia para que el llamador pueda modificarla.
+    """
+    clave = _clave(tipo, file)
+
+    df = _leer_memoria(clave)
+    if df is None:
+        df = _leer_disco(clave)
+        if df is None:
+            df = cargador(file)
+            _guardar_disco(clave, df)
+        _guardar_memoria(clave, df)
+    return df.copy()
+
+
+def limpiar_cache():
+    """Vacía el nivel de memoria (el de disco se desaloja por tamaño)."""
+    global _bytes_memoria
+    with _lock:
+        _memoria.clear()
+        _bytes_memoria = 0
@@ -0,0 +1,327 @@
+# funciones_carga.py
+# ============================================================
+# Módulo de carga de archivos Excel (Postulantes, Instrumentos, FA)
+# ============================================================
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from funciones_cache import cargar_con_cache, en_cache
+from funciones_errores import ArchivoInvalido, ConfiguracionInvalida, EntradaFaltante
+
+
+# Columnas que usan las hojas OP1 y OP2 de los archivos de Instrumentos / FA
+COLUMNAS_INVENTARIO = ["Sede Operativa", "Local", "Tipo", "Inventario en campo"]
+COLUMNAS_POSTULANTES = ["Postulantes", "Asistencia al Local", "Asistencia en Aula", "Casos de inconsistencia"]
+
+# Solo se leen estas columnas; los textos repetidos quedan como categóricas
+# y los conteos con el entero más chico que alcance (si no son enteros, float)
+CATEGORICAS_INVENTARIO = ["Sede Operativa", "Local", "Tipo"]
+
+# Filas de datos que se acumulan antes de agregarlas (memoria acotada)
+TAMANO_BLOQUE = 50_000
+
+# Lector de Excel: "auto" (según tamaño), "openpyxl", "calamine" o "pandas"
+LECTOR = os.environ.get("PE_LECTOR", "auto")
+
+# Desde este tamaño "auto" prefiere calamine (si está instalado)
+UMBRAL_CALAMINE = int(os.environ.get("PE_LECTOR_UMBRAL_MB", 1)) * 1024 * 1024
+
+# Procesos para leer a la vez los fragmentos de un mismo archivo de inventario,
+# solo si los pendientes suman al menos el umbral (cada proceso tarda en arrancar)
+PROCESOS_FRAGMENTOS = int(os.environ.get("PE_PROCESOS_FRAGMENTOS", os.cpu_count() or 1))
+UMBRAL_FRAGMENTOS = int(os.environ.get("PE_FRAGMENTOS_UMBRAL_MB", 8)) * 1024 * 1024
+
+
+# ============================================================
+# LECTORES DE EXCEL
+#
+# Cada lector abre el archivo (aquí fallan los errores de formato o de
+# dependencias) y devuelve un iterador de tuplas con las filas de la
+# primera hoja, con None en las celdas vacías.
+# ============================================================
+
+def _abrir_openpyxl(file):
+    """openpyxl en modo streaming (read-only): memoria acotada, sin dependencias extra."""
+    wb = load_workbook(file, read_only=True, data_only=True)
+
+    def filas():
+        try:
+            ws = wb.worksheets[0]
+            ws.reset_dimensions()
+            yield from ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+
+    return filas()
+
+
+def _valor_calamine(v):
+    """
+    Celda de calamine como la devuelve openpyxl: vacía → None y número entero
+    → int (calamine da 123.0, y una sede o local con código numérico quedaría
+    "123.0" en la clave en vez de "123").
+    """
+    if v == "":
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _abrir_calamine(file):
+    """python-calamine (Rust): varias veces más rápido en exportaciones grandes."""
+    from python_calamine import load_workbook as cargar_calamine
+
+    hoja = cargar_calamine(file).get_sheet_by_index(0)
+    datos = hoja.to_python(skip_empty_area=False)
+    return (tuple(_valor_calamine(v) for v in fila) for fila in datos)
+
+
+def _abrir_pandas(file):
+    """pd.read_excel con openpyxl (el lector original), como referencia."""
+    df = pd.read_excel(file, sheet_name=0, header=None, engine="openpyxl", dtype=object)
+    df = df.astype(object).where(df.notna(), None)
+    return (tuple(fila) for fila in df.itertuples(index=False, name=None))
+
+
+LECTORES = {
+    "openpyxl": _abrir_openpyxl,
+    "calamine": _abrir_calamine,
+    "pandas": _abrir_pandas,
+}
+
+
+def tamano_archivo(file):
+    """Tamaño en bytes de una ruta, un archivo subido o un archivo en memoria."""
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    if getattr(file, "size", None) is not None:
+        return file.size
+    posicion = file.tell()
+    file.seek(0, os.SEEK_END)
+    tamano = file.tell()
+    file.seek(posicion)
+    return tamano
+
+
+def elegir_lectores(file, lector=None):
+    """Orden de lectores a intentar: el pedido (o el elegido por tamaño) y openpyxl como respaldo."""
+    lector = lector or LECTOR
+    if lector == "auto":
+        lector = "calamine" if tamano_archivo(file) >= UMBRAL_CALAMINE else "openpyxl"
+    if lector not in LECTORES:
+        raise ConfiguracionInvalida(f"❌ Lector de Excel desconocido: '{lector}' (opciones: auto, {', '.join(LECTORES)})")
+    return [lector] if lector == "openpyxl" else [lector, "openpyxl"]
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def leer_filas(file, lector=None):
+    """
+    Recorre las filas de la primera hoja con el lector configurado. Si el
+    lector no está instalado o no puede abrir el archivo, usa openpyxl; si
+    tampoco puede, lanza ArchivoInvalido.
+    """
+    error = None
+    for nombre in elegir_lectores(file, lector):
+        if hasattr(file, "seek"):
+            file.seek(0)
+        try:
+            filas = LECTORES[nombre](file)
+        except Exception as e:
+            error = e
+            continue
+        yield from filas
+        return
+    raise ArchivoInvalido(f"❌ No se pudo abrir el archivo como Excel: {error}") from error
+
+
+def a_numero(valor):
+    """Convierte una celda a número; lo no numérico cuenta como 0."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return 0 if valor != valor else valor
+    try:
+        return float(str(valor).strip())
+    except (TypeError, ValueError):
+        return 0
+
+
+def compactar(df, categoricas=(), conteos=()):
+    """Pasa las columnas de texto a categóricas y los conteos al menor tipo entero posible."""
+    for c in categoricas:
+        df[c] = df[c].astype("category")
+    for c in conteos:
+        df[c] = pd.to_numeric(df[c], downcast="integer")
+    return df
+
+
+def validar_columnas(encabezado, requeridas):
+    """Falla antes de leer los datos si el encabezado no tiene todas las columnas requeridas."""
+    faltantes = [c for c in requeridas if c not in encabezado]
+    if faltantes:
+        raise ArchivoInvalido(f"❌ Faltan columnas en el archivo: {', '.join(faltantes)}")
+
+
+def detectar_columna_sede(columnas):
+    """Devuelve la columna de sede entre los nombres de encabezado."""
+    for c in columnas:
+        if any(x in str(c).lower() for x in ["sede", "operativa", "evaluación", "aplicación"]):
+            return c
+    raise ArchivoInvalido("❌ No se encontró columna de sede válida.")
+
+
+# ============================================================
+# POSTULANTES
+# ============================================================
+
+def cargar_postulantes(file):
+    """
+    Lee un archivo de Postulantes en una sola pasada: detecta la fila cuyo
+    primer valor es 'N' y suma por sede las COLUMNAS_POSTULANTES (las demás
+    columnas no se leen).
+    """
+    totales = {}
+    indices = None
+    for fila in leer_filas(file):
+        if indices is None:
+            if fila and str(fila[0]).upper() == "N":
+                encabezado = list(fila)
+                i_sede = encabezado.index(detectar_columna_sede(encabezado))
+                validar_columnas(encabezado, COLUMNAS_POSTULANTES)
+                indices = {c: encabezado.index(c) for c in COLUMNAS_POSTULANTES}
+            continue
+
+        sede = fila[i_sede] if i_sede < len(fila) else None
+        if sede is None or sede != sede:
+            continue
+        acumulado = totales.setdefault(sede, dict.fromkeys(indices, 0))
+        for c, i in indices.items():
+            if i < len(fila) and fila[i] is not None:
+                acumulado[c] += a_numero(fila[i])
+
+    if indices is None:
+        raise ArchivoInvalido("❌ No se encontró cabecera con 'N'.")
+
+    df = pd.DataFrame.from_dict(totales, orient="index", columns=list(indices))
+    return compactar(df.rename_axis("Sede").reset_index(), conteos=COLUMNAS_POSTULANTES)
+
+
+# ============================================================
+# INSTRUMENTOS / FA
+# ============================================================
+
+def _agregar_bloque(filas, agregado):
+    """Suma un bloque de filas (sede, local, tipo, inventario) al agregado parcial."""
+    sede_col, local_col, tipo_col, inv_col = COLUMNAS_INVENTARIO
+    bloque = pd.DataFrame(filas, columns=COLUMNAS_INVENTARIO)
+    bloque[inv_col] = pd.to_numeric(bloque[inv_col], errors="coerce")
+    if agregado is not None:
+        bloque = pd.concat([agregado, bloque], ignore_index=True)
+    return (
+        bloque.groupby([sede_col, local_col, tipo_col], dropna=False, sort=False)[inv_col]
+        .sum()
+        .reset_index()
+    )
+
+
+def cargar_excel_con_encabezado_correcto(file, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Detecta la fila donde aparece 'Sede Operativa', la usa como encabezado y
+    agrega las filas de datos por (sede, local, tipo) en la misma pasada.
+
+    Devuelve un DataFrame con COLUMNAS_INVENTARIO (sede, local y tipo como
+    categóricas); la memoria queda acotada por el tamaño del bloque y la
+    cantidad de combinaciones distintas.
+    """
+    indices = None
+    filas, agregado = [], None
+    for fila in leer_filas(file):
+        if indices is None:
+            if any(v is not None and "sede operativa" in str(v).lower() for v in fila):
+                encabezado = [str(v).strip() for v in fila]
+                validar_columnas(encabezado, COLUMNAS_INVENTARIO)
+                indices = [encabezado.index(c) for c in COLUMNAS_INVENTARIO]
+            continue
+
+        valores = tuple(fila[i] if i < len(fila) else None for i in indices)
+        if all(v is None for v in valores):
+            continue
+        filas.append(valores)
+        if len(filas) >= tamano_bloque:
+            agregado = _agregar_bloque(filas, agregado)
+            filas = []
+
+    if indices is None:
+        raise ArchivoInvalido("❌ No se encontró la fila con 'Sede Operativa' en el archivo.")
+    return compactar(_agregar_bloque(filas, agregado), CATEGORICAS_INVENTARIO, ["Inventario en campo"])
+
+
+def combinar_agregados(partes):
+    """
+    Suma los agregados parciales (uno por fragmento) por (sede, local, tipo).
+    El resultado es el mismo que si los fragmentos fueran un solo archivo.
+    """
+    if len(partes) == 1:
+        return partes[0]
+    sede_col, local_col, tipo_col, inv_col = COLUMNAS_INVENTARIO
+    bloque = pd.concat([p.astype({c: object for c in CATEGORICAS_INVENTARIO}) for p in partes], ignore_index=True)
+    agregado = (
+        bloque.groupby([sede_col, local_col, tipo_col], dropna=False, sort=False)[inv_col]
+        .sum()
+        .reset_index()
+    )
+    return compactar(agregado, CATEGORICAS_INVENTARIO, [inv_col])
+
+
+def _cargar_fragmento(tipo, fragmento):
+    """Trabajo de un proceso: agrega un fragmento y lo deja en la caché de disco."""
+    if isinstance(fragmento, bytes):
+        fragmento = BytesIO(fragmento)
+    return cargar_con_cache(tipo, fragmento, cargar_excel_con_encabezado_correcto)
+
+
+def cargar_inventario(tipo, archivos, procesos=None):
+    """
+    Carga un archivo de Instrumentos / FA ('instrumento' o 'fa') o la lista de
+    sus fragmentos (p. ej. uno por región). Cada fragmento se agrega por
+    separado y queda en la caché; si los que faltan procesar son grandes se
+    leen en paralelo, un proceso por fragmento. Al final se suman los cubos
+    parciales.
+
+    Dentro de un proceso de un pool (la cola de la app, lote_pe3) se leen en
+    serie salvo que se pasen `procesos`: el pool ya fija cuántos procesos hay.
+    """
+    archivos = list(archivos) if isinstance(archivos, (list, tuple)) else [archivos]
+    if not archivos:
+        raise EntradaFaltante("❌ No se recibió ningún archivo.")
+    if procesos is None:
+        procesos = 1 if multiprocessing.parent_process() is not None else PROCESOS_FRAGMENTOS
+
+    partes = {}
+    pendientes = [i for i, f in enumerate(archivos) if not en_cache(tipo, f)]
+    if (
+        procesos > 1 and len(pendientes) > 1
+        and sum(tamano_archivo(archivos[i]) for i in pendientes) >= UMBRAL_FRAGMENTOS
+    ):
+        with ProcessPoolExecutor(
+            max_workers=min(procesos, len(pendientes)), mp_context=multiprocessing.get_context("spawn")
+        ) as ejecutor:
+            futuros = {}
+            for i in pendientes:
+                f = archivos[i]
+                fragmento = f if isinstance(f, (str, os.PathLike)) else f.getvalue()
+                futuros[i] = ejecutor.submit(_cargar_fragmento, tipo, fragmento)
+            partes = {i: futuro.result() for i, futuro in futuros.items()}
+
+    return combinar_agregados([
+        partes[i] if i in partes else cargar_con_cache(tipo, f, cargar_excel_con_encabezado_correcto)
+        for i, f in enumerate(archivos)
+    ])
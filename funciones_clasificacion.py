@@ -0,0 +1,56 @@
+# funciones_clasificacion.py
+# ============================================================
+# Clasificación de los archivos de entrada según su nombre
+# ============================================================
+
+# Instrumentos y FA pueden llegar partidos en varios archivos (p. ej. uno
+# por región): se guardan todos, en orden, como fragmentos del mismo archivo
+FRAGMENTADOS = ("asc_inst", "nom_inst", "acc_inst", "asc_fa", "acc_fa")
+
+
+def fragmentos(archivo):
+    """Lista de archivos de una entrada clasificada (vacía si falta)."""
+    if archivo is None:
+        return []
+    return list(archivo) if isinstance(archivo, (list, tuple)) else [archivo]
+
+
+def clasificar_archivos(lista_archivos):
+    """
+    Clasifica los archivos según su nombre (archivos subidos o rutas de pathlib).
+    Postulantes: un archivo por clave (el último). Instrumentos / FA: lista de fragmentos.
+    """
+    resultado = {
+        "asc": None, "nom": None, "acc": None,
+        "asc_inst": [], "nom_inst": [], "acc_inst": [],
+        "asc_fa": [], "acc_fa": [],
+    }
+
+    def agregar(clave, file):
+        if clave in FRAGMENTADOS:
+            resultado[clave].append(file)
+        else:
+            resultado[clave] = file
+
+    for file in lista_archivos:
+        nombre = file.name.upper().replace(" ", "")
+        if "POSTULANTE" in nombre:
+            if "ASC" in nombre:
+                agregar("asc", file)
+            elif "NOM" in nombre:
+                agregar("nom", file)
+            elif "ACC" in nombre:
+                agregar("acc", file)
+        elif "INSTRUMENTO" in nombre:
+            if "ASC" in nombre:
+                agregar("asc_inst", file)
+            elif "NOM" in nombre:
+                agregar("nom_inst", file)
+            elif "ACC" in nombre:
+                agregar("acc_inst", file)
+        elif "FA" in nombre:
+            if "ASC" in nombre:
+                agregar("asc_fa", file)
+            elif "ACC" in nombre:
+                agregar("acc_fa", file)
+    return resultado
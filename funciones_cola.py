@@ -0,0 +1,257 @@
+# funciones_cola.py
+# ============================================================
+# Cola de trabajos compartida por todas las sesiones de la app
+#
+# Un solo pool de procesos de tamaño fijo hace todo el trabajo pesado
+# (reportes y reporte final). Los trabajos esperan en una cola propia, en
+# orden de llegada, así cada sesión puede ver su posición; si la cola está
+# llena el trabajo nuevo se rechaza (ColaLlena) en vez de saturar el
+# servidor. Si dos sesiones piden el mismo trabajo (mismas entradas) mientras
+# el primero sigue en curso, ambas esperan al mismo.
+#
+# La lectura anticipada de archivos subidos es trabajo especulativo: espera
+# en una cola aparte con su propio límite y solo toma un proceso cuando no
+# hay reportes esperando, así nunca hace rechazar ni demorar un reporte.
+#
+# Variables de entorno:
+#   PE_PROCESOS=N       procesos del pool (por omisión uno por núcleo)
+#   PE_COLA_MAX=N       reportes que pueden esperar en la cola (20)
+#   PE_PRECARGA_MAX=N   lecturas anticipadas que pueden esperar (20)
+# ============================================================
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+from funciones_artefactos import clave_combinada
+from funciones_errores import ErrorReporte
+from funciones_paralelo import REPORTES, crear_ejecutor, ejecutar_combinacion, ejecutar_reporte, precargar_archivo
+from funciones_reportes import serializar_entrada
+
+
+PROCESOS = int(os.environ.get("PE_PROCESOS", 0)) or max(len(REPORTES), os.cpu_count() or 1)
+LIMITE_COLA = int(os.environ.get("PE_COLA_MAX", 20))
+LIMITE_PRECARGA = int(os.environ.get("PE_PRECARGA_MAX", 20))
+
+_cola = None
+_lock_cola = threading.Lock()
+
+
+class ColaLlena(ErrorReporte):
+    """La cola alcanzó su límite: el trabajo no se admite."""
+
+
+# ============================================================
+# TRABAJO Y COLA
+# ============================================================
+
+class Trabajo:
+    """Un trabajo de la cola; lo comparten todas las sesiones que lo pidieron."""
+
+    def __init__(self, clave, tipo, funcion, args):
+        self.clave = clave
+        self.tipo = tipo  # hoja o "FINAL": agrupa las duraciones para estimar el avance
+        self.funcion = funcion
+        self.args = args
+        self.encolado = time.time()
+        self.inicio = None
+        self.fin = None
+        self.resultado = None
+        self.error = None
+        self.sesiones = 1
+        self.listo = threading.Event()
+
+    def esperar(self, timeout=None):
+        """Resultado del trabajo (lanza su error si falló)."""
+        self.listo.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.resultado
+
+
+class ColaTrabajos:
+    """
+    Cola acotada en orden de llegada frente a un pool de procesos fijo. Solo
+    se envían al pool tantos trabajos como procesos tiene; el resto espera
+    aquí, donde se conoce su posición. Los trabajos especulativos esperan
+    aparte (con `limite_precarga`) y pasan después de los demás.
+    """
+
+    def __init__(self, procesos=PROCESOS, limite=LIMITE_COLA, limite_precarga=LIMITE_PRECARGA):
+        self.procesos = procesos
+        self.limite = limite
+        self.limite_precarga = limite_precarga
+        self._ejecutor = None
+        self._espera = deque()
+        self._precargas = deque()  # trabajos especulativos en espera
+        self._activos = {}  # clave → Trabajo en cola o en proceso
+        self._en_proceso = 0
+        self._duraciones = {}  # tipo → media móvil de segundos
+        self._lock = threading.RLock()
+
+    def ejecutor(self):
+        """El pool de procesos (también lo usa la lectura anticipada de archivos)."""
+        with self._lock:
+            if self._ejecutor is None:
+                self._ejecutor = crear_ejecutor(self.procesos)
+            return self._ejecutor
+
+    def descartar_ejecutor(self, ejecutor=None):
+        """Descarta un pool roto; el siguiente trabajo crea otro."""
+        with self._lock:
+            if self._ejecutor is not None and ejecutor in (None, self._ejecutor):
+                self._ejecutor.shutdown(wait=False, cancel_futures=True)
+                self._ejecutor = None
+
+    def enviar(self, clave, tipo, funcion, *args, especulativo=False):
+        """
+        Encola funcion(*args) y devuelve (trabajo, nuevo). Si ya hay un trabajo
+        con la misma clave en curso se devuelve ese (nuevo=False). Lanza
+        ColaLlena si hay `limite` trabajos esperando (`limite_precarga` si es
+        especulativo; esos no cuentan para el límite de los demás).
+        """
+        with self._lock:
+            trabajo = self._activos.get(clave)
+            if trabajo is not None:
+                trabajo.sesiones += 1
+                return trabajo, False
+            espera, limite = (self._precargas, self.limite_precarga) if especulativo else (self._espera, self.limite)
+            if len(espera) >= limite:
+                raise ColaLlena(
+                    f"⏳ El servidor está ocupado ({len(espera)} trabajos en espera). Intenta en unos minutos."
+                )
+            trabajo = Trabajo(clave, tipo, funcion, args)
+            self._activos[clave] = trabajo
+            espera.append(trabajo)
+            self._despachar()
+        return trabajo, True
+
+    def estado(self, trabajo):
+        """
+        {"estado": "en cola" | "en proceso" | "listo" | "error", "posicion",
+        "segundos", "progreso"}. El progreso (0 a 1, o None) se estima con la
+        duración media de los trabajos anteriores del mismo tipo.
+        """
+        with self._lock:
+            if trabajo.listo.is_set():
+                return {"estado": "error" if trabajo.error else "listo", "posicion": 0,
+                        "segundos": round(trabajo.fin - trabajo.encolado, 1), "progreso": 1.0}
+            if trabajo.inicio is None:
+                posicion = next((i for i, t in enumerate([*self._espera, *self._precargas], 1) if t is trabajo), 0)
+                return {"estado": "en cola", "posicion": posicion,
+                        "segundos": round(time.time() - trabajo.encolado, 1), "progreso": 0.0}
+            transcurrido = time.time() - trabajo.inicio
+            media = self._duraciones.get(trabajo.tipo)
+            return {"estado": "en proceso", "posicion": 0, "segundos": round(transcurrido, 1),
+                    "progreso": min(0.95, transcurrido / media) if media else None}
+
+    def resumen(self):
+        """Trabajos en proceso y en espera (para mostrar la carga del servidor)."""
+        with self._lock:
+            return {"en_proceso": self._en_proceso, "en_cola": len(self._espera),
+                    "precargas": len(self._precargas), "procesos": self.procesos}
+
+    def _despachar(self):
+        """
+        Envía al pool los primeros de la cola mientras haya procesos libres (con
+        el lock tomado); los especulativos solo si no espera ningún otro.
+        """
+        while (self._espera or self._precargas) and self._en_proceso < self.procesos:
+            trabajo = (self._espera or self._precargas).popleft()
+            trabajo.inicio = time.time()
+            self._en_proceso += 1
+            try:
+                ejecutor = self.ejecutor()
+                try:
+                    futuro = ejecutor.submit(trabajo.funcion, *trabajo.args)
+                except (BrokenProcessPool, RuntimeError):
+                    # Pool roto o cerrado: se reemplaza y se reintenta una vez
+                    self.descartar_ejecutor(ejecutor)
+                    ejecutor = self.ejecutor()
+                    futuro = ejecutor.submit(trabajo.funcion, *trabajo.args)
+            except Exception as e:
+                # Tampoco con un pool nuevo: el trabajo falla y libera su lugar
+                self._fallar(trabajo, e)
+                continue
+            futuro.add_done_callback(lambda f, t=trabajo, e=ejecutor: self._terminado(t, f, e))
+
+    def _fallar(self, trabajo, error):
+        """Termina con `error` un trabajo que no se pudo enviar al pool (con el lock tomado)."""
+        self._en_proceso -= 1
+        trabajo.fin = time.time()
+        if self._activos.get(trabajo.clave) is trabajo:
+            del self._activos[trabajo.clave]
+        trabajo.error = error
+        trabajo.listo.set()
+
+    def _terminado(self, trabajo, futuro, ejecutor):
+        error = futuro.exception()
+        with self._lock:
+            self._en_proceso -= 1
+            trabajo.fin = time.time()
+            if self._activos.get(trabajo.clave) is trabajo:
+                del self._activos[trabajo.clave]
+            if error is None:
+                duracion = trabajo.fin - trabajo.inicio
+                media = self._duraciones.get(trabajo.tipo)
+                self._duraciones[trabajo.tipo] = duracion if media is None else 0.7 * media + 0.3 * duracion
+            elif isinstance(error, BrokenProcessPool):
+                self.descartar_ejecutor(ejecutor)
+            self._despachar()
+        trabajo.error = error
+        trabajo.resultado = None if error else futuro.result()
+        trabajo.listo.set()
+
+
+def obtener_cola():
+    """La cola del proceso (compartida por todas las sesiones de Streamlit)."""
+    global _cola
+    with _lock_cola:
+        if _cola is None:
+            _cola = ColaTrabajos()
+        return _cola
+
+
+# ============================================================
+# TRABAJOS DE LA APP
+# ============================================================
+
+def enviar_reporte(hoja, base, archivos, anterior=None):
+    """
+    Encola la generación de un reporte. `base` es la plantilla de la hoja y
+    `archivos` sus entradas en el orden de REPORTES (archivo o fragmentos).
+    Devuelve (trabajo, nuevo); el resultado es el de ejecutar_reporte (con
+    la "clave" del libro en el almacén).
+    """
+    base = serializar_entrada(base)
+    archivos = [serializar_entrada(a) for a in archivos]
+    # La clave no incluye `anterior`: la actualización incremental da el mismo libro
+    clave = clave_combinada("reporte", hoja, base, *[a for x in archivos for a in (x if isinstance(x, list) else [x])])
+    return obtener_cola().enviar(clave, hoja, ejecutar_reporte, hoja, base, archivos, anterior)
+
+
+def enviar_precarga(tipo, contenido):
+    """
+    Encola la lectura anticipada de un archivo subido (precargar_archivo) y
+    devuelve el trabajo. Espera en la cola de trabajos especulativos, así que
+    no le quita lugar a los reportes; lanza ColaLlena si esa cola está llena.
+    """
+    clave = clave_combinada("precarga", tipo, contenido)
+    trabajo, _ = obtener_cola().enviar(clave, "precarga", precargar_archivo, tipo, contenido, especulativo=True)
+    return trabajo
+
+
+def enviar_combinacion(plantilla_path, rutas, clave):
+    """Encola el reporte final (combinar_reportes) con clave de artefacto `clave`."""
+    return obtener_cola().enviar(f"final-{clave}", "FINAL", ejecutar_combinacion, plantilla_path, rutas, clave)
+
+
+def texto_estado(estado):
+    """Descripción breve del estado de un trabajo para la interfaz."""
+    if estado["estado"] == "en cola":
+        return f"en cola (posición {estado['posicion']}, {estado['segundos']} s)"
+    if estado["estado"] == "en proceso":
+        return f"procesando ({estado['segundos']} s)"
+    return f"terminado en {estado['segundos']} s"
@@ -0,0 +1,324 @@
+# funciones_combinar.py
+# ============================================================
+# Módulo para combinar los reportes (Asistencia, OP1, OP2)
+# en la plantilla, trabajando directamente sobre el paquete .xlsx
+# ============================================================
+
+import hashlib
+import posixpath
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+from xml.etree import ElementTree as ET
+
+from funciones_errores import PlantillaInvalida
+from funciones_instrumentacion import etapa
+from funciones_plantilla import contenido_plantilla
+
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+REL_TABLA = NS_REL + "/table"
+REL_CALCCHAIN = NS_REL + "/calcChain"
+
+# Colecciones de styles.xml que se agregan al combinar: (colección, elemento)
+COLECCIONES_ESTILO = [
+    ("fonts", "font"),
+    ("fills", "fill"),
+    ("borders", "border"),
+    ("cellXfs", "xf"),
+    ("dxfs", "dxf"),
+]
+
+MAX_RESULTADOS = 8
+_resultados = OrderedDict()  # huella de las entradas → bytes del libro combinado
+_lock = threading.Lock()
+
+
+# ============================================================
+# LECTURA DEL PAQUETE
+# ============================================================
+
+def _bytes(archivo):
+    if isinstance(archivo, (bytes, bytearray)):
+        return bytes(archivo)
+    if hasattr(archivo, "getvalue"):
+        return archivo.getvalue()
+    with open(archivo, "rb") as f:
+        return f.read()
+
+
+def _resolver(base, destino):
+    """Ruta de una parte a partir del destino de una relación."""
+    if destino.startswith("/"):
+        return destino.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), destino))
+
+
+def _ruta_rels(parte):
+    carpeta, nombre = posixpath.split(parte)
+    return posixpath.join(carpeta, "_rels", nombre + ".rels")
+
+
+def _relaciones(zf, parte):
+    """Lista de (Id, Type, ruta destino) de una parte; vacía si no tiene .rels."""
+    try:
+        raiz = ET.fromstring(zf.read(_ruta_rels(parte)))
+    except KeyError:
+        return []
+    return [
+        (r.get("Id"), r.get("Type"), _resolver(parte, r.get("Target")))
+        for r in raiz.iter(f"{{{NS_PKG_REL}}}Relationship")
+    ]
+
+
+def _hojas(zf):
+    """Devuelve [(nombre de hoja, ruta de la parte)] en el orden del libro."""
+    rutas = {rid: destino for rid, _, destino in _relaciones(zf, "xl/workbook.xml")}
+    raiz = ET.fromstring(zf.read("xl/workbook.xml"))
+    return [
+        (h.get("name"), rutas[h.get(f"{{{NS_REL}}}id")])
+        for h in raiz.iter(f"{{{NS_MAIN}}}sheet")
+    ]
+
+
+def _tablas_por_nombre(zf, parte):
+    """{nombre de tabla: Id de la relación} para una hoja."""
+    tablas = {}
+    for rid, tipo, destino in _relaciones(zf, parte):
+        if tipo == REL_TABLA:
+            tablas[ET.fromstring(zf.read(destino)).get("name")] = rid
+    return tablas
+
+
+def _pide_recalculo(workbook):
+    """True si el libro generado pide recálculo al abrir (fórmulas sin valor en caché)."""
+    calc = re.search(r"<calcPr\b[^>]*>", workbook)
+    return calc is not None and _atributo(calc.group(0), "fullCalcOnLoad") in ("1", "true")
+
+
+# ============================================================
+# FUSIÓN DE ESTILOS
+# ============================================================
+
+def _hijos(xml, coleccion, elemento):
+    m = re.search(rf"<{coleccion}\b[^>]*?(?:/>|>(.*?)</{coleccion}>)", xml, re.S)
+    if m is None or not m.group(1):
+        return []
+    return re.findall(rf"<{elemento}\b[^>]*/>|<{elemento}\b[^>]*>.*?</{elemento}>", m.group(1), re.S)
+
+
+def _agregar_hijos(xml, coleccion, nuevos, total):
+    """Añade elementos al final de una colección y actualiza su atributo count."""
+    m = re.search(rf"<{coleccion}\b([^>]*?)(/?)>", xml)
+    if m is None:
+        if coleccion == "numFmts":
+            destino = re.search(r"<styleSheet\b[^>]*>", xml).end()
+        else:
+            destino = re.search(r"<tableStyles\b|<colors\b|<extLst\b|</styleSheet>", xml).start()
+        bloque = f'<{coleccion} count="{total}">{"".join(nuevos)}</{coleccion}>'
+        return xml[:destino] + bloque + xml[destino:]
+
+    atributos = re.sub(r'\s*\bcount="\d+"', "", m.group(1))
+    inicio = f'<{coleccion} count="{total}"{atributos}>'
+    if m.group(2):
+        return xml[:m.start()] + inicio + "".join(nuevos) + f"</{coleccion}>" + xml[m.end():]
+    cierre = xml.index(f"</{coleccion}>", m.end())
+    return xml[:m.start()] + inicio + xml[m.end():cierre] + "".join(nuevos) + xml[cierre:]
+
+
+def _atributo(elemento, nombre):
+    m = re.search(rf'\b{nombre}="([^"]*)"', elemento)
+    return m.group(1) if m else None
+
+
+def _fusionar_estilos(base, agregado):
+    """
+    Agrega los estilos de un libro generado al styles.xml de la plantilla.
+    Devuelve el nuevo XML y los desplazamientos {colección: primer índice nuevo}.
+    """
+    # Formatos numéricos: se reutiliza el id si el formato ya existe
+    existentes = {_atributo(n, "formatCode"): _atributo(n, "numFmtId") for n in _hijos(base, "numFmts", "numFmt")}
+    siguiente = max([163] + [int(i) for i in existentes.values()]) + 1
+    mapa_numfmt, nuevos = {}, []
+    for n in _hijos(agregado, "numFmts", "numFmt"):
+        codigo, id_viejo = _atributo(n, "formatCode"), _atributo(n, "numFmtId")
+        if codigo not in existentes:
+            existentes[codigo] = str(siguiente)
+            nuevos.append(re.sub(r'\bnumFmtId="\d+"', f'numFmtId="{siguiente}"', n))
+            siguiente += 1
+        mapa_numfmt[id_viejo] = existentes[codigo]
+    if nuevos:
+        base = _agregar_hijos(base, "numFmts", nuevos, len(existentes))
+
+    desplazamientos = {}
+    for coleccion, elemento in COLECCIONES_ESTILO:
+        desplazamientos[coleccion] = len(_hijos(base, coleccion, elemento))
+
+    def reubicar_xf(m):
+        nombre, valor = m.group(1), m.group(2)
+        if nombre == "numFmtId":
+            valor = mapa_numfmt.get(valor, valor)
+        elif nombre == "xfId":
+            valor = "0"
+        else:
+            valor = str(int(valor) + desplazamientos[nombre[:-2].lower() + "s"])
+        return f'{nombre}="{valor}"'
+
+    for coleccion, elemento in COLECCIONES_ESTILO:
+        nuevos = _hijos(agregado, coleccion, elemento)
+        if coleccion == "cellXfs":
+            nuevos = [re.sub(r'\b(fontId|fillId|borderId|numFmtId|xfId)="(\d+)"', reubicar_xf, xf) for xf in nuevos]
+        if nuevos:
+            total = desplazamientos[coleccion] + len(nuevos)
+            base = _agregar_hijos(base, coleccion, nuevos, total)
+    return base, desplazamientos
+
+
+# ============================================================
+# REUBICACIÓN DE LA HOJA GENERADA
+# ============================================================
+
+def _desplazar(atributo, desplazamiento):
+    patron = re.compile(rf'\b{atributo}="(\d+)"')
+    return lambda m: patron.sub(lambda n: f'{atributo}="{int(n.group(1)) + desplazamiento}"', m.group(0))
+
+
+def _reubicar_hoja(xml, desplazamientos, mapa_tablas, cadenas, seleccionada):
+    """Ajusta los índices de estilo, dxf, tablas y cadenas de la hoja generada."""
+    if cadenas is not None:
+        xml = re.sub(
+            r'<c\b([^>]*?)\bt="s"([^>]*)>\s*<v>(\d+)</v>\s*</c>',
+            lambda m: f'<c{m.group(1)}t="inlineStr"{m.group(2)}><is>{cadenas[int(m.group(3))]}</is></c>',
+            xml,
+        )
+    xml = re.sub(r"<(?:c|row)\b[^>]*>", _desplazar("s", desplazamientos["cellXfs"]), xml)
+    xml = re.sub(r"<col\b[^>]*>", _desplazar("style", desplazamientos["cellXfs"]), xml)
+    xml = re.sub(r"<cfRule\b[^>]*>", _desplazar("dxfId", desplazamientos["dxfs"]), xml)
+    xml = re.sub(
+        r'(<tablePart\b[^>]*\br:id=")([^"]+)"',
+        lambda m: f'{m.group(1)}{mapa_tablas[m.group(2)]}"',
+        xml,
+    )
+    if not seleccionada:
+        xml = re.sub(r'\s+tabSelected="1"', "", xml)
+    return xml
+
+
+def _cadenas_compartidas(zf):
+    """Contenido de cada <si> si el libro usa sharedStrings (openpyxl escribe inlineStr)."""
+    try:
+        sst = zf.read("xl/sharedStrings.xml").decode("utf-8")
+    except KeyError:
+        return None
+    return [m.group(1) or "" for m in re.finditer(r"<si\b[^>]*?(?:/>|>(.*?)</si>)", sst, re.S)]
+
+
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
+
+def _empalmar(plantilla, generados):
+    """Copia la plantilla reemplazando las partes de las hojas generadas."""
+    reemplazos, eliminar = {}, {"xl/calcChain.xml"}
+    recalcular = False
+
+    with zipfile.ZipFile(BytesIO(plantilla)) as zp:
+        hojas_plantilla = dict(_hojas(zp))
+        orden = list(hojas_plantilla)
+        workbook = zp.read("xl/workbook.xml").decode("utf-8")
+        activa = int(_atributo(re.search(r"<workbookView\b[^>]*>", workbook).group(0), "activeTab") or 0)
+        estilos = zp.read("xl/styles.xml").decode("utf-8")
+
+        for contenido in generados:
+            with zipfile.ZipFile(BytesIO(contenido)) as zg:
+                recalcular = recalcular or _pide_recalculo(zg.read("xl/workbook.xml").decode("utf-8"))
+                estilos, desplazamientos = _fusionar_estilos(estilos, zg.read("xl/styles.xml").decode("utf-8"))
+                cadenas = _cadenas_compartidas(zg)
+
+                for nombre, parte in _hojas(zg):
+                    if nombre not in hojas_plantilla:
+                        raise PlantillaInvalida(f"❌ La hoja '{nombre}' no existe en la plantilla.")
+                    destino = hojas_plantilla[nombre]
+
+                    tablas_plantilla = _tablas_por_nombre(zp, destino)
+                    mapa_tablas = {}
+                    for rid, tipo, ruta in _relaciones(zg, parte):
+                        if tipo != REL_TABLA:
+                            raise PlantillaInvalida(f"❌ La hoja '{nombre}' tiene partes no soportadas ({tipo}).")
+                        tabla = ET.fromstring(zg.read(ruta)).get("name")
+                        if tabla not in tablas_plantilla:
+                            raise PlantillaInvalida(f"❌ La tabla '{tabla}' no existe en la plantilla.")
+                        mapa_tablas[rid] = tablas_plantilla[tabla]
+
+                    xml = _reubicar_hoja(
+                        zg.read(parte).decode("utf-8"), desplazamientos, mapa_tablas, cadenas,
+                        seleccionada=orden.index(nombre) == activa,
+                    )
+                    reemplazos[destino] = xml.encode("utf-8")
+
+        # Recalcular al abrir solo si algún reporte quedó sin valores en caché o si
+        # otras hojas de la plantilla tienen fórmulas (podrían depender de las generadas)
+        recalcular = recalcular or any(
+            b"<f" in zp.read(parte) for parte in hojas_plantilla.values() if parte not in reemplazos
+        )
+        workbook = re.sub(r'\s+fullCalcOnLoad="[^"]*"', "", workbook)
+        if recalcular and "<calcPr" in workbook:
+            workbook = re.sub(r"<calcPr\b", '<calcPr fullCalcOnLoad="1"', workbook, count=1)
+        elif recalcular:
+            fin = "</definedNames>" if "</definedNames>" in workbook else "</sheets>"
+            workbook = workbook.replace(fin, fin + '<calcPr fullCalcOnLoad="1"/>', 1)
+        reemplazos["xl/workbook.xml"] = workbook.encode("utf-8")
+        reemplazos["xl/styles.xml"] = estilos.encode("utf-8")
+
+        # calcChain describe las fórmulas de la plantilla, ya no es válido
+        rels = zp.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        reemplazos["xl/_rels/workbook.xml.rels"] = re.sub(
+            rf'<Relationship\b[^>]*Type="{re.escape(REL_CALCCHAIN)}"[^>]*/>', "", rels
+        ).encode("utf-8")
+        tipos = zp.read("[Content_Types].xml").decode("utf-8")
+        reemplazos["[Content_Types].xml"] = re.sub(
+            r'<Override\b[^>]*PartName="/xl/calcChain.xml"[^>]*/>', "", tipos
+        ).encode("utf-8")
+
+        out = BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zs:
+            for info in zp.infolist():
+                if info.filename in eliminar:
+                    continue
+                zs.writestr(info, reemplazos.get(info.filename) or zp.read(info.filename),
+                            compress_type=zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def combinar_reportes(plantilla_path, asistencia, op1, op2):
+    """
+    Combina los tres reportes (Asistencia, OP1, OP2) en una sola plantilla Excel.
+
+    Las hojas generadas se insertan en el paquete de la plantilla sin volver a
+    leer sus celdas, y el resultado se memoriza por la huella de las entradas.
+    """
+    with etapa("huella"):
+        plantilla = contenido_plantilla(plantilla_path)
+        generados = [_bytes(x) for x in (asistencia, op1, op2)]
+
+        sha = hashlib.sha256(plantilla)
+        for contenido in generados:
+            sha.update(hashlib.sha256(contenido).digest())
+        clave = sha.hexdigest()
+
+    with _lock:
+        if clave in _resultados:
+            _resultados.move_to_end(clave)
+            return BytesIO(_resultados[clave])
+
+    with etapa("empalme"):
+        resultado = _empalmar(plantilla, generados)
+    with _lock:
+        _resultados[clave] = resultado
+        while len(_resultados) > MAX_RESULTADOS:
+            _resultados.popitem(last=False)
+    return BytesIO(resultado)
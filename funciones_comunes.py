@@ -0,0 +1,146 @@
+# funciones_comunes.py
+# ============================================================
+# Módulo de funciones compartidas por las hojas OP1 y OP2
+# ============================================================
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# NORMALIZACIÓN DE TEXTO
+# ============================================================
+
+COLUMNAS_CLAVE = ["Sede Operativa", "Local", "Tipo"]
+
+
+@lru_cache(maxsize=16384)
+def normalizar_texto(valor):
+    """Convierte texto a minúsculas, sin tildes ni guiones especiales."""
+    if pd.isna(valor):
+        return ""
+    return (
+        unicodedata.normalize('NFKD', str(valor).strip().lower())
+        .encode('ascii', 'ignore')
+        .decode('utf-8')
+        .replace('–', '-')
+        .replace('—', '-')
+        .replace('  ', ' ')
+    )
+
+
+def normalizar_serie(serie):
+    """
+    Normaliza una columna evaluando normalizar_texto una sola vez por valor
+    distinto y devuelve el resultado como categórica (códigos enteros).
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    normalizados = [normalizar_texto(str(v)) for v in unicos]
+    # Valores distintos pueden colapsar al normalizar ("Lima" / "LIMA")
+    codigos_norm, categorias = pd.factorize(pd.Index(normalizados, dtype=object))
+    return pd.Series(
+        pd.Categorical.from_codes(codigos_norm[codigos], categorias),
+        index=serie.index,
+        name=serie.name,
+    )
+
+
+def normalizar_columnas(df, columnas=COLUMNAS_CLAVE):
+    """Normaliza en el DataFrame las columnas de sede, local y tipo."""
+    for col in columnas:
+        df[col] = normalizar_serie(df[col])
+    return df
+
+
+# ============================================================
+# CATÁLOGO DE TIPOS
+# ============================================================
+
+# Cada 'Tipo' del inventario se clasifica en una sola categoría (id = posición).
+# Los patrones se comparan sin tildes ni mayúsculas contra el texto normalizado.
+CATALOGO_TIPOS = [
+    ("CUADERNILLO_CCPP", "CUADERNILLO DE CONOCIMIENTOS PEDAGÓG"),
+    ("CUADERNILLO_HHGG", "CUADERNILLO DE HABILIDADES GENERALES"),
+    ("FICHA_RESPUESTA", "FICHA DE RESPUESTA"),
+    ("ACTA_RECEPCION", "ACTA DE RECEPCIÓN/DEVOLUCIÓN"),
+    ("ACTA_APLICACION", "ACTA DE APLICACIÓN DEL AULA"),
+    ("LISTA_ASISTENCIA", "LISTA DE ASISTENCIA"),
+    ("LISTA_RETIRO", "LISTA DE RETIRO DE CUADERNILLOS"),
+    ("ACTA_OBSERVACIONES", "ACTA DE RESPUESTA A OBSERVACIONES DEL DOCENTE"),
+    ("REGISTRO_ADICIONALES", "REGISTRO DE ENTREGA INSTRUMENTOS ADICIONALES"),
+    ("ACTA_INCIDENCIAS_CAE", "ACTA DE INCIDENCIAS DEL CAE"),
+    ("ACTA_INCUMPLIMIENTO", "ACTA DE INCUMPLIMIENTO DE PROCEDIMIENTOS"),
+    ("ACTA_INCIDENCIAS_SALUD", "ACTA DE INCIDENCIAS DE SALUD"),
+    ("ACTA_INCIDENCIAS_LOCAL", "ACTA DE INCIDENCIAS DEL LOCAL DE EVALUACIÓN"),
+    ("ACTA_FISCAL", "ACTA FISCAL"),
+    ("SOBRE", "SOBRE"),
+]
+
+TIPO = {nombre: i for i, (nombre, _) in enumerate(CATALOGO_TIPOS)}
+SIN_CATEGORIA = -1
+
+_PATRONES_TIPOS = [re.compile(re.escape(normalizar_texto(p))) for _, p in CATALOGO_TIPOS]
+
+
+@lru_cache(maxsize=4096)
+def clasificar_tipo(valor):
+    """Devuelve el id de categoría del 'Tipo' (o SIN_CATEGORIA)."""
+    texto = normalizar_texto(valor)
+    for i, patron in enumerate(_PATRONES_TIPOS):
+        if patron.search(texto):
+            return i
+    return SIN_CATEGORIA
+
+
+def clasificar_serie(serie):
+    """Clasifica una columna 'Tipo' evaluando cada valor distinto una sola vez."""
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    ids = np.array([clasificar_tipo(str(v)) for v in unicos], dtype=np.int16)
+    return ids[codigos]
+
+
+def tipos_sin_clasificar(*dfs, tipo_col="Tipo"):
+    """Devuelve los valores distintos de 'Tipo' que no pertenecen a ninguna categoría."""
+    sin_categoria = set()
+    for df in dfs:
+        for valor in pd.unique(df[tipo_col]):
+            texto = normalizar_texto(str(valor))
+            if texto not in ("", "nan") and clasificar_tipo(texto) == SIN_CATEGORIA:
+                sin_categoria.add(texto)
+    return sorted(sin_categoria)
+
+
+# ============================================================
+# CUBO (SEDE, LOCAL, CATEGORÍA)
+# ============================================================
+
+def construir_tabla(df, sede_col="Sede Operativa", local_col="Local",
+                   tipo_col="Tipo", inv_col="Inventario en campo"):
+    """
+    Agrega el DataFrame en una sola pasada y devuelve una tabla ancha
+    indexada por (sede, local), con una columna por id de categoría y la
+    suma de inventario como valor (0 si no hay datos).
+
+    Se espera que las columnas clave ya estén normalizadas (normalizar_columnas).
+    Las filas cuyo 'Tipo' no está en CATALOGO_TIPOS no se suman.
+    """
+    categorias = clasificar_serie(df[tipo_col])
+    mask = categorias != SIN_CATEGORIA
+
+    agregado = (
+        df.loc[mask, inv_col]
+        .groupby(
+            [
+                df.loc[mask, sede_col].astype(object).rename("sede"),
+                df.loc[mask, local_col].astype(object).rename("local"),
+                pd.Series(categorias[mask], index=df.index[mask], name="categoria"),
+            ],
+            observed=True,
+        )
+        .sum()
+    )
+    return agregado.unstack("categoria", fill_value=0)
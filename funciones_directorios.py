@@ -0,0 +1,47 @@
+# funciones_directorios.py
+# ============================================================
+# Carpetas de trabajo privadas (caché de archivos y artefactos)
+#
+# Lo que se guarda ahí se vuelve a leer como datos de confianza (tablas,
+# estado incremental, descargas), así que la carpeta tiene que ser del
+# usuario que corre la app y nadie más debe poder escribir en ella. Por
+# defecto vive en la caché del usuario (~/.cache/pe_reportes), no en /tmp.
+# ============================================================
+
+import os
+import stat
+
+from funciones_errores import DirectorioInseguro
+
+
+_verificadas = set()  # carpetas ya comprobadas en este proceso
+
+
+def carpeta_usuario(nombre):
+    """Subcarpeta `nombre` de la caché del usuario (XDG_CACHE_HOME o ~/.cache; LOCALAPPDATA en Windows)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pe_reportes", nombre)
+
+
+def directorio_privado(ruta):
+    """
+    Crea `ruta` con permisos 0o700 si no existe y comprueba que sea una
+    carpeta (no un enlace) del usuario actual. Si es suya pero otros pueden
+    entrar, le quita esos permisos. Lanza DirectorioInseguro si es de otro
+    usuario o no es una carpeta.
+    """
+    ruta = os.path.abspath(ruta)
+    if ruta in _verificadas:
+        return ruta
+    os.makedirs(ruta, mode=0o700, exist_ok=True)
+    info = os.lstat(ruta)
+    if not stat.S_ISDIR(info.st_mode):
+        raise DirectorioInseguro(f"❌ {ruta} no es una carpeta (¿un enlace?); elija otra con la variable de entorno.")
+    if hasattr(os, "getuid"):  # en Windows los permisos los dan las ACL del perfil
+        if info.st_uid != os.getuid():
+            raise DirectorioInseguro(f"❌ La carpeta {ruta} es de otro usuario; elija otra con la variable de entorno.")
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            os.chmod(ruta, 0o700)
+    _verificadas.add(ruta)
+    return ruta
@@ -0,0 +1,56 @@
+# funciones_errores.py
+# ============================================================
+# Errores de la generación de reportes
+#
+# Todos derivan de ErrorReporte y su mensaje ya se puede mostrar al
+# usuario tal cual. Los de datos también son ValueError, como los que se
+# lanzaban antes, así que el código que atrapaba ValueError sigue igual.
+# ============================================================
+
+from contextlib import contextmanager
+
+
+class ErrorReporte(Exception):
+    """Error esperado al generar un reporte (entradas, plantilla, configuración, servidor)."""
+
+
+class EntradaFaltante(ErrorReporte, ValueError):
+    """Falta un archivo que el reporte necesita."""
+
+
+class ArchivoInvalido(ErrorReporte, ValueError):
+    """
+    Un archivo de entrada no se pudo abrir o no tiene el formato esperado.
+    `entrada` es la clave clasificada del archivo ('asc_fa', ...) si se conoce.
+    """
+
+    def __init__(self, mensaje, entrada=None):
+        super().__init__(mensaje)
+        self.entrada = entrada
+
+    def __str__(self):
+        mensaje = super().__str__()
+        return f"{mensaje} (archivo {self.entrada.upper()})" if self.entrada else mensaje
+
+
+class PlantillaInvalida(ErrorReporte, ValueError):
+    """A la plantilla le falta una hoja o tabla, o tiene partes no soportadas."""
+
+
+class ConfiguracionInvalida(ErrorReporte, ValueError):
+    """Opción o especificación desconocida (lector de Excel, tipo de columna, hoja)."""
+
+
+class DirectorioInseguro(ErrorReporte, PermissionError):
+    """La carpeta de caché o de artefactos es de otro usuario o no es una carpeta."""
+
+
+@contextmanager
+def en_entrada(clave):
+    """Anota en los ArchivoInvalido lanzados dentro qué entrada los causó."""
+    try:
+        yield
+    except ArchivoInvalido as e:
+        if e.entrada is None:
+            e.entrada = clave
+        raise
@@ -0,0 +1,352 @@
+# funciones_escritura.py
+# ============================================================
+# Escritura del libro de cada reporte
+#
+# generar_hoja produce el libro de una hoja de reporte de una de estas formas:
+#   - incremental: reescribe en el libro anterior solo las filas que
+#     cambiaron (funciones_incremental);
+#   - "xml" (por omisión): recorre el XML de la hoja de la plantilla e
+#     inserta datos, fórmulas y valores en las filas con clave. Las demás
+#     partes del paquete se copian byte a byte; solo cambian styles.xml
+#     (si hay formato de validaciones) y el calcPr de workbook.xml;
+#   - "openpyxl": carga la plantilla completa, la llena y la vuelve a guardar.
+#
+# El modo xml necesita una plantilla con solo esa hoja (como las que prepara
+# funciones_plantilla); con cualquier otra se usa openpyxl.
+# ============================================================
+
+import os
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape, unescape
+
+from openpyxl import load_workbook
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.xml.functions import tostring
+
+from funciones_errores import ConfiguracionInvalida, PlantillaInvalida
+from funciones_exportacion import tabla_hoja
+from funciones_formulas import (
+    CELDA_XML,
+    FILA_XML,
+    calcular_valores,
+    guardar_con_valores,
+    leer_celda,
+    reescribir_paquete,
+    xml_celda,
+    xml_con_valores,
+)
+from funciones_incremental import actualizar_libro, cargar_estado, guardar_estado, huella_plantilla
+from funciones_instrumentacion import etapa
+from funciones_llenado import ROJO, VERDE, contar_validaciones, llenar_hoja, valores_datos
+
+
+# Escritor del libro: "xml" (parchea la hoja de la plantilla) u "openpyxl"
+ESCRITOR = os.environ.get("PE_ESCRITOR", "xml")
+ESCRITORES = ("xml", "openpyxl")
+
+# Elementos de <worksheet> que van después de <conditionalFormatting>, en orden
+_DESPUES_DE_FORMATOS = [
+    "dataValidations", "hyperlinks", "printOptions", "pageMargins", "pageSetup", "headerFooter",
+    "rowBreaks", "colBreaks", "customProperties", "cellWatches", "ignoredErrors", "smartTags",
+    "drawing", "legacyDrawing", "legacyDrawingHF", "drawingHF", "picture", "oleObjects", "controls",
+    "webPublishItems", "tableParts", "extLst",
+]
+
+
+# Celdas con contenido (no las <c .../> vacías, que solo llevan estilo)
+_CELDA_CON_CONTENIDO = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*?)(?<!/)>(.*?)</c>', re.S)
+
+
+class _PlantillaNoSoportada(Exception):
+    """La plantilla no se puede parchear directamente: se usa openpyxl."""
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def _bytes(archivo):
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, "rb") as f:
+            return f.read()
+    if hasattr(archivo, "getvalue"):
+        return archivo.getvalue()
+    archivo.seek(0)
+    return archivo.read()
+
+
+def _atributo(etiqueta, nombre):
+    m = re.search(rf'\s{nombre}="([^"]*)"', etiqueta)
+    return unescape(m.group(1)) if m else None
+
+
+def _parte_de_hoja(zf, hoja):
+    """Ruta del XML de `hoja` en el paquete; la plantilla debe tener solo esa hoja."""
+    libro = zf.read("xl/workbook.xml").decode("utf-8")
+    hojas = [
+        (_atributo(etiqueta, "name"), re.search(r'\s\w+:id="([^"]*)"', etiqueta))
+        for etiqueta in re.findall(r"<sheet\b[^>]*>", libro)
+    ]
+    if hoja not in [nombre for nombre, _ in hojas]:
+        raise PlantillaInvalida(f"❌ No se encontró la hoja '{hoja}' en el archivo base.")
+    if len(hojas) != 1 or hojas[0][1] is None:
+        raise _PlantillaNoSoportada("la plantilla tiene otras hojas")
+
+    relaciones = zf.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+    for etiqueta in re.findall(r"<Relationship\b[^>]*>", relaciones):
+        if _atributo(etiqueta, "Id") == hojas[0][1].group(1):
+            destino = _atributo(etiqueta, "Target")
+            if destino.startswith("/"):
+                return destino.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", destino))
+    raise _PlantillaNoSoportada("la hoja no tiene relación en el libro")
+
+
+def _cadenas_compartidas(zf):
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    xml = zf.read("xl/sharedStrings.xml").decode("utf-8")
+    return [
+        unescape("".join(re.findall(r"<t[^>]*>([^<]*)</t>", re.sub(r"<rPh\b.*?</rPh>", "", si, flags=re.S))))
+        for si in re.findall(r"<si>(.*?)</si>", xml, re.S)
+    ]
+
+
+def _insertar_antes(xml, etiquetas, texto, cierre):
+    """Inserta `texto` antes del primero de `etiquetas` presente (o antes de `cierre`)."""
+    posiciones = [m.start() for e in etiquetas for m in [re.search(rf"<{e}[\s/>]", xml)] if m]
+    pos = min(posiciones) if posiciones else xml.rindex(cierre)
+    return xml[:pos] + texto + xml[pos:]
+
+
+def _agregar_validaciones(xml, estilos, columnas, max_fila):
+    """
+    El formato OK / ERR de llenar_hoja: dos dxf nuevos en styles.xml y un
+    conditionalFormatting por columna. Devuelve (xml de la hoja, styles.xml).
+    """
+    dxfs = "".join(tostring(DifferentialStyle(fill=relleno).to_tree()).decode("utf-8") for relleno in (ROJO, VERDE))
+    m = re.search(r"<dxfs\b[^>]*?(?:/>|>(.*?)</dxfs>)", estilos, re.S)
+    if m:
+        previos = m.group(1) or ""
+        primero = len(re.findall(r"<dxf\b", previos))
+        estilos = estilos[:m.start()] + f'<dxfs count="{primero + 2}">{previos}{dxfs}</dxfs>' + estilos[m.end():]
+    else:
+        primero = 0
+        estilos = _insertar_antes(estilos, ["tableStyles", "colors", "extLst"], f'<dxfs count="2">{dxfs}</dxfs>', "</styleSheet>")
+
+    prioridad = max(map(int, re.findall(r'<cfRule\b[^>]*\spriority="(\d+)"', xml)), default=0)
+    bloques = []
+    for c in columnas:
+        reglas = []
+        for i, texto in enumerate(['"ERR"', '"OK"']):
+            prioridad += 1
+            reglas.append(
+                f'<cfRule type="cellIs" priority="{prioridad}" operator="equal" dxfId="{primero + i}">'
+                f"<formula>{escape(texto)}</formula></cfRule>"
+            )
+        bloques.append(f'<conditionalFormatting sqref="{c}2:{c}{max_fila}">{"".join(reglas)}</conditionalFormatting>')
+
+    return _insertar_antes(xml, _DESPUES_DE_FORMATOS, "".join(bloques), "</worksheet>"), estilos
+
+
+def _con_recalculo(libro, recalcular):
+    """workbook.xml con fullCalcOnLoad según haga falta recalcular al abrir."""
+    valor = "1" if recalcular else "0"
+    m = re.search(r"<calcPr\b[^>]*>", libro)
+    if m:
+        etiqueta = m.group(0)
+        if re.search(r'\sfullCalcOnLoad="', etiqueta):
+            nueva = re.sub(r'(\sfullCalcOnLoad=)"[^"]*"', rf'\1"{valor}"', etiqueta)
+        else:
+            nueva = etiqueta.replace("<calcPr", f'<calcPr fullCalcOnLoad="{valor}"', 1)
+        return libro[:m.start()] + nueva + libro[m.end():]
+    if not recalcular:
+        return libro
+    return _insertar_antes(
+        libro, ["oleSize", "customWorkbookViews", "pivotCaches", "smartTagPr", "smartTagTypes",
+                "webPublishing", "fileRecoveryPr", "webPublishObjects", "extLst"],
+        '<calcPr fullCalcOnLoad="1" />', "</workbook>",
+    )
+
+
+# ============================================================
+# ESCRITORES
+# ============================================================
+
+def _escribir_xml(base, compilada, fuentes):
+    """
+    Llena la hoja directamente en el XML de la plantilla. Devuelve (bytes del
+    libro, parte de la hoja, llenado, valores calculados) o lanza
+    _PlantillaNoSoportada si la plantilla no se puede parchear así.
+    """
+    hoja = compilada["hoja"]
+    with etapa("plantilla"):
+        contenido = _bytes(base)
+        with zipfile.ZipFile(BytesIO(contenido)) as zf:
+            parte = _parte_de_hoja(zf, hoja)
+            xml = zf.read(parte).decode("utf-8")
+            libro = zf.read("xl/workbook.xml").decode("utf-8")
+            estilos = zf.read("xl/styles.xml").decode("utf-8") if compilada["validaciones"] else None
+            compartidas = _cadenas_compartidas(zf)
+        if re.search(r"<f\s+t=", xml):
+            raise _PlantillaNoSoportada("fórmulas compartidas o matriciales")
+
+    with etapa("llenado"):
+        # 1️⃣ Valores de la plantilla: solo se leen las celdas con contenido
+        valores_plantilla = {}
+        for c in _CELDA_CON_CONTENIDO.finditer(xml):
+            valor, formula = leer_celda(c.group(3), c.group(4), compartidas)
+            valores_plantilla[(int(c.group(2)), column_index_from_string(c.group(1)))] = (
+                valor if formula is None else "=" + formula
+            )
+        filas = {int(m.group(1)): m for m in FILA_XML.finditer(xml)}
+        max_fila = max((fila for fila, m in filas.items() if m.group(2) and "<c " in m.group(2)), default=1)
+
+        # 2️⃣ Filas con clave completa (como _leer_claves) y sus valores
+        normalizar = compilada["normalizar"]
+        llenado = {"filas": [], "claves": []}
+        for fila in filas:
+            if fila < 2:
+                continue
+            clave = tuple(normalizar(valores_plantilla.get((fila, c))) for c in compilada["claves"])
+            if all(clave):
+                llenado["filas"].append(fila)
+                llenado["claves"].append(clave if len(clave) > 1 else clave[0])
+        llenado["datos"] = valores_datos(compilada, fuentes, llenado["claves"])
+
+        nuevos = {fila: {} for fila in llenado["filas"]}
+        for col, valores in llenado["datos"].items():
+            for fila, v in zip(llenado["filas"], valores):
+                nuevos[fila][col] = v
+        for col, partes in compilada["formulas"]:
+            for fila in llenado["filas"]:
+                nuevos[fila][col] = str(fila).join(partes)
+
+        columnas = {}
+        for (fila, col), valor in valores_plantilla.items():
+            if col not in nuevos.get(fila, ()):
+                columnas.setdefault(col, []).append((fila, valor))
+        for fila, propios in nuevos.items():
+            for col, valor in propios.items():
+                columnas.setdefault(col, []).append((fila, valor))
+        for lista in columnas.values():
+            lista.sort(key=lambda par: par[0])  # las fórmulas encadenadas se evalúan en orden de fila
+
+    with etapa("calculo"):
+        valores, completo = calcular_valores(columnas, max_fila, hoja)
+
+    with etapa("guardado"):
+        # 3️⃣ Reescribir solo el contenido de las filas con clave
+        piezas, posicion = [], 0
+        for fila in sorted(nuevos, key=lambda f: filas[f].start()):
+            m = filas[fila]
+            celdas = {
+                column_index_from_string(c.group(1)): (c.group(1), c.group(3), c.group(0))
+                for c in CELDA_XML.finditer(m.group(2))
+            }
+            propios = nuevos[fila]
+            xml_fila = []
+            for col in sorted(celdas.keys() | propios.keys()):
+                letra, atributos, original = celdas.get(col, (get_column_letter(col), "", None))
+                if col not in propios:
+                    xml_fila.append(original)
+                elif isinstance(propios[col], str) and propios[col].startswith("="):
+                    xml_fila.append(xml_celda(letra, fila, atributos, formula=propios[col][1:]))
+                else:
+                    xml_fila.append(xml_celda(letra, fila, atributos, valor=propios[col]))
+            piezas += [xml[posicion:m.start(2)], "".join(xml_fila)]
+            posicion = m.end(2)
+        piezas.append(xml[posicion:])
+        xml = xml_con_valores("".join(piezas), valores)
+
+        nuevas = {}
+        if compilada["validaciones"]:
+            xml, estilos = _agregar_validaciones(xml, estilos, compilada["validaciones"], max_fila)
+            nuevas["xl/styles.xml"] = estilos.encode("utf-8")
+        nuevas[parte] = xml.encode("utf-8")
+        actualizado = _con_recalculo(libro, not completo)
+        if actualizado != libro:
+            nuevas["xl/workbook.xml"] = actualizado.encode("utf-8")
+        contenido = reescribir_paquete(contenido, nuevas)
+
+    return contenido, parte, llenado, valores
+
+
+def _escribir_openpyxl(base, compilada, fuentes):
+    """Carga la plantilla con openpyxl, la llena y la guarda (mismo resultado que _escribir_xml)."""
+    hoja = compilada["hoja"]
+    with etapa("plantilla"):
+        wb = load_workbook(base)
+        if hoja not in wb.sheetnames:
+            raise PlantillaInvalida(f"❌ No se encontró la hoja '{hoja}' en el archivo base.")
+
+        # 🔹 Dejar solo la hoja del reporte
+        for nombre in wb.sheetnames.copy():
+            if nombre != hoja:
+                del wb[nombre]
+        wb.active = 0
+
+    ws = wb[hoja]
+    with etapa("llenado"):
+        llenado = llenar_hoja(ws, compilada, fuentes)
+
+    # Calcular fórmulas y guardar en memoria (con valores en caché)
+    out, valores = guardar_con_valores(wb)
+    return out.getvalue(), ws.path.lstrip("/"), llenado, valores[hoja]
+
+
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
+
+def generar_hoja(base, compilada, fuentes, anterior=None, escritor=None):
+    """
+    Llena la hoja de la plantilla `base` y devuelve (libro en memoria, detalle).
+
+    Si `anterior` (ruta o archivo) es un libro generado antes con la misma
+    plantilla, se reescriben en él solo las filas cuyos datos cambiaron.
+    `escritor` ("xml" u "openpyxl") elige cómo se genera el libro completo.
+    detalle = {"validaciones": conteo OK/ERR,
+               "filas_cambiadas": [(fila, clave)], o None si se generó completa,
+               "tabla": DataFrame con los datos por clave (funciones_exportacion)}
+    """
+    escritor = escritor or ESCRITOR
+    if escritor not in ESCRITORES:
+        raise ConfiguracionInvalida(f"❌ Escritor de Excel desconocido: '{escritor}' (opciones: {', '.join(ESCRITORES)})")
+    plantilla = huella_plantilla(base)
+
+    previo = cargar_estado(anterior, compilada, plantilla)
+    if previo is not None:
+        contenido, estado = previo
+        with etapa("incremental"):
+            datos = valores_datos(compilada, fuentes, estado["claves"])
+            actualizado = actualizar_libro(contenido, estado, compilada, datos)
+        if actualizado is not None:
+            contenido, valores, cambios = actualizado
+            guardar_estado(contenido, estado["parte"], compilada, plantilla, {**estado, "datos": datos}, valores)
+            with etapa("tabla"):
+                tabla = tabla_hoja(base, compilada, plantilla, estado["filas"], datos, valores)
+            return BytesIO(contenido), {
+                "validaciones": contar_validaciones(compilada, valores), "filas_cambiadas": cambios, "tabla": tabla,
+            }
+
+    resultado = None
+    if escritor == "xml":
+        try:
+            resultado = _escribir_xml(base, compilada, fuentes)
+        except _PlantillaNoSoportada:
+            pass
+    if resultado is None:
+        resultado = _escribir_openpyxl(base, compilada, fuentes)
+
+    contenido, parte, llenado, valores = resultado
+    guardar_estado(contenido, parte, compilada, plantilla, llenado, valores)
+    with etapa("tabla"):
+        tabla = tabla_hoja(base, compilada, plantilla, llenado["filas"], llenado["datos"], valores)
+    return BytesIO(contenido), {
+        "validaciones": contar_validaciones(compilada, valores), "filas_cambiadas": None, "tabla": tabla,
+    }
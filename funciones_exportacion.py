@@ -0,0 +1,151 @@
+# funciones_exportacion.py
+# ============================================================
+# Datos de cada reporte en formato columnar (CSV / Parquet / JSON)
+#
+# Una fila por clave de la hoja (sede, o sede y local) con las columnas de
+# la especificación: los agregados de las fuentes y los valores calculados
+# de sus fórmulas (porcentajes, diferencias, OK / ERR). La tabla se arma
+# con lo mismo que se escribe en el libro, sin volver a leerlo; de la
+# plantilla solo se toman los encabezados y el texto original de las claves.
+#
+# pandas y openpyxl se importan al usarlos: la app y los scripts importan
+# este módulo al arrancar.
+# ============================================================
+
+import os
+import pickle
+from importlib.util import find_spec
+from io import BytesIO
+
+from funciones_artefactos import guardar_artefacto, leer_artefacto
+from funciones_errores import ConfiguracionInvalida
+
+
+# Formato → extensión del archivo
+FORMATOS = {"csv": ".csv", "parquet": ".parquet", "json": ".json"}
+
+# La tabla se guarda en el almacén de artefactos con la clave del libro
+EXTENSION_TABLA = ".tabla"
+
+_plantillas = {}  # (huella de la plantilla, hoja) → (encabezados, texto de las claves por fila)
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def _nombre(encabezado, letra):
+    """Encabezado de la plantilla en una sola línea (la letra si está vacío)."""
+    texto = " ".join(str(encabezado).split()) if encabezado is not None else ""
+    return texto or letra
+
+
+def _datos_plantilla(base, compilada, huella):
+    """Fila 1 y columnas de clave de la hoja en la plantilla (se leen una vez por plantilla)."""
+    hoja = compilada["hoja"]
+    if (huella, hoja) not in _plantillas:
+        from openpyxl import load_workbook
+
+        if not isinstance(base, (str, os.PathLike)):
+            base.seek(0)
+        wb = load_workbook(base, read_only=True)
+        try:
+            filas = wb[hoja].iter_rows(values_only=True)
+            encabezados = next(filas, ())
+            claves = {
+                fila: tuple(valores[c - 1] if c <= len(valores) else None for c in compilada["claves"])
+                for fila, valores in enumerate(filas, start=2)
+            }
+        finally:
+            wb.close()
+        if not isinstance(base, (str, os.PathLike)):
+            base.seek(0)
+        _plantillas[(huella, hoja)] = (encabezados, claves)
+    return _plantillas[(huella, hoja)]
+
+
+def _columna_calculada(valores):
+    """Valores de una columna de fórmula: numérica (errores de Excel → vacío) o de texto."""
+    import pandas as pd
+    from funciones_formulas import ErrorExcel
+
+    presentes = [v for v in valores if v is not None]
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in presentes if not isinstance(v, ErrorExcel)):
+        return pd.Series([None if isinstance(v, ErrorExcel) else v for v in valores], dtype="float64")
+    return pd.Series([None if v is None else str(v) for v in valores], dtype=object)
+
+
+# ============================================================
+# FUNCIONES PRINCIPALES
+# ============================================================
+
+def tabla_hoja(base, compilada, huella, filas, datos, valores):
+    """
+    DataFrame con una fila por clave de la hoja. `filas` son las filas con
+    clave, `datos` lo que devuelve valores_datos para ellas y `valores` los
+    valores calculados de la hoja ({(fila, letra): valor}).
+    """
+    import pandas as pd
+    from openpyxl.utils import get_column_letter
+
+    encabezados, claves = _datos_plantilla(base, compilada, huella)
+    columnas = {}
+
+    def agregar(col, serie):
+        letra = get_column_letter(col)
+        nombre = _nombre(encabezados[col - 1] if col <= len(encabezados) else None, letra)
+        columnas[f"{nombre} ({letra})" if nombre in columnas else nombre] = serie
+
+    for i, col in enumerate(compilada["claves"]):
+        agregar(col, pd.Series([claves.get(fila, (None,) * len(compilada["claves"]))[i] for fila in filas], dtype=object))
+
+    calculadas = {col: get_column_letter(col) for col, _ in compilada["formulas"]}
+    for col in sorted(datos.keys() | calculadas.keys()):
+        if col in datos:
+            serie = pd.Series(datos[col], dtype="float64")
+            # Los agregados son conteos: enteros si lo son todos
+            agregar(col, serie.astype("int64") if len(serie) and (serie % 1 == 0).all() else serie)
+        else:
+            agregar(col, _columna_calculada([valores.get((fila, calculadas[col])) for fila in filas]))
+
+    return pd.DataFrame(columnas)
+
+
+def formatos_disponibles():
+    """Formatos que se pueden escribir aquí (Parquet necesita pyarrow o fastparquet)."""
+    parquet = find_spec("pyarrow") is not None or find_spec("fastparquet") is not None
+    return [f for f in FORMATOS if f != "parquet" or parquet]
+
+
+def leer_formatos(texto):
+    """'csv,parquet' → ["csv", "parquet"]; lanza ConfiguracionInvalida si alguno no se puede usar."""
+    formatos = [f.strip().lower() for f in texto.split(",") if f.strip()]
+    for formato in formatos:
+        if formato not in FORMATOS:
+            raise ConfiguracionInvalida(f"❌ Formato de datos desconocido: '{formato}' (opciones: {', '.join(FORMATOS)})")
+        if formato not in formatos_disponibles():
+            raise ConfiguracionInvalida(f"❌ El formato '{formato}' necesita pyarrow (pip install pyarrow).")
+    return formatos
+
+
+def serializar_tabla(tabla, formato):
+    """Bytes de la tabla en `formato` ('csv', 'parquet' o 'json')."""
+    if formato == "csv":
+        return tabla.to_csv(index=False).encode("utf-8")
+    if formato == "json":
+        return tabla.to_json(orient="records", force_ascii=False).encode("utf-8")
+    if formato == "parquet":
+        out = BytesIO()
+        tabla.to_parquet(out, index=False)
+        return out.getvalue()
+    raise ConfiguracionInvalida(f"❌ Formato de datos desconocido: '{formato}' (opciones: {', '.join(FORMATOS)})")
+
+
+def guardar_tabla(tabla, clave):
+    """Guarda la tabla en el almacén de artefactos junto al libro con clave `clave`."""
+    return guardar_artefacto(pickle.dumps(tabla), clave=clave, extension=EXTENSION_TABLA)
+
+
+def leer_tabla(clave):
+    """Tabla guardada con guardar_tabla (FileNotFoundError si ya fue desalojada)."""
+    return pickle.loads(leer_artefacto(clave, EXTENSION_TABLA))
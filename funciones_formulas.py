@@ -0,0 +1,594 @@
+# funciones_formulas.py
+# ============================================================
+# Cálculo en Python de las fórmulas de una hoja
+#
+# openpyxl guarda las fórmulas sin valor en caché: Excel tiene que
+# recalcular todo el libro al abrirlo y quien lo lee sin Excel (pandas,
+# otros procesos) ve celdas vacías. Aquí se evalúan las formas de fórmula
+# que usan las plantillas (referencias, + - * / ^, comparaciones, IF,
+# ISODD, ROUND) columna por columna sobre todas las filas a la vez, y el
+# resultado se escribe como <v> junto a cada fórmula del paquete guardado.
+#
+# Si alguna fórmula usa algo no soportado queda sin valor y el libro
+# conserva el recálculo al abrir.
+# ============================================================
+
+import re
+import zipfile
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape, unescape
+
+import numpy as np
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from funciones_instrumentacion import etapa
+
+
+# Tipos de valor de cada celda en un vector
+PENDIENTE, VACIO, NUMERO, TEXTO, LOGICO, ERROR = -1, 0, 1, 2, 3, 4
+
+_RANGO_COMPARACION = {NUMERO: 0, TEXTO: 1, LOGICO: 2}  # número < texto < lógico
+
+
+class ErrorExcel(str):
+    """Resultado de error de Excel (#DIV/0!, #VALUE!, ...)."""
+
+
+class FormulaNoSoportada(Exception):
+    """La fórmula usa una función, operador o referencia que no se calcula aquí."""
+
+
+# ============================================================
+# ANÁLISIS DE FÓRMULAS
+# ============================================================
+
+# Referencias a una celda fuera de cadenas; la fila se reescribe relativa a la celda
+_REFERENCIA = re.compile(
+    r'"(?:[^"]|"")*"'
+    r"|(?<![\w.$])((?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?(\$?[A-Z]{1,3})(\$?)(\d+)(?![\w(])"
+)
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<num>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+  | (?P<txt>"(?:[^"]|"")*")
+  | (?P<ref>(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?\$?[A-Z]{1,3}(?:\$\d+|\{-?\d+\}))
+  | (?P<fn>[A-Z][A-Z0-9.]*)\(
+  | (?P<bool>TRUE|FALSE)\b
+  | (?P<op><=|>=|<>|[-+*/^=<>(),])
+)""", re.X)
+
+_PARTES_REF = re.compile(r"(?:('(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?\$?([A-Z]{1,3})(?:\$(\d+)|\{(-?\d+)\})")
+
+_COMPARACIONES = ("=", "<>", "<", ">", "<=", ">=")
+
+
+def forma_formula(formula, fila):
+    """
+    Reescribe la fórmula de una celda con las filas relativas a ella
+    ('=G5-M5' en la fila 5 → 'G{0}-M{0}'), para agrupar las que se calculan igual.
+    """
+    def relativa(m):
+        if m.group(2) is None or m.group(3):
+            return m.group(0)
+        return f"{m.group(1) or ''}{m.group(2)}{{{int(m.group(4)) - fila}}}"
+
+    return _REFERENCIA.sub(relativa, formula[1:])
+
+
+def _tokens(forma):
+    tokens, pos = [], 0
+    forma = forma.rstrip()
+    while pos < len(forma):
+        m = _TOKEN.match(forma, pos)
+        if m is None or m.end() == pos:
+            raise FormulaNoSoportada(forma[pos:])
+        tokens.append((m.lastgroup, m.group(m.lastgroup)))
+        pos = m.end()
+    return tokens
+
+
+@lru_cache(maxsize=1024)
+def analizar(forma):
+    """
+    Árbol de una forma de fórmula:
+      ("const", valor) · ("ref", hoja, columna, fila, relativa) · ("neg", x)
+      ("op", operador, a, b) · ("fn", nombre, (args...))
+    """
+    tokens = _tokens(forma)
+    pos = 0
+
+    def ver():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def tomar(valor=None):
+        nonlocal pos
+        token = ver()
+        if token[0] is None or (valor is not None and token[1] != valor):
+            raise FormulaNoSoportada(forma)
+        pos += 1
+        return token
+
+    def binario(siguiente, operadores):
+        def regla():
+            nodo = siguiente()
+            while ver()[0] == "op" and ver()[1] in operadores:
+                _, operador = tomar()
+                nodo = ("op", operador, nodo, siguiente())
+            return nodo
+        return regla
+
+    def unario():
+        if ver() in (("op", "-"), ("op", "+")):
+            _, signo = tomar()
+            nodo = unario()
+            return ("neg", nodo) if signo == "-" else nodo
+        return primario()
+
+    def primario():
+        clase, texto = tomar()
+        if clase == "num":
+            return ("const", float(texto))
+        if clase == "txt":
+            return ("const", texto[1:-1].replace('""', '"'))
+        if clase == "bool":
+            return ("const", texto == "TRUE")
+        if clase == "ref":
+            hoja, letra, absoluta, relativa = _PARTES_REF.fullmatch(texto).groups()
+            hoja = hoja.strip("'").replace("''", "'") if hoja else None
+            col = column_index_from_string(letra)
+            if absoluta:
+                return ("ref", hoja, col, int(absoluta), False)
+            return ("ref", hoja, col, int(relativa), True)
+        if clase == "fn":
+            args = []
+            if ver() != ("op", ")"):
+                args.append(comparacion())
+                while ver() == ("op", ","):
+                    tomar(",")
+                    args.append(comparacion())
+            tomar(")")
+            return ("fn", texto, tuple(args))
+        if (clase, texto) == ("op", "("):
+            nodo = comparacion()
+            tomar(")")
+            return nodo
+        raise FormulaNoSoportada(forma)
+
+    potencia = binario(unario, ("^",))
+    producto = binario(potencia, ("*", "/"))
+    suma = binario(producto, ("+", "-"))
+    comparacion = binario(suma, _COMPARACIONES)
+
+    arbol = comparacion()
+    if pos != len(tokens):
+        raise FormulaNoSoportada(forma)
+    return arbol
+
+
+def referencias(nodo):
+    """Todas las referencias ("ref", ...) de un árbol."""
+    if nodo[0] == "ref":
+        yield nodo
+    elif nodo[0] in ("neg", "op"):
+        for hijo in nodo[1:]:
+            if isinstance(hijo, tuple):
+                yield from referencias(hijo)
+    elif nodo[0] == "fn":
+        for arg in nodo[2]:
+            yield from referencias(arg)
+
+
+# ============================================================
+# OPERACIONES SOBRE VECTORES
+# Un vector es (tipo, num, txt): tipo por celda, valor numérico (lógicos
+# como 1/0) y texto o código de error.
+# ============================================================
+
+def _constante(valor, n):
+    tipo = np.full(n, VACIO, np.int8)
+    num = np.zeros(n)
+    txt = np.full(n, None, object)
+    if isinstance(valor, bool):
+        tipo[:], num[:] = LOGICO, float(valor)
+    elif isinstance(valor, float):
+        tipo[:], num[:] = NUMERO, valor
+    else:
+        tipo[:], txt[:] = TEXTO, valor
+    return tipo, num, txt
+
+
+def _heredar(tipo, num, txt, *operandos):
+    """Aplica al resultado el primer error de los operandos (y las celdas pendientes)."""
+    tipo, txt = tipo.copy(), txt.copy()
+    for o in reversed(operandos):
+        m = o[0] == ERROR
+        tipo[m], txt[m] = ERROR, o[2][m]
+    for o in operandos:
+        tipo[o[0] == PENDIENTE] = PENDIENTE
+    return tipo, num, txt
+
+
+def _a_numero(v):
+    """Conversión de Excel para aritmética: vacío = 0, lógico = 1/0, texto numérico o #VALUE!."""
+    tipo, num, txt = v
+    num = np.where(tipo == VACIO, 0.0, num)
+    nuevo_tipo = np.where(np.isin(tipo, (ERROR, PENDIENTE)), tipo, NUMERO).astype(np.int8)
+    nuevo_txt = np.where(tipo == ERROR, txt, None)
+    for i in np.flatnonzero(tipo == TEXTO):
+        try:
+            num[i] = float(txt[i])
+        except ValueError:
+            nuevo_tipo[i], nuevo_txt[i] = ERROR, "#VALUE!"
+    return nuevo_tipo, num, nuevo_txt
+
+
+def _numerico(num, *operandos, division=None):
+    n = len(num)
+    tipo, txt = np.full(n, NUMERO, np.int8), np.full(n, None, object)
+    invalido = ~np.isfinite(num)
+    if division is not None:
+        tipo[division], txt[division] = ERROR, "#DIV/0!"
+        invalido &= ~division
+    tipo[invalido], txt[invalido] = ERROR, "#NUM!"
+    return _heredar(tipo, num, txt, *operandos)
+
+
+def _logico(valores, *operandos):
+    n = len(valores)
+    return _heredar(np.full(n, LOGICO, np.int8), valores.astype(float), np.full(n, None, object), *operandos)
+
+
+def _aritmetica(operador, a, b):
+    a, b = _a_numero(a), _a_numero(b)
+    with np.errstate(all="ignore"):
+        if operador == "+":
+            return _numerico(a[1] + b[1], a, b)
+        if operador == "-":
+            return _numerico(a[1] - b[1], a, b)
+        if operador == "*":
+            return _numerico(a[1] * b[1], a, b)
+        if operador == "/":
+            return _numerico(a[1] / b[1], a, b, division=b[1] == 0)
+        return _numerico(a[1] ** b[1], a, b)
+
+
+def _comparar(operador, a, b):
+    """Comparación de Excel: el vacío toma el tipo del otro lado y los textos no distinguen mayúsculas."""
+    ta, na, xa = a
+    tb, nb, xb = b
+    ta = np.where(ta == VACIO, np.where(tb == VACIO, NUMERO, tb), ta)
+    tb = np.where(tb == VACIO, ta, tb)
+    rango_a = np.vectorize(_RANGO_COMPARACION.get, otypes=[float])(ta, -1)
+    rango_b = np.vectorize(_RANGO_COMPARACION.get, otypes=[float])(tb, -1)
+
+    diferencia = np.sign(rango_a - rango_b)
+    mismos = rango_a == rango_b
+    numericos = mismos & (rango_a != _RANGO_COMPARACION[TEXTO])
+    diferencia[numericos] = np.sign(na - nb)[numericos]
+    for i in np.flatnonzero(mismos & (rango_a == _RANGO_COMPARACION[TEXTO])):
+        x, y = (xa[i] or "").lower(), (xb[i] or "").lower()
+        diferencia[i] = (x > y) - (x < y)
+
+    resultado = {
+        "=": diferencia == 0, "<>": diferencia != 0,
+        "<": diferencia < 0, ">": diferencia > 0,
+        "<=": diferencia <= 0, ">=": diferencia >= 0,
+    }[operador]
+    return _logico(resultado, a, b)
+
+
+def _si(condicion, si, no):
+    tc, nc, xc = condicion
+    verdadero = np.isin(tc, (NUMERO, LOGICO)) & (nc != 0)
+    tipo = np.where(verdadero, si[0], no[0]).astype(np.int8)
+    num = np.where(verdadero, si[1], no[1])
+    txt = np.where(verdadero, si[2], no[2])
+    tipo[tc == TEXTO], txt[tc == TEXTO] = ERROR, "#VALUE!"
+    return _heredar(tipo, num, txt, condicion)
+
+
+def _redondear(x, digitos):
+    """ROUND de Excel: la mitad se redondea alejándose de cero."""
+    x, digitos = _a_numero(x), _a_numero(digitos)
+    factor = 10.0 ** np.trunc(digitos[1])
+    with np.errstate(all="ignore"):
+        valores = np.sign(x[1]) * np.floor(np.abs(x[1]) * factor + 0.5) / factor
+    return _numerico(valores, x, digitos)
+
+
+def _funcion(nombre, args, n):
+    if nombre == "IF" and len(args) in (2, 3):
+        no = args[2] if len(args) == 3 else _constante(False, n)
+        return _si(args[0], args[1], no)
+    if nombre == "ISODD" and len(args) == 1:
+        x = _a_numero(args[0])
+        return _logico(np.trunc(x[1]) % 2 != 0, x)
+    if nombre == "ROUND" and len(args) == 2:
+        return _redondear(*args)
+    raise FormulaNoSoportada(nombre)
+
+
+def evaluar(nodo, filas, columna, hoja):
+    """
+    Evalúa un árbol para las filas `filas` (array de números de fila).
+    `columna(col)` devuelve el vector completo de una columna, indexado por fila.
+    """
+    clase = nodo[0]
+    if clase == "const":
+        return _constante(nodo[1], len(filas))
+    if clase == "ref":
+        _, otra_hoja, col, fila, relativa = nodo
+        if otra_hoja is not None and otra_hoja != hoja:
+            raise FormulaNoSoportada(f"{otra_hoja}!")
+        tipo, num, txt = columna(col)
+        indices = filas + fila if relativa else np.full(len(filas), fila)
+        fuera = indices < 1
+        indices = np.where((indices >= len(tipo)) | fuera, 0, indices)  # fila 0: celda vacía
+        tipo, num, txt = tipo[indices], num[indices], txt[indices]
+        tipo[fuera], txt[fuera] = ERROR, "#REF!"
+        return tipo, num, txt
+    if clase == "neg":
+        x = _a_numero(evaluar(nodo[1], filas, columna, hoja))
+        return _numerico(-x[1], x)
+    if clase == "op":
+        _, operador, a, b = nodo
+        a, b = evaluar(a, filas, columna, hoja), evaluar(b, filas, columna, hoja)
+        if operador in _COMPARACIONES:
+            return _comparar(operador, a, b)
+        return _aritmetica(operador, a, b)
+    _, nombre, args = nodo
+    return _funcion(nombre, [evaluar(a, filas, columna, hoja) for a in args], len(filas))
+
+
+def _sin_vacios(tipo, num):
+    """Una fórmula que devuelve una celda vacía vale 0, como en Excel."""
+    vacio = tipo == VACIO
+    return np.where(vacio, NUMERO, tipo).astype(np.int8), np.where(vacio, 0.0, num)
+
+
+def _valor(tipo, num, txt):
+    if tipo == NUMERO:
+        return float(num)
+    if tipo == LOGICO:
+        return bool(num)
+    if tipo == TEXTO:
+        return txt
+    return ErrorExcel(txt)
+
+
+# ============================================================
+# CÁLCULO DE UNA HOJA
+# ============================================================
+
+def calcular_valores(columnas, max_fila, hoja):
+    """
+    Calcula las fórmulas de un conjunto de celdas. `columnas` asocia cada
+    índice de columna a pares (fila, valor); los textos que empiezan con '='
+    son fórmulas y el resto se toma como valor fijo. Devuelve
+    ({(fila, letra): valor}, completo); completo es False si alguna fórmula
+    quedó sin calcular.
+    """
+    n = max_fila + 1  # la fila 0 queda vacía y sirve para referencias fuera de la hoja
+    vectores, grupos = {}, {}
+    completo = True
+
+    for c, valores in columnas.items():
+        tipo = np.full(n, VACIO, np.int8)
+        num = np.zeros(n)
+        txt = np.full(n, None, object)
+        for fila, v in valores:
+            if v is None:
+                continue
+            if isinstance(v, ErrorExcel):
+                tipo[fila], txt[fila] = ERROR, v
+            elif isinstance(v, bool):
+                tipo[fila], num[fila] = LOGICO, v
+            elif isinstance(v, (int, float)):
+                tipo[fila], num[fila] = NUMERO, v
+            elif isinstance(v, str) and v.startswith("="):
+                tipo[fila] = PENDIENTE
+                grupos.setdefault(c, {}).setdefault(forma_formula(v, fila), []).append(fila)
+            elif isinstance(v, str):
+                tipo[fila], txt[fila] = TEXTO, v
+            else:
+                # Fechas, fórmulas matriciales, ...: no se calculan
+                tipo[fila] = PENDIENTE
+                completo = completo and not hasattr(v, "text")
+        vectores[c] = (tipo, num, txt)
+
+    vacia = (np.zeros(n, np.int8), np.zeros(n), np.full(n, None, object))
+    listas, en_curso = set(), set()
+
+    def columna(c):
+        if c in listas or c not in grupos:
+            return vectores.get(c, vacia)
+        if c in en_curso:
+            raise FormulaNoSoportada("referencia circular")
+        en_curso.add(c)
+        try:
+            for forma, filas in grupos[c].items():
+                _calcular_grupo(c, forma, np.array(filas))
+        finally:
+            en_curso.discard(c)
+        listas.add(c)
+        return vectores[c]
+
+    def _calcular_grupo(c, forma, filas):
+        tipo, num, txt = vectores[c]
+        try:
+            arbol = analizar(forma)
+            if any(ref[2] == c for ref in referencias(arbol)):
+                # Depende de su propia columna (p. ej. A{-1} + 1): fila por fila, en orden
+                for fila in filas:
+                    t, x, s = evaluar(arbol, np.array([fila]), lambda col: vectores[col] if col == c else columna(col), hoja)
+                    t, x = _sin_vacios(t, x)
+                    tipo[fila], num[fila], txt[fila] = t[0], x[0], s[0]
+            else:
+                t, x, s = evaluar(arbol, filas, columna, hoja)
+                t, x = _sin_vacios(t, x)
+                tipo[filas], num[filas], txt[filas] = t, x, s
+        except FormulaNoSoportada:
+            tipo[filas] = PENDIENTE
+
+    resultados = {}
+    for c in grupos:
+        tipo, num, txt = columna(c)
+        letra = get_column_letter(c)
+        for filas in grupos[c].values():
+            for fila in filas:
+                if tipo[fila] == PENDIENTE:
+                    completo = False
+                else:
+                    resultados[(fila, letra)] = _valor(tipo[fila], num[fila], txt[fila])
+    return resultados, completo
+
+
+def calcular_hoja(ws):
+    """Calcula todas las fórmulas de una hoja de openpyxl (ver calcular_valores)."""
+    columnas = {
+        c: enumerate(valores, start=1)
+        for c, valores in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row, values_only=True), start=1)
+    }
+    return calcular_valores(columnas, ws.max_row, ws.title)
+
+
+# ============================================================
+# CELDAS EN EL XML DE UNA HOJA
+# ============================================================
+
+# Fila y celda de sheetN.xml (con o sin contenido)
+FILA_XML = re.compile(r'<row r="(\d+)"[^>]*?(?:/>|>(.*?)</row>)', re.S)
+CELDA_XML = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+
+# Celda con fórmula tal como la escribe openpyxl: <c r="O2" s="3"><f>G2-M2</f><v/></c>
+_CELDA_FORMULA = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*)>(<f>[^<]*</f>)(?:<v\s*/>|<v></v>)</c>')
+
+
+def leer_celda(atributos, interior, compartidas=None):
+    """
+    (valor, fórmula sin '=') de una celda del XML. Los textos t="s" se buscan
+    en `compartidas` (lista de sharedStrings); sin ella lanzan ValueError.
+    """
+    if not interior:
+        return None, None  # celda vacía (solo estilo): el caso más común
+    tipo = re.search(r'\bt="([^"]*)"', atributos)
+    tipo = tipo.group(1) if tipo else "n"
+    formula = re.search(r"<f>([^<]*)</f>", interior)
+    formula = unescape(formula.group(1)) if formula else None
+    v = re.search(r"<v>([^<]*)</v>", interior)
+
+    if tipo == "inlineStr":
+        return unescape("".join(re.findall(r"<t[^>]*>([^<]*)</t>", interior))), formula
+    if v is None:
+        return None, formula
+    if tipo == "s":
+        if compartidas is None:
+            raise ValueError("cadenas compartidas sin tabla")
+        return compartidas[int(v.group(1))], formula
+    if tipo == "n":
+        texto = v.group(1)
+        return (int(texto) if texto.lstrip("-").isdigit() else float(texto)), formula
+    if tipo == "b":
+        return v.group(1) == "1", formula
+    if tipo == "e":
+        return ErrorExcel(unescape(v.group(1))), formula
+    return unescape(v.group(1)), formula
+
+
+def xml_celda(letra, fila, atributos, valor=None, formula=None):
+    """
+    Celda con un valor y/o una fórmula (sin '='), conservando el resto de
+    atributos (estilo). Una fórmula sin valor queda con <v /> para escribir_valores.
+    """
+    atributos = re.sub(r'\s+t="[^"]*"', "", atributos)
+    f = f"<f>{escape(formula)}</f>" if formula is not None else ""
+    if valor is None:
+        return f'<c r="{letra}{fila}"{atributos}>{f}<v /></c>' if f else f'<c r="{letra}{fila}"{atributos} />'
+    if isinstance(valor, (int, float, np.number)) and not isinstance(valor, bool):
+        valor = float(valor)
+    t, v = _xml_valor(valor)
+    return f'<c r="{letra}{fila}"{atributos}{t}>{f}<v>{v}</v></c>'
+
+
+# ============================================================
+# ESCRITURA DE LOS VALORES EN EL PAQUETE
+# ============================================================
+
+
+def _xml_valor(valor):
+    """(atributo t, contenido de <v>) de un valor calculado."""
+    if isinstance(valor, ErrorExcel):
+        return ' t="e"', escape(valor)
+    if isinstance(valor, bool):
+        return ' t="b"', "1" if valor else "0"
+    if isinstance(valor, str):
+        return ' t="str"', escape(valor)
+    if valor.is_integer() and abs(valor) < 1e15:
+        return "", str(int(valor))
+    return "", repr(valor)
+
+
+def xml_con_valores(xml, valores):
+    """XML de una hoja con el valor en caché ({(fila, letra): valor}) de cada fórmula que aún no lo tiene."""
+    def reemplazar(m):
+        letra, fila, atributos, f = m.groups()
+        valor = valores.get((int(fila), letra))
+        if valor is None:
+            return m.group(0)
+        t, v = _xml_valor(valor)
+        atributos = re.sub(r'\s+t="[^"]*"', "", atributos)
+        return f'<c r="{letra}{fila}"{atributos}{t}>{f}<v>{v}</v></c>'
+
+    return _CELDA_FORMULA.sub(reemplazar, xml)
+
+
+def reescribir_paquete(contenido, partes):
+    """Copia el paquete .xlsx reemplazando las partes de `partes` ({ruta: bytes}); el resto queda igual."""
+    out = BytesIO()
+    with zipfile.ZipFile(BytesIO(contenido)) as zo, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zd:
+        for info in zo.infolist():
+            datos = partes[info.filename] if info.filename in partes else zo.read(info.filename)
+            zd.writestr(info, datos, compress_type=zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def escribir_valores(contenido, valores_por_parte):
+    """
+    Inserta el valor en caché de cada fórmula en las hojas del paquete .xlsx.
+    `valores_por_parte` asocia la ruta de cada hoja (xl/worksheets/sheetN.xml)
+    a su {(fila, letra): valor}.
+    """
+    with zipfile.ZipFile(BytesIO(contenido)) as zf:
+        partes = {
+            parte: xml_con_valores(zf.read(parte).decode("utf-8"), valores).encode("utf-8")
+            for parte, valores in valores_por_parte.items() if valores
+        }
+    return reescribir_paquete(contenido, partes)
+
+
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
+
+def guardar_con_valores(wb):
+    """
+    Calcula las fórmulas de todas las hojas, guarda el libro y escribe los
+    valores en caché. El recálculo al abrir solo queda activo si alguna
+    fórmula no se pudo calcular. Devuelve (libro en memoria, {hoja: valores}).
+    """
+    with etapa("calculo"):
+        valores, completo = {}, True
+        for ws in wb.worksheets:
+            valores[ws.title], calculada = calcular_hoja(ws)
+            completo = completo and calculada
+
+    with etapa("guardado"):
+        wb.calculation.fullCalcOnLoad = not completo
+        out = BytesIO()
+        wb.save(out)
+        # openpyxl asigna la ruta de cada hoja al guardar
+        contenido = escribir_valores(
+            out.getvalue(), {ws.path.lstrip("/"): valores[ws.title] for ws in wb.worksheets}
+        )
+    return BytesIO(contenido), valores
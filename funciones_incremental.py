@@ -0,0 +1,278 @@
+# funciones_incremental.py
+# ============================================================
+# Regeneración incremental de una hoja
+#
+# Junto a cada libro generado se guarda (en el almacén de artefactos, con
+# la misma clave que el libro) su estado en JSON: filas y claves (sede,
+# local) de la plantilla, los valores de datos de cada fila y los valores
+# calculados de las fórmulas. Con una nueva carga se comparan los datos
+# fila por fila y en el paquete del libro anterior se reescriben solo las
+# filas que cambiaron: sus celdas de datos y las fórmulas que dependen de ellas.
+#
+# Si algo impide hacerlo con seguridad (otra plantilla u otra
+# especificación, fórmulas que cruzan filas, estado desalojado) se devuelve
+# None y el llamador genera la hoja completa.
+# ============================================================
+
+import hashlib
+import json
+import os
+import re
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import unescape
+
+import numpy as np
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from funciones_artefactos import guardar_artefacto, leer_artefacto
+from funciones_formulas import (
+    CELDA_XML,
+    FILA_XML,
+    ErrorExcel,
+    FormulaNoSoportada,
+    analizar,
+    calcular_valores,
+    forma_formula,
+    leer_celda,
+    reescribir_paquete,
+    referencias,
+    xml_celda,
+)
+
+
+# Se incrementa cuando cambia el contenido del estado guardado
+VERSION_ESTADO = 2
+EXTENSION_ESTADO = ".estado"
+
+_FORMULA = re.compile(r'<c r="([A-Z]+)(\d+)"[^>]*><f>([^<]*)</f>')
+
+
+class _NoIncremental(Exception):
+    """El libro anterior no se puede actualizar por partes."""
+
+
+# ============================================================
+# ESTADO DE UN LIBRO GENERADO
+# ============================================================
+
+def huella_plantilla(base):
+    """
+    Identifica la plantilla por el contenido de sus partes. Se omite docProps/
+    (fechas de guardado), así dos copias de la misma plantilla coinciden.
+    """
+    if not isinstance(base, (str, os.PathLike)):
+        base.seek(0)
+    sha = hashlib.sha256()
+    with zipfile.ZipFile(base) as zf:
+        for nombre in sorted(zf.namelist()):
+            if not nombre.startswith("docProps/"):
+                sha.update(nombre.encode("utf-8") + b"\0" + zf.read(nombre))
+    if not isinstance(base, (str, os.PathLike)):
+        base.seek(0)
+    return sha.hexdigest()
+
+
+def huella_especificacion(compilada):
+    """Identifica la especificación: si cambia, el estado anterior ya no sirve."""
+    partes = [compilada[k] for k in ("hoja", "claves", "datos", "formulas")]
+    partes.append(getattr(compilada["normalizar"], "__qualname__", repr(compilada["normalizar"])))
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()
+
+
+def _a_json(estado):
+    """Estado → bytes JSON (las claves de fila son tuplas y los errores de Excel se marcan)."""
+    return json.dumps({
+        **estado,
+        "datos": {str(col): [float(v) for v in valores] for col, valores in estado["datos"].items()},
+        "valores": [
+            [fila, letra, str(v), True] if isinstance(v, ErrorExcel) else [fila, letra, v, False]
+            for (fila, letra), v in estado["valores"].items()
+        ],
+    }, default=lambda v: v.item()).encode("utf-8")  # escalares de numpy
+
+
+def _de_json(contenido):
+    """Inverso de _a_json."""
+    estado = json.loads(contenido)
+    estado["claves"] = [tuple(c) if isinstance(c, list) else c for c in estado["claves"]]
+    estado["datos"] = {int(col): valores for col, valores in estado["datos"].items()}
+    estado["valores"] = {
+        (fila, letra): ErrorExcel(v) if error else v for fila, letra, v, error in estado["valores"]
+    }
+    return estado
+
+
+def guardar_estado(contenido, parte, compilada, plantilla, llenado, valores):
+    """
+    Guarda el estado del libro `contenido` (bytes) con la misma clave que
+    tendrá en el almacén de artefactos. `parte` es la ruta de la hoja dentro
+    del paquete, `plantilla` la huella_plantilla de la base, `llenado` lo
+    que devuelve llenar_hoja y `valores` los valores calculados de la hoja.
+    """
+    letras = {get_column_letter(col) for col, _ in compilada["formulas"]}
+    estado = {
+        "version": VERSION_ESTADO,
+        "espec": huella_especificacion(compilada),
+        "plantilla": plantilla,
+        "parte": parte,
+        "filas": list(llenado["filas"]),
+        "claves": list(llenado["claves"]),
+        "datos": {col: list(v) for col, v in llenado["datos"].items()},
+        "valores": {k: v for k, v in valores.items() if k[1] in letras},
+    }
+    guardar_artefacto(
+        _a_json(estado), clave=hashlib.sha256(contenido).hexdigest(), extension=EXTENSION_ESTADO
+    )
+
+
+def cargar_estado(anterior, compilada, plantilla):
+    """
+    Devuelve (bytes del libro anterior, estado) si `anterior` (ruta o archivo)
+    tiene un estado guardado para la misma plantilla y especificación; si no, None.
+    """
+    if anterior is None:
+        return None
+    try:
+        if isinstance(anterior, (str, os.PathLike)):
+            with open(anterior, "rb") as f:
+                contenido = f.read()
+        else:
+            anterior.seek(0)
+            contenido = anterior.read()
+            anterior.seek(0)
+        estado = _de_json(leer_artefacto(hashlib.sha256(contenido).hexdigest(), EXTENSION_ESTADO))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):  # desalojado, de otra versión o dañado
+        return None
+
+    if (estado.get("version"), estado.get("espec"), estado.get("plantilla")) != (
+        VERSION_ESTADO, huella_especificacion(compilada), plantilla
+    ):
+        return None
+    return contenido, estado
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def _columnas_a_recalcular(xml, hoja, letras_datos):
+    """
+    Columnas cuyas fórmulas dependen (directa o indirectamente) de las columnas
+    de datos. Todas sus fórmulas deben usar solo celdas de su misma fila.
+    """
+    formas = {}
+    for m in _FORMULA.finditer(xml):
+        formas.setdefault(m.group(1), set()).add(forma_formula("=" + unescape(m.group(3)), int(m.group(2))))
+
+    arboles = {}
+    for letra, conjunto in formas.items():
+        try:
+            arboles[letra] = [list(referencias(analizar(forma))) for forma in conjunto]
+        except FormulaNoSoportada:
+            raise _NoIncremental(f"fórmula no soportada en la columna {letra}")
+
+    dependientes, recalcular = set(letras_datos), set()
+    cambio = True
+    while cambio:
+        cambio = False
+        for letra, refs_por_forma in arboles.items():
+            if letra not in recalcular and any(
+                get_column_letter(ref[2]) in dependientes for refs in refs_por_forma for ref in refs
+            ):
+                recalcular.add(letra)
+                dependientes.add(letra)
+                cambio = True
+
+    for letra in recalcular:
+        for refs in arboles[letra]:
+            if any(not ref[4] or ref[3] != 0 or ref[1] not in (None, hoja) for ref in refs):
+                raise _NoIncremental(f"la columna {letra} usa celdas de otras filas")
+    return recalcular
+
+
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
+
+def actualizar_libro(contenido, estado, compilada, datos):
+    """
+    Reescribe en el libro anterior (`contenido`) las filas cuyos `datos`
+    (lo que devuelve valores_datos para estado["claves"]) difieren del estado.
+    Devuelve (bytes del libro, valores calculados de la hoja, [(fila, clave)]
+    cambiadas) o None si hay que generar la hoja completa.
+    """
+    hoja = compilada["hoja"]
+    anteriores = estado["datos"]
+    if set(datos) != set(anteriores):
+        return None
+
+    distinto = np.zeros(len(estado["filas"]), dtype=bool)
+    for col, valores in datos.items():
+        distinto |= np.asarray(valores, dtype=float) != np.asarray(anteriores[col], dtype=float)
+    indices = np.flatnonzero(distinto)
+    cambios = [(estado["filas"][i], estado["claves"][i]) for i in indices]
+    if not cambios:
+        return contenido, estado["valores"], []
+
+    letras_datos = {get_column_letter(col): col for col in datos}
+    nuevos = {estado["filas"][i]: {letra: float(datos[col][i]) for letra, col in letras_datos.items()} for i in indices}
+
+    try:
+        with zipfile.ZipFile(BytesIO(contenido)) as zf:
+            xml = zf.read(estado["parte"]).decode("utf-8")
+        if re.search(r"<f\s+t=", xml):
+            raise _NoIncremental("fórmulas compartidas o matriciales")
+        recalcular = _columnas_a_recalcular(xml, hoja, letras_datos)
+
+        # 1️⃣ Leer las filas afectadas: datos nuevos, fórmulas dependientes y el resto tal cual
+        filas = {}
+        columnas = {}
+        for m in FILA_XML.finditer(xml):
+            fila = int(m.group(1))
+            if fila not in nuevos:
+                continue
+            celdas = []
+            for c in CELDA_XML.finditer(m.group(2) or ""):
+                letra, atributos, interior = c.group(1), c.group(3), c.group(4)
+                valor, formula = leer_celda(atributos, interior)  # sin tabla: ValueError si hay t="s"
+                if letra in letras_datos:
+                    valor = nuevos[fila][letra]
+                elif letra in recalcular and formula is not None:
+                    valor = "=" + formula
+                elif formula is not None and valor is None:
+                    raise _NoIncremental(f"{letra}{fila} no tiene valor en caché")
+                celdas.append((letra, atributos, formula, c.span()))
+                columnas.setdefault(column_index_from_string(letra), []).append((fila, valor))
+            if not set(letras_datos) <= {l for l, *_ in celdas}:
+                raise _NoIncremental(f"faltan celdas de datos en la fila {fila}")
+            filas[fila] = (m.start(2), celdas)
+
+        # 2️⃣ Recalcular las fórmulas dependientes de esas filas (vectorizado)
+        calculados, completo = calcular_valores(columnas, max(filas), hoja)
+        if not completo:
+            raise _NoIncremental("fórmulas sin calcular")
+
+        # 3️⃣ Reescribir solo esas filas
+        partes, posicion = [], 0
+        for fila in sorted(filas, key=lambda f: filas[f][0]):
+            inicio, celdas = filas[fila]
+            for letra, atributos, formula, (desde, hasta) in celdas:
+                if letra in letras_datos:
+                    valor = nuevos[fila][letra]
+                elif (fila, letra) in calculados:
+                    valor = calculados[(fila, letra)]
+                else:
+                    continue
+                partes.append(xml[posicion:inicio + desde])
+                partes.append(xml_celda(letra, fila, atributos, valor, formula))
+                posicion = inicio + hasta
+        partes.append(xml[posicion:])
+    except (_NoIncremental, KeyError, ValueError):
+        return None
+
+    valores = dict(estado["valores"])
+    valores.update({k: v for k, v in calculados.items() if k in valores or k[1] in recalcular})
+
+    contenido = reescribir_paquete(contenido, {estado["parte"]: "".join(partes).encode("utf-8")})
+    return contenido, valores, cambios
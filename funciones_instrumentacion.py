@@ -0,0 +1,139 @@
+# funciones_instrumentacion.py
+# ============================================================
+# Medición por etapa (tiempo real, CPU y pico de memoria)
+#
+#   with registrar("OP1") as etapas:        # una ejecución de un reporte
+#       with etapa("lectura"):              # cada etapa dentro de ella
+#           ...
+#   etapas → [{"etapa": "lectura", "segundos": ..., "cpu": ..., ...}, ...]
+#
+# Variables de entorno:
+#   PE_LOG_TIEMPOS=archivo   agrega una línea JSON por etapa al archivo
+#   PE_MEDIR_MEMORIA=1       activa tracemalloc (más lento) y reporta picos en MB
+#   PE_PERFIL=carpeta        guarda un volcado cProfile (.prof) por ejecución
+# ============================================================
+
+import cProfile
+import json
+import logging
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+
+logger = logging.getLogger("pe.tiempos")
+
+if os.environ.get("PE_LOG_TIEMPOS"):
+    _handler = logging.FileHandler(os.environ["PE_LOG_TIEMPOS"], encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+if os.environ.get("PE_MEDIR_MEMORIA") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Ejecución en curso del contexto actual (hilo de Streamlit, proceso del pool)
+_ejecucion = ContextVar("ejecucion", default=None)
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def _actualizar_picos(pila):
+    """Reparte el pico de memoria desde el último reinicio entre las etapas abiertas."""
+    if not tracemalloc.is_tracing():
+        return
+    _, pico = tracemalloc.get_traced_memory()
+    for abierta in pila:
+        abierta["_pico"] = max(abierta["_pico"], pico)
+    tracemalloc.reset_peak()
+
+
+def _abrir(ejecucion, nombre):
+    pila = ejecucion["pila"]
+    _actualizar_picos(pila)
+    memoria = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+    # El registro se agrega al abrir para que las etapas queden en orden de inicio
+    registro = {"etapa": nombre, "nivel": len(pila)}
+    ejecucion["etapas"].append(registro)
+
+    abierta = {
+        "registro": registro,
+        "_inicio": time.perf_counter(),
+        "_cpu": time.process_time(),
+        "_memoria": memoria,
+        "_pico": memoria,
+    }
+    pila.append(abierta)
+    return abierta
+
+
+def _cerrar(ejecucion, abierta):
+    pila = ejecucion["pila"]
+    _actualizar_picos(pila)
+    pila.remove(abierta)
+
+    registro = abierta["registro"]
+    registro["segundos"] = round(time.perf_counter() - abierta["_inicio"], 4)
+    registro["cpu"] = round(time.process_time() - abierta["_cpu"], 4)
+    registro["memoria_mb"] = (
+        round((abierta["_pico"] - abierta["_memoria"]) / (1024 * 1024), 2)
+        if tracemalloc.is_tracing() else None
+    )
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(
+            {"ejecucion": ejecucion["id"], "reporte": ejecucion["reporte"], "pid": os.getpid(), **registro},
+            ensure_ascii=False,
+        ))
+
+
+# ============================================================
+# FUNCIONES PRINCIPALES
+# ============================================================
+
+@contextmanager
+def etapa(nombre):
+    """Mide un bloque dentro de la ejecución en curso; fuera de registrar() no hace nada."""
+    ejecucion = _ejecucion.get()
+    if ejecucion is None:
+        yield
+        return
+
+    abierta = _abrir(ejecucion, nombre)
+    try:
+        yield
+    finally:
+        _cerrar(ejecucion, abierta)
+
+
+@contextmanager
+def registrar(reporte):
+    """
+    Abre una ejecución para `reporte` y entrega la lista donde se acumulan
+    sus etapas, en orden de inicio. La ejecución completa queda como etapa 'total'.
+    """
+    ejecucion = {"id": uuid.uuid4().hex[:8], "reporte": reporte, "pila": [], "etapas": []}
+    token = _ejecucion.set(ejecucion)
+
+    perfil = None
+    if os.environ.get("PE_PERFIL"):
+        perfil = cProfile.Profile()
+        perfil.enable()
+
+    try:
+        with etapa("total"):
+            yield ejecucion["etapas"]
+    finally:
+        _ejecucion.reset(token)
+        if perfil is not None:
+            perfil.disable()
+            os.makedirs(os.environ["PE_PERFIL"], exist_ok=True)
+            fecha = datetime.now().strftime("%Y%m%d-%H%M%S")
+            perfil.dump_stats(os.path.join(os.environ["PE_PERFIL"], f"{reporte}-{fecha}-{ejecucion['id']}.prof"))
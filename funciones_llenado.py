@@ -0,0 +1,152 @@
+# funciones_llenado.py
+# ============================================================
+# Motor de llenado de hojas a partir de una especificación
+#
+# Cada hoja (ASISTENCIA, OP1, OP2) se describe con un diccionario:
+#
+#   {
+#       "hoja": "OP1",
+#       "claves": ["B", "C"],               # columnas que identifican la fila
+#       "normalizar": normalizar_texto,     # cómo se limpian las claves
+#       "columnas": {
+#           "M": dato("asc_inst", ...),     # suma de columnas de una fuente
+#           "O": formula("=G{r}-M{r}"),     # {r} = número de fila
+#       },
+#       "validaciones": ["R"],              # formato OK / ERR
+#   }
+#
+# La especificación se compila una vez (índices de columna y fórmulas
+# partidas) y se ejecuta columna por columna sobre todas las filas.
+# El libro de cada reporte se arma en funciones_escritura.
+# ============================================================
+
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import PatternFill
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from funciones_errores import ConfiguracionInvalida
+
+
+ROJO = PatternFill("solid", fgColor="FFC7CE")
+VERDE = PatternFill("solid", fgColor="C6EFCE")
+
+
+# ============================================================
+# ELEMENTOS DE LA ESPECIFICACIÓN
+# ============================================================
+
+def dato(fuente, *campos):
+    """Columna con la suma de `campos` de la tabla `fuente` para la clave de la fila."""
+    return ("dato", fuente, campos)
+
+
+def formula(plantilla):
+    """Columna con una fórmula; '{r}' se reemplaza por el número de fila."""
+    return ("formula", plantilla)
+
+
+# ============================================================
+# COMPILACIÓN
+# ============================================================
+
+def compilar_especificacion(espec):
+    """
+    Traduce las letras de columna a índices y agrupa las columnas de datos
+    por fuente, para que el llenado no tenga que interpretar coordenadas.
+    """
+    datos = {}
+    formulas = []
+    for letra, (clase, *args) in espec["columnas"].items():
+        col = column_index_from_string(letra)
+        if clase == "dato":
+            fuente, campos = args
+            datos.setdefault(fuente, []).append((col, campos))
+        elif clase == "formula":
+            formulas.append((col, args[0].split("{r}")))
+        else:
+            raise ConfiguracionInvalida(f"❌ Tipo de columna desconocido en '{espec['hoja']}': {clase}")
+
+    return {
+        "hoja": espec["hoja"],
+        "claves": [column_index_from_string(c) for c in espec["claves"]],
+        "normalizar": espec["normalizar"],
+        "datos": datos,
+        "formulas": formulas,
+        "validaciones": list(espec.get("validaciones", [])),
+    }
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+def _leer_claves(ws, compilada):
+    """Filas con clave completa y sus claves normalizadas (una tupla o un valor por fila)."""
+    cols = compilada["claves"]
+    normalizar = compilada["normalizar"]
+    desde, hasta = min(cols), max(cols)
+
+    filas, claves = [], []
+    for r, valores in enumerate(
+        ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=desde, max_col=hasta, values_only=True),
+        start=2,
+    ):
+        clave = tuple(normalizar(valores[c - desde]) for c in cols)
+        if all(clave):
+            filas.append(r)
+            claves.append(clave if len(clave) > 1 else clave[0])
+    return filas, claves
+
+
+def _valores_fuente(tabla, claves, columnas):
+    """Alinea la tabla con las claves de la hoja (faltantes = 0) y suma cada grupo de campos."""
+    campos = sorted({c for _, grupo in columnas for c in grupo}, key=str)
+    alineada = tabla.reindex(index=claves, columns=campos).fillna(0)
+    return [(col, alineada[list(grupo)].sum(axis=1).tolist()) for col, grupo in columnas]
+
+
+def valores_datos(compilada, fuentes, claves):
+    """Valores de cada columna de datos ({columna: [valor por clave]}) para las claves dadas."""
+    datos = {}
+    for fuente, columnas in compilada["datos"].items():
+        datos.update(_valores_fuente(fuentes[fuente], claves, columnas))
+    return datos
+
+
+def llenar_hoja(ws, compilada, fuentes):
+    """
+    Escribe en `ws` todas las columnas de la especificación compilada.
+
+    `fuentes` asocia cada nombre usado en dato() a un DataFrame indexado por
+    la clave de la hoja (sede, o (sede, local)) con una columna por campo.
+    Devuelve {"filas", "claves", "datos"}: lo escrito, para la regeneración incremental.
+    """
+    filas, claves = _leer_claves(ws, compilada)
+    datos = valores_datos(compilada, fuentes, claves)
+
+    if filas:
+        for col, valores in datos.items():
+            for r, v in zip(filas, valores):
+                ws.cell(row=r, column=col).value = v
+
+        for col, partes in compilada["formulas"]:
+            for r in filas:
+                ws.cell(row=r, column=col).value = str(r).join(partes)
+
+    for c in compilada["validaciones"]:
+        rango = f"{c}2:{c}{ws.max_row}"
+        ws.conditional_formatting.add(rango, CellIsRule("equal", ['"ERR"'], fill=ROJO))
+        ws.conditional_formatting.add(rango, CellIsRule("equal", ['"OK"'], fill=VERDE))
+
+    return {"filas": filas, "claves": claves, "datos": datos}
+
+
+def contar_validaciones(compilada, valores):
+    """Cantidad de celdas OK y ERR en las columnas de fórmula, según los valores calculados de la hoja."""
+    letras = {get_column_letter(col) for col, _ in compilada["formulas"]}
+    conteo = {"OK": 0, "ERR": 0}
+    for (_, letra), valor in valores.items():
+        if letra in letras and isinstance(valor, str) and valor in conteo:
+            conteo[valor] += 1
+    return conteo
+
@@ -3,125 +3,123 @@
 # Módulo de funciones para la hoja OP2 (ACCESO)
 # ============================================================
 
-import pandas as pd
-from io import BytesIO
-from openpyxl import load_workbook
-from openpyxl.workbook.properties import CalcProperties
-import unicodedata
-import streamlit as st
+from funciones_carga import cargar_inventario
+from funciones_comunes import (
+    TIPO,
+    construir_tabla,
+    normalizar_columnas,
+    normalizar_texto,
+    tipos_sin_clasificar,
+)
+from funciones_errores import en_entrada
+from funciones_escritura import generar_hoja
+from funciones_instrumentacion import etapa
+from funciones_llenado import compilar_especificacion, dato, formula
 
 
 # ============================================================
-# FUNCIONES AUXILIARES
+# CATEGORÍAS DE TIPO POR COLUMNA
 # ============================================================
 
-def habilitar_recalculo(wb):
-    """Activa recálculo completo al abrir Excel."""
-    try:
-        wb.calculation_properties.fullCalcOnLoad = True
-    except Exception:
-        wb.calculation_properties = CalcProperties(fullCalcOnLoad=True)
-
-
-def normalizar_texto(valor):
-    """Convierte texto a minúsculas, sin tildes ni guiones especiales."""
-    if pd.isna(valor):
-        return ""
-    return (
-        unicodedata.normalize('NFKD', str(valor).strip().lower())
-        .encode('ascii', 'ignore')
-        .decode('utf-8')
-        .replace('–', '-')
-        .replace('—', '-')
-        .replace('  ', ' ')
-    )
-
-
-def cargar_excel_con_encabezado_correcto(file):
-    """Detecta la fila donde aparece 'Sede Operativa' y la usa como encabezado."""
-    df_raw = pd.read_excel(file, header=None)
-    header_row = None
-    for i in range(len(df_raw)):
-        fila = df_raw.iloc[i].astype(str).str.lower()
-        if fila.str.contains("sede operativa").any():
-            header_row = i
-            break
-    if header_row is None:
-        raise ValueError("❌ No se encontró la fila con 'Sede Operativa' en el archivo.")
-    df = pd.read_excel(file, header=header_row)
-    df.columns = df.columns.str.strip()
-    return df
+# Columna de OP2 → categoría de ACC - FA
+TIPOS_FA = {
+    "AD": TIPO["ACTA_RECEPCION"],
+    "AF": TIPO["ACTA_APLICACION"],
+    "AH": TIPO["LISTA_ASISTENCIA"],
+    "AJ": TIPO["LISTA_RETIRO"],
+    "AL": TIPO["ACTA_OBSERVACIONES"],
+    "AN": TIPO["REGISTRO_ADICIONALES"],
+    "AP": TIPO["ACTA_INCIDENCIAS_CAE"],
+    "AR": TIPO["ACTA_INCUMPLIMIENTO"],
+    "AT": TIPO["ACTA_INCIDENCIAS_SALUD"],
+    "AV": TIPO["ACTA_INCIDENCIAS_LOCAL"],
+    "AX": TIPO["ACTA_FISCAL"],
+    "AZ": TIPO["SOBRE"],
+}
 
 
 # ============================================================
-# FUNCIÓN PRINCIPAL
+# ESPECIFICACIÓN DE LA HOJA
 # ============================================================
 
-def generar_op2(base, acc_fa, acc_inst):
-    """
-    Genera la hoja OP2 en el archivo base (PE3 - Reporte.xlsx)
-    usando:
-      - ACC - INSTRUMENTOS.xlsx
-      - ACC - FA.xlsx
-    """
-    st.info("⚙️ Procesando hoja OP2...")
-
-    try:
-        # 1️⃣ Cargar los datos ACC
-        acc_fa_df = cargar_excel_con_encabezado_correcto(acc_fa)
-        acc_inst_df = cargar_excel_con_encabezado_correcto(acc_inst)
+ESPEC_OP2 = compilar_especificacion({
+    "hoja": "OP2",
+    "claves": ["B", "C"],
+    "normalizar": normalizar_texto,
+    "columnas": {
+        # 1️⃣ ACC - INSTRUMENTOS → columnas I, J
+        "I": dato("inst", TIPO["CUADERNILLO_CCPP"]),
+        "J": dato("inst", TIPO["FICHA_RESPUESTA"]),
 
-        # Normalizar textos en DataFrames
-        for df in [acc_fa_df, acc_inst_df]:
-            for col in ["Sede Operativa", "Local", "Tipo"]:
-                df[col] = df[col].astype(str).map(normalizar_texto)
+        # 2️⃣ Fórmulas K–N (con IF en inglés)
+        "K": formula("=E{r}-I{r}"),
+        "L": formula("=F{r}-J{r}"),
+        "M": formula("=IF(E{r}=0,1,I{r}/E{r})"),
+        "N": formula("=IF(F{r}=0,1,J{r}/F{r})"),
 
-        # 2️⃣ Abrir plantilla base
-        wb = load_workbook(base)
-        if "OP2" not in wb.sheetnames:
-            raise ValueError("❌ No se encontró la hoja 'OP2' en el archivo base.")
+        # 3️⃣ ACC - FA → columnas AD, AF, AH, AJ, AL, AN, AP, AR, AT, AV, AX, AZ
+        **{col: dato("fa", categoria) for col, categoria in TIPOS_FA.items()},
 
-        # 🔹 Dejar solo la hoja OP2
-        for nombre in wb.sheetnames.copy():
-            if nombre != "OP2":
-                del wb[nombre]
+        # 4️⃣ Fórmulas AE–BA (todas con IF en inglés)
+        "AE": formula("=AD{r}/R{r}"),
+        "AG": formula("=AF{r}/S{r}"),
+        "AI": formula("=AH{r}/T{r}"),
+        "AK": formula("=AJ{r}/U{r}"),
+        "AM": formula("=AL{r}/V{r}"),
+        "AO": formula("=AN{r}/W{r}"),
+        "AQ": formula("=AP{r}/X{r}"),
+        "AS": formula('=IF(AR{r}=Y{r},"OK","ERR")'),
+        "AU": formula("=AT{r}/Z{r}"),
+        "AW": formula("=AV{r}/AA{r}"),
+        "AY": formula('=IF(AX{r}=AB{r},"OK","ERR")'),
+        "BA": formula("='OP2'!$AZ{r}/'OP2'!$AC{r}"),
+    },
+})
 
-        ws = wb["OP2"]
 
-        # 3️⃣ Procesar hoja
-        actualizar_OP2(ws, acc_fa_df, acc_inst_df)
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
 
-        # 4️⃣ Forzar recálculo al abrir (compatible con todas las versiones de openpyxl)
-        try:
-            wb.calculation_properties.fullCalcOnLoad = True
-            wb.calculation_properties.calcMode = "auto"
-            wb.calculation_properties.calcId = 0
-        except Exception:
-            wb.calculation_properties = CalcProperties(fullCalcOnLoad=True)
+def construir_op2(base, acc_fa, acc_inst, anterior=None):
+    """
+    Genera la hoja OP2 y devuelve (libro en memoria, avisos, detalle) sin usar Streamlit.
+    Con `anterior` (el último libro generado) solo se reescriben los locales que cambiaron.
+    Cada archivo de inventario puede ser una lista de fragmentos (uno por región).
+    Los errores de datos o de plantilla son subclases de ErrorReporte.
+    """
+    avisos = []
 
-        ws.calculationId = None
-        wb.active = wb.sheetnames.index("OP2")
+    # 1️⃣ Cargar los datos ACC
+    with etapa("lectura"):
+        with en_entrada("acc_fa"):
+            acc_fa_df = cargar_inventario("fa", acc_fa)
+        with en_entrada("acc_inst"):
+            acc_inst_df = cargar_inventario("instrumento", acc_inst)
 
-        # 5️⃣ Guardar resultado en memoria
-        habilitar_recalculo(wb)
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
-        st.session_state["op2_generada"] = out
+    # Normalizar textos en DataFrames (una vez por valor distinto)
+    with etapa("agregacion"):
+        for df in [acc_fa_df, acc_inst_df]:
+            normalizar_columnas(df)
+        sin_categoria = tipos_sin_clasificar(acc_fa_df, acc_inst_df)
+    if sin_categoria:
+        avisos.append(f"⚠️ Tipos no reconocidos (no se suman en OP2): {', '.join(sin_categoria)}")
 
-        st.success("✅ Hoja OP2 generada correctamente.")
+    # 2️⃣ Tablas por (sede, local)
+    fuentes = tablas_OP2(acc_fa_df, acc_inst_df)
 
-    except Exception as e:
-        st.error(f"❌ Error al generar OP2: {e}")
+    # 3️⃣ Llenar la plantilla (o actualizar el libro anterior) con valores en caché
+    out, detalle = generar_hoja(base, ESPEC_OP2, fuentes, anterior)
+    return out, avisos, detalle
 
 
 # ============================================================
 # FUNCIÓN PRINCIPAL DE CÁLCULO
 # ============================================================
 
-def actualizar_OP2(ws, acc_fa_df, acc_inst_df):
+def tablas_OP2(acc_fa_df, acc_inst_df):
     """
-    Actualiza fila por fila la hoja OP2:
+    Fuentes de ESPEC_OP2, indexadas por (sede, local). La hoja queda así:
 
     - A–H: se mantienen.
     - I–J: se llenan desde ACC-INSTRUMENTOS.
@@ -130,100 +128,5 @@ def actualizar_OP2(ws, acc_fa_df, acc_inst_df):
     - AD–AZ: datos desde ACC-FA.
     - AE–BA: fórmulas automáticas.
     """
-
-    sede_col = "Sede Operativa"
-    local_col = "Local"
-    tipo_col = "Tipo"
-    inv_col = "Inventario en campo"
-
-    # Iterar filas
-    for r in range(2, ws.max_row + 1):
-        sede = normalizar_texto(ws[f"B{r}"].value)
-        local = normalizar_texto(ws[f"C{r}"].value)
-        if not sede or not local:
-            continue
-
-        # ----------------------------------------------------
-        # 1️⃣ ACC - INSTRUMENTOS → columnas I, J
-        # ----------------------------------------------------
-        df_inst = acc_inst_df[
-            (acc_inst_df[sede_col] == sede) &
-            (acc_inst_df[local_col] == local)
-        ]
-
-        acc_c = df_inst.loc[
-            df_inst[tipo_col].str.contains("cuadernillo de conocimientos pedagog", case=False, na=False),
-            inv_col
-        ].sum()
-
-        acc_f = df_inst.loc[
-            df_inst[tipo_col].str.contains("ficha de respuesta", case=False, na=False),
-            inv_col
-        ].sum()
-
-        ws[f"I{r}"].value = acc_c if pd.notna(acc_c) else 0
-        ws[f"J{r}"].value = acc_f if pd.notna(acc_f) else 0
-
-        # ----------------------------------------------------
-        # 2️⃣ Fórmulas K–N (con IF en inglés)
-        # ----------------------------------------------------
-        ws[f"K{r}"].value = f"=E{r}-I{r}"
-        ws[f"L{r}"].value = f"=F{r}-J{r}"
-        ws[f"M{r}"].value = f"=IF(E{r}=0,1,I{r}/E{r})"
-        ws[f"N{r}"].value = f"=IF(F{r}=0,1,J{r}/F{r})"
-
-        # ----------------------------------------------------
-        # 3️⃣ ACC - FA → columnas AD, AF, AH, AJ, AL, AN, AP, AR, AT, AV, AX, AZ
-        # ----------------------------------------------------
-        df_fa = acc_fa_df[
-            (acc_fa_df[sede_col] == sede) &
-            (acc_fa_df[local_col] == local)
-        ]
-
-        def sumar_tipo(patrones):
-            if df_fa.empty:
-                return 0
-            mask = df_fa[tipo_col].str.contains("|".join(patrones), case=False, na=False)
-            return df_fa.loc[mask, inv_col].sum()
-
-        tipos = {
-            "AD": ["ACTA DE RECEPCION/DEVOLUCION", "ACTA DE RECEPCIÓN/DEVOLUCIÓN"],
-            "AF": ["ACTA DE APLICACION DEL AULA", "ACTA DE APLICACIÓN DEL AULA"],
-            "AH": ["LISTA DE ASISTENCIA"],
-            "AJ": ["LISTA DE RETIRO DE CUADERNILLOS"],
-            "AL": ["ACTA DE RESPUESTA A OBSERVACIONES DEL DOCENTE"],
-            "AN": ["REGISTRO DE ENTREGA INSTRUMENTOS ADICIONALES"],
-            "AP": ["ACTA DE INCIDENCIAS DEL CAE"],
-            "AR": ["ACTA DE INCUMPLIMIENTO DE PROCEDIMIENTOS"],
-            "AT": ["ACTA DE INCIDENCIAS DE SALUD"],
-            "AV": ["ACTA DE INCIDENCIAS DEL LOCAL DE EVALUACION", "ACTA DE INCIDENCIAS DEL LOCAL DE EVALUACIÓN"],
-            "AX": ["ACTA FISCAL"],
-            "AZ": ["SOBRES", "SOBRE"],
-        }
-
-        for col, pats in tipos.items():
-            val = sumar_tipo(pats)
-            ws[f"{col}{r}"].value = val if pd.notna(val) else 0
-
-        # ----------------------------------------------------
-        # 4️⃣ Fórmulas AE–BA (todas con IF en inglés)
-        # ----------------------------------------------------
-        formulas = {
-            "AE": f"=AD{r}/R{r}",
-            "AG": f"=AF{r}/S{r}",
-            "AI": f"=AH{r}/T{r}",
-            "AK": f"=AJ{r}/U{r}",
-            "AM": f"=AL{r}/V{r}",
-            "AO": f"=AN{r}/W{r}",
-            "AQ": f"=AP{r}/X{r}",
-            "AS": f'=IF(AR{r}=Y{r},"OK","ERR")',
-            "AU": f"=AT{r}/Z{r}",
-            "AW": f"=AV{r}/AA{r}",
-            "AY": f'=IF(AX{r}=AB{r},"OK","ERR")',
-            "BA": f"='OP2'!$AZ{r}/'OP2'!$AC{r}",
-        }
-
-        for col, formula in formulas.items():
-            ws[f"{col}{r}"].value = formula
-
-    return ws
\ No newline at end of file
+    with etapa("tablas"):
+        return {"inst": construir_tabla(acc_inst_df), "fa": construir_tabla(acc_fa_df)}
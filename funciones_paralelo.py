@@ -0,0 +1,173 @@
+# funciones_paralelo.py
+# ============================================================
+# Ejecución en paralelo de los reportes (Asistencia, OP1, OP2)
+# ============================================================
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from funciones_artefactos import guardar_artefacto
+from funciones_clasificacion import fragmentos
+from funciones_errores import ErrorReporte
+from funciones_exportacion import guardar_tabla
+from funciones_plantilla import preparar_plantilla
+from funciones_reportes import ENTRADAS, generar_final, generar_reporte, obtener_constructor, serializar_entrada
+
+
+# Reporte → (clave en session_state, archivos clasificados que necesita, en orden)
+REPORTES = {
+    "ASISTENCIA": ("asistencia_generada", ENTRADAS["ASISTENCIA"]),
+    "OP1": ("op1_generada", ENTRADAS["OP1"]),
+    "OP2": ("op2_generada", ENTRADAS["OP2"]),
+}
+
+# Archivo clasificado → tipo en la caché de archivos procesados (el que usa su generador)
+TIPOS_CARGA = {
+    "asc": "postulantes", "nom": "postulantes", "acc": "postulantes",
+    "asc_inst": "instrumento", "nom_inst": "instrumento", "acc_inst": "instrumento",
+    "asc_fa": "fa", "acc_fa": "fa",
+}
+
+NOMBRES_SALIDA = {
+    "ASISTENCIA": "PE - Reporte_ASISTENCIA.xlsx",
+    "OP1": "PE - Reporte_OP1.xlsx",
+    "OP2": "PE - Reporte_OP2.xlsx",
+    "FINAL": "PE - Reporte_Final.xlsx",
+}
+
+
+def obtener_cargador(tipo):
+    """Función de funciones_carga que procesa un archivo de ese tipo."""
+    from funciones_carga import cargar_excel_con_encabezado_correcto, cargar_postulantes
+    return cargar_postulantes if tipo == "postulantes" else cargar_excel_con_encabezado_correcto
+
+
+# ============================================================
+# TRABAJO (SE EJECUTA EN UN PROCESO DEL POOL)
+# ============================================================
+
+def _precalentar_proceso():
+    """Inicializador del pool: cada proceso importa los generadores al nacer."""
+    for hoja in REPORTES:
+        obtener_constructor(hoja)
+
+
+def _listo():
+    return os.getpid()
+
+
+def precargar_archivo(tipo, contenido):
+    """
+    Lee y agrega un archivo de entrada para dejarlo en la caché de disco: el
+    generador que lo use después lo encuentra ya procesado. Devuelve
+    (filas agregadas, segundos); el DataFrame no vuelve al proceso principal.
+    """
+    from funciones_cache import cargar_con_cache
+
+    inicio = time.perf_counter()
+    df = cargar_con_cache(tipo, BytesIO(contenido), obtener_cargador(tipo))
+    return len(df), round(time.perf_counter() - inicio, 2)
+
+
+def ejecutar_reporte(hoja, base, archivos, anterior=None):
+    """
+    generar_reporte a partir de bytes (`archivos` en el orden de ENTRADAS[hoja]).
+    El libro y su tabla de datos se guardan en el almacén de artefactos y no
+    vuelven al proceso principal: el resultado lleva la "clave" del libro en
+    lugar de "contenido" y "tabla".
+    """
+    resultado = generar_reporte(hoja, dict(zip(ENTRADAS[hoja], archivos)), anterior=anterior, base=base)
+    resultado["clave"] = guardar_artefacto(resultado.pop("contenido"))
+    guardar_tabla(resultado.pop("tabla"), resultado["clave"])
+    return resultado
+
+
+def ejecutar_combinacion(plantilla_path, rutas, clave):
+    """generar_final con los tres reportes en el almacén; el final se guarda con `clave`."""
+    resultado = generar_final(dict(zip(ENTRADAS, rutas)), plantilla_path)
+    resultado["clave"] = guardar_artefacto(resultado.pop("contenido"), clave=clave)
+    return resultado
+
+
+# ============================================================
+# FUNCIONES PRINCIPALES
+# ============================================================
+
+def crear_ejecutor(max_workers=None):
+    """
+    Pool de procesos ('spawn': seguro aunque el proceso padre tenga hilos).
+    Por omisión uno por núcleo (al menos uno por reporte): los fragmentos de
+    los archivos se leen a la vez. Los procesos se crean a demanda.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or max(len(REPORTES), os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_precalentar_proceso,
+    )
+
+
+def precalentar(plantilla_path, ejecutor=None, procesos=len(REPORTES)):
+    """
+    En un hilo de fondo: importa pandas/openpyxl y los generadores, separa la
+    plantilla y arranca los procesos del pool, para que la primera generación
+    no pague esos costos. Devuelve el hilo.
+    """
+    def trabajo():
+        preparar_plantilla(plantilla_path)
+        for hoja in REPORTES:
+            obtener_constructor(hoja)
+        if ejecutor is not None:
+            # El pool crea los procesos a demanda: una tarea vacía por proceso
+            try:
+                for futuro in [ejecutor.submit(_listo) for _ in range(procesos)]:
+                    futuro.result()
+            except Exception:
+                pass  # Solo es una optimización: si el pool falla se recrea al generar
+
+    hilo = threading.Thread(target=trabajo, name="precalentar", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def reportes_disponibles(clasificados):
+    """Reportes cuyos archivos de entrada están todos presentes."""
+    return [hoja for hoja, (_, claves) in REPORTES.items() if all(clasificados.get(k) for k in claves)]
+
+
+def lanzar_precarga(enviar, clasificados, actuales=None):
+    """
+    Encola la lectura de cada archivo clasificado (cada fragmento por
+    separado, así se leen en paralelo) con `enviar(tipo, contenido)`, que
+    devuelve el trabajo (funciones_cola.enviar_precarga), y devuelve
+    {(clave, nombre, id): trabajo}. Los archivos que ya están en `actuales`
+    (la precarga de una ejecución anterior) no se vuelven a enviar, y los que
+    ya no están cargados se descartan. Si la cola está llena el archivo no se
+    precarga: se intenta de nuevo en la siguiente ejecución.
+    """
+    actuales = actuales or {}
+    trabajos = {}
+    for clave, archivo in clasificados.items():
+        for fragmento in fragmentos(archivo):
+            id_archivo = (clave, getattr(fragmento, "name", None), getattr(fragmento, "file_id", None))
+            trabajo = actuales.get(id_archivo)
+            if trabajo is None:
+                try:
+                    trabajo = enviar(TIPOS_CARGA[clave], serializar_entrada(fragmento))
+                except ErrorReporte:
+                    continue
+            trabajos[id_archivo] = trabajo
+    return trabajos
+
+
+def esperar_precarga(trabajos, claves=None, timeout=None):
+    """
+    Espera la precarga de los archivos `claves` (todos si es None). Los errores
+    se ignoran: el generador vuelve a leer el archivo y muestra el error real.
+    """
+    for (clave, *_), trabajo in trabajos.items():
+        if claves is None or clave in claves:
+            trabajo.listo.wait(timeout)
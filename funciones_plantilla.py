@@ -0,0 +1,74 @@
+# funciones_plantilla.py
+# ============================================================
+# Módulo de la plantilla base (PE3 - Reporte.xlsx)
+# ============================================================
+
+import os
+import threading
+from io import BytesIO
+
+from funciones_errores import PlantillaInvalida
+
+
+HOJAS_REPORTE = ["ASISTENCIA", "OP1", "OP2"]
+
+_snapshots = {}  # ruta → (mtime, bytes del archivo, {hoja: bytes del libro con solo esa hoja})
+_lock = threading.Lock()
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def _separar_hojas(contenido):
+    """Genera, para cada hoja de reporte, un libro que solo contiene esa hoja."""
+    from openpyxl import load_workbook  # import diferido: la app arranca sin openpyxl
+
+    snapshots = {}
+    for hoja in HOJAS_REPORTE:
+        wb = load_workbook(BytesIO(contenido))
+        if hoja not in wb.sheetnames:
+            continue
+        for nombre in wb.sheetnames.copy():
+            if nombre != hoja:
+                del wb[nombre]
+        out = BytesIO()
+        wb.save(out)
+        snapshots[hoja] = out.getvalue()
+    return snapshots
+
+
+# ============================================================
+# FUNCIONES PRINCIPALES
+# ============================================================
+
+def _cargar(ruta):
+    mtime = os.stat(ruta).st_mtime_ns
+    with _lock:
+        actual = _snapshots.get(ruta)
+        if actual is None or actual[0] != mtime:
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            _snapshots[ruta] = (mtime, contenido, _separar_hojas(contenido))
+        return _snapshots[ruta]
+
+
+def preparar_plantilla(ruta):
+    """
+    Separa la plantilla en una copia por hoja (ASISTENCIA, OP1, OP2) y la
+    mantiene en memoria. Se vuelve a separar solo si cambia el mtime del archivo.
+    """
+    return _cargar(ruta)[2]
+
+
+def contenido_plantilla(ruta):
+    """Bytes del archivo de plantilla completo (misma invalidación por mtime)."""
+    return _cargar(ruta)[1]
+
+
+def obtener_plantilla(hoja, ruta):
+    """Devuelve un archivo en memoria, listo para load_workbook, con solo la hoja pedida."""
+    snapshots = preparar_plantilla(ruta)
+    if hoja not in snapshots:
+        raise PlantillaInvalida(f"❌ No existe la hoja '{hoja}' en la plantilla.")
+    return BytesIO(snapshots[hoja])
@@ -0,0 +1,128 @@
+# funciones_reportes.py
+# ============================================================
+# Generación de reportes sin Streamlit
+#
+#   resultado = generar_reporte("OP1", {"asc_fa": ..., "asc_inst": [...], "nom_inst": ...})
+#   resultado["contenido"]       → bytes del libro
+#   resultado["validaciones"]    → {"OK": n, "ERR": n}
+#   resultado["tabla"]           → DataFrame con los datos por clave (funciones_exportacion)
+#   resultado["etapas"]          → tiempo, CPU y memoria por etapa
+#
+# Las entradas son rutas, archivos en memoria o bytes (en Instrumentos / FA
+# también listas de fragmentos). Los errores esperados son subclases de
+# ErrorReporte (funciones_errores). La app, el procesamiento por lotes y el
+# pool de procesos usan esta capa.
+# ============================================================
+
+import os
+from io import BytesIO
+
+from funciones_combinar import combinar_reportes
+from funciones_errores import ConfiguracionInvalida, EntradaFaltante
+from funciones_instrumentacion import registrar
+from funciones_plantilla import obtener_plantilla
+
+
+PLANTILLA_PATH = os.path.join("plantillas", "PE3 - Reporte.xlsx")
+
+# Reporte → archivos clasificados que necesita, en el orden de su construir_*
+ENTRADAS = {
+    "ASISTENCIA": ["asc", "nom", "acc"],
+    "OP1": ["asc_fa", "asc_inst", "nom_inst"],
+    "OP2": ["acc_fa", "acc_inst"],
+}
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def obtener_constructor(hoja):
+    """Función construir_* de un reporte."""
+    # Import diferido: cada proceso solo carga el generador que usa
+    if hoja == "ASISTENCIA":
+        from funciones_asistencia import construir_asistencia
+        return construir_asistencia
+    if hoja == "OP1":
+        from funciones_op1 import construir_op1
+        return construir_op1
+    if hoja == "OP2":
+        from funciones_op2 import construir_op2
+        return construir_op2
+    raise ConfiguracionInvalida(f"❌ Reporte desconocido: '{hoja}' (opciones: {', '.join(ENTRADAS)})")
+
+
+def _abrir(archivo):
+    """Bytes → archivo en memoria (también dentro de una lista de fragmentos)."""
+    if isinstance(archivo, list):
+        return [_abrir(a) for a in archivo]
+    return BytesIO(archivo) if isinstance(archivo, (bytes, bytearray)) else archivo
+
+
+def serializar_entrada(archivo):
+    """Bytes de un archivo (ruta, subido o en memoria) para enviarlo a otro proceso o combinarlo."""
+    if isinstance(archivo, list):
+        return [serializar_entrada(a) for a in archivo]  # fragmentos de un mismo archivo
+    if isinstance(archivo, (bytes, bytearray)):
+        return bytes(archivo)
+    if hasattr(archivo, "getvalue"):
+        return archivo.getvalue()
+    if hasattr(archivo, "read"):
+        archivo.seek(0)
+        return archivo.read()
+    with open(archivo, "rb") as f:
+        return f.read()
+
+
+def entradas_faltantes(hoja, entradas):
+    """Claves de ENTRADAS[hoja] que no están en `entradas` (o están vacías)."""
+    return [clave for clave in ENTRADAS[hoja] if not entradas.get(clave)]
+
+
+# ============================================================
+# FUNCIONES PRINCIPALES
+# ============================================================
+
+def generar_reporte(hoja, entradas, plantilla=PLANTILLA_PATH, anterior=None, base=None):
+    """
+    Genera un reporte ('ASISTENCIA', 'OP1' u 'OP2') a partir de `entradas`
+    ({clave clasificada: archivo}; se ignoran las que no usa) y la plantilla
+    completa en `plantilla`. `base` (bytes del libro con solo esa hoja)
+    evita volver a separar la plantilla; `anterior` es el último libro
+    generado, para reescribir solo las filas que cambiaron.
+
+    Devuelve {"hoja", "contenido", "avisos", "validaciones",
+    "filas_cambiadas", "tabla", "etapas"}. Lanza EntradaFaltante, ArchivoInvalido,
+    PlantillaInvalida o ConfiguracionInvalida.
+    """
+    construir = obtener_constructor(hoja)
+    faltantes = entradas_faltantes(hoja, entradas)
+    if faltantes:
+        raise EntradaFaltante(f"❌ Faltan archivos para {hoja}: {', '.join(c.upper() for c in faltantes)}")
+
+    base = BytesIO(base) if base is not None else obtener_plantilla(hoja, plantilla)
+    with registrar(hoja) as etapas:
+        out, avisos, detalle = construir(base, *[_abrir(entradas[c]) for c in ENTRADAS[hoja]], anterior=anterior)
+    return {
+        "hoja": hoja,
+        "contenido": out.getvalue(),
+        "avisos": avisos,
+        "validaciones": detalle["validaciones"],
+        "filas_cambiadas": detalle["filas_cambiadas"],
+        "tabla": detalle["tabla"],
+        "etapas": etapas,
+    }
+
+
+def generar_final(reportes, plantilla=PLANTILLA_PATH):
+    """
+    Combina los reportes generados ({hoja: libro como bytes, archivo o ruta},
+    los tres de ENTRADAS) en el reporte final. Devuelve {"contenido", "etapas"}.
+    """
+    faltantes = [hoja for hoja in ENTRADAS if reportes.get(hoja) is None]
+    if faltantes:
+        raise EntradaFaltante(f"❌ Faltan reportes para el reporte final: {', '.join(faltantes)}")
+
+    with registrar("FINAL") as etapas:
+        combinado = combinar_reportes(plantilla, *[serializar_entrada(reportes[hoja]) for hoja in ENTRADAS])
+    return {"contenido": combinado.getvalue(), "etapas": etapas}
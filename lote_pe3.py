@@ -0,0 +1,199 @@
+# lote_pe3.py
+# ============================================================
+# Generación de reportes por lotes (sin Streamlit)
+#
+# Uso:
+#   python lote_pe3.py ENTRADAS --salida SALIDA [--workers N] [--forzar] [--datos csv,parquet,json]
+#
+# Cada carpeta bajo ENTRADAS que contenga archivos .xlsx se clasifica con
+# las mismas reglas de la app y genera ASISTENCIA / OP1 / OP2 / Final en
+# la carpeta equivalente bajo SALIDA. Con --datos, junto a cada reporte se
+# escriben también sus datos por sede / local en esos formatos.
+# ============================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from datetime import datetime
+from pathlib import Path
+
+from funciones_clasificacion import clasificar_archivos
+from funciones_exportacion import FORMATOS, leer_formatos, serializar_tabla
+from funciones_paralelo import NOMBRES_SALIDA, REPORTES, crear_ejecutor, reportes_disponibles
+from funciones_reportes import PLANTILLA_PATH, generar_final, generar_reporte
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def buscar_carpetas(raiz, excluir=None):
+    """Carpetas bajo `raiz` que contienen al menos un .xlsx (se omite `excluir`)."""
+    excluir = os.path.abspath(excluir) if excluir else None
+    carpetas = []
+    for carpeta, subcarpetas, archivos in os.walk(raiz):
+        # Por partes de la ruta: --salida /datos/out no omite /datos/output2
+        if excluir and Path(os.path.abspath(carpeta)).is_relative_to(excluir):
+            subcarpetas[:] = []
+            continue
+        subcarpetas.sort()
+        if any(a.lower().endswith(".xlsx") and not a.startswith("~$") for a in archivos):
+            carpetas.append(carpeta)
+    return carpetas
+
+
+def archivos_de(carpeta):
+    return sorted(
+        p for p in Path(carpeta).iterdir()
+        if p.suffix.lower() == ".xlsx" and not p.name.startswith("~$")
+    )
+
+
+def esta_al_dia(entradas, salidas):
+    """True si todas las salidas existen y son más recientes que todas las entradas."""
+    if not salidas or not all(os.path.exists(s) for s in salidas):
+        return False
+    return min(os.path.getmtime(s) for s in salidas) >= max(os.path.getmtime(e) for e in entradas)
+
+
+def escribir_atomico(ruta, contenido):
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+
+# ============================================================
+# TRABAJO POR CARPETA (SE EJECUTA EN UN PROCESO DEL POOL)
+# ============================================================
+
+def procesar_carpeta(carpeta, destino, plantilla_path=PLANTILLA_PATH, forzar=False, formatos=()):
+    """
+    Genera los reportes de una carpeta y devuelve un resumen serializable a JSON.
+    Si ya hay una salida anterior solo se reescriben las filas que cambiaron
+    (salvo con `forzar`, que las regenera completas). `formatos` ("csv",
+    "parquet", "json") son los de los archivos de datos de cada reporte.
+    """
+    inicio = time.perf_counter()
+    archivos = archivos_de(carpeta)
+    clasificados = clasificar_archivos(archivos)
+    hojas = reportes_disponibles(clasificados)
+
+    resumen = {
+        "carpeta": carpeta, "destino": destino, "reportes": {}, "etapas": {}, "errores": {}, "avisos": [], "validaciones": {}, "filas_cambiadas": {}, "omitida": False,
+    }
+    salidas = {hoja: os.path.join(destino, NOMBRES_SALIDA[hoja]) for hoja in hojas}
+    if len(hojas) == len(REPORTES):
+        salidas["FINAL"] = os.path.join(destino, NOMBRES_SALIDA["FINAL"])
+    datos = {
+        (hoja, formato): os.path.splitext(salidas[hoja])[0] + FORMATOS[formato] for hoja in hojas for formato in formatos
+    }
+
+    if not hojas:
+        resumen["errores"]["carpeta"] = "No se reconoció ningún conjunto completo de archivos."
+    elif not forzar and esta_al_dia(archivos + [Path(plantilla_path)], list(salidas.values()) + list(datos.values())):
+        resumen["omitida"] = True
+    else:
+        os.makedirs(destino, exist_ok=True)
+        generados = {}
+        for hoja in hojas:
+            t = time.perf_counter()
+            try:
+                anterior = salidas[hoja] if not forzar and os.path.exists(salidas[hoja]) else None
+                resultado = generar_reporte(hoja, clasificados, plantilla_path, anterior=anterior)
+                resumen["etapas"][hoja] = resultado["etapas"]
+                resumen["validaciones"][hoja] = resultado["validaciones"]
+                resumen["filas_cambiadas"][hoja] = resultado["filas_cambiadas"]
+                generados[hoja] = resultado["contenido"]
+                escribir_atomico(salidas[hoja], generados[hoja])
+                for formato in formatos:
+                    escribir_atomico(datos[(hoja, formato)], serializar_tabla(resultado["tabla"], formato))
+                resumen["reportes"][hoja] = round(time.perf_counter() - t, 3)
+                resumen["avisos"].extend(resultado["avisos"])
+            except Exception as e:
+                resumen["errores"][hoja] = str(e)
+
+        if "FINAL" in salidas and len(generados) == len(REPORTES):
+            t = time.perf_counter()
+            try:
+                final = generar_final(generados, plantilla_path)
+                resumen["etapas"]["FINAL"] = final["etapas"]
+                escribir_atomico(salidas["FINAL"], final["contenido"])
+                resumen["reportes"]["FINAL"] = round(time.perf_counter() - t, 3)
+            except Exception as e:
+                resumen["errores"]["FINAL"] = str(e)
+
+    resumen["segundos"] = round(time.perf_counter() - inicio, 3)
+    return resumen
+
+
+# ============================================================
+# PROGRAMA PRINCIPAL
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los reportes PE para cada carpeta de entrada.")
+    parser.add_argument("entradas", help="Carpeta raíz con una subcarpeta por región / ronda")
+    parser.add_argument("--salida", required=True, help="Carpeta donde se escriben los reportes")
+    parser.add_argument("--plantilla", default=PLANTILLA_PATH, help="Plantilla base (.xlsx)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos en paralelo")
+    parser.add_argument("--resumen", help="Ruta del resumen JSON (por defecto SALIDA/resumen.json)")
+    parser.add_argument("--forzar", action="store_true", help="Regenerar aunque las salidas estén al día")
+    parser.add_argument("--datos", default="", help="Escribir también los datos de cada reporte (csv,parquet,json)")
+    args = parser.parse_args(argv)
+    try:
+        formatos = leer_formatos(args.datos)
+    except ValueError as e:
+        parser.error(str(e))
+
+    inicio = time.perf_counter()
+    carpetas = buscar_carpetas(args.entradas, excluir=args.salida)
+    resultados = []
+
+    with crear_ejecutor(max_workers=max(1, args.workers)) as ejecutor:
+        futuros = {}
+        for carpeta in carpetas:
+            destino = os.path.join(args.salida, os.path.relpath(carpeta, args.entradas))
+            futuros[ejecutor.submit(procesar_carpeta, carpeta, destino, args.plantilla, args.forzar, formatos)] = carpeta
+
+        for futuro in as_completed(futuros):
+            try:
+                resumen = futuro.result()
+            except Exception as e:
+                resumen = {"carpeta": futuros[futuro], "errores": {"carpeta": str(e)}, "omitida": False}
+            resultados.append(resumen)
+
+            if resumen["errores"]:
+                print(f"❌ {resumen['carpeta']}: {resumen['errores']}")
+            elif resumen["omitida"]:
+                print(f"⏭️  {resumen['carpeta']}: al día, se omite")
+            else:
+                print(f"✅ {resumen['carpeta']} ({resumen['segundos']} s)")
+
+    resultados.sort(key=lambda r: r["carpeta"])
+    fallidas = sum(1 for r in resultados if r["errores"])
+    resumen_total = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "workers": args.workers,
+        "carpetas": len(resultados),
+        "generadas": sum(1 for r in resultados if not r["omitida"] and not r["errores"]),
+        "omitidas": sum(1 for r in resultados if r["omitida"]),
+        "fallidas": fallidas,
+        "detalle": resultados,
+    }
+
+    ruta_resumen = args.resumen or os.path.join(args.salida, "resumen.json")
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_resumen)), exist_ok=True)
+    with open(ruta_resumen, "w", encoding="utf-8") as f:
+        json.dump(resumen_total, f, ensure_ascii=False, indent=2)
+    print(f"📄 Resumen: {ruta_resumen}")
+
+    return 1 if fallidas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Carpetas privadas: caché en disco (tablas en Parquet) y artefactos
+
+import os
+import stat
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import funciones_artefactos
+import funciones_cache
+import funciones_directorios
+from funciones_errores import DirectorioInseguro
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    carpeta = tmp_path / "cache"
+    monkeypatch.setattr(funciones_cache, "CACHE_DIR", str(carpeta))
+    funciones_cache.limpiar_cache()
+    yield carpeta
+    funciones_cache.limpiar_cache()
+
+
+def test_la_carpeta_se_crea_privada(cache):
+    df = pd.DataFrame({"Sede": pd.Categorical(["A", "B"]), "n": [1, 2]})
+    funciones_cache.cargar_con_cache("prueba", BytesIO(b"x"), lambda f: df)
+    assert stat.S_IMODE(os.stat(cache).st_mode) == 0o700
+    funciones_cache.limpiar_cache()
+    leido = funciones_cache.cargar_con_cache("prueba", BytesIO(b"x"), lambda f: pytest.fail("no usó el disco"))
+    pd.testing.assert_frame_equal(leido, df)
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="permisos POSIX")
+def test_carpeta_abierta_a_otros_se_cierra(tmp_path):
+    carpeta = tmp_path / "abierta"
+    carpeta.mkdir(mode=0o777)
+    os.chmod(carpeta, 0o777)
+    funciones_directorios.directorio_privado(carpeta)
+    assert stat.S_IMODE(os.stat(carpeta).st_mode) == 0o700
+
+
+def test_artefactos_en_carpeta_privada(tmp_path, monkeypatch):
+    carpeta = tmp_path / "artefactos"
+    monkeypatch.setattr(funciones_artefactos, "ARTEFACTOS_DIR", str(carpeta))
+    clave = funciones_artefactos.guardar_artefacto(b"libro")
+    assert stat.S_IMODE(os.stat(carpeta).st_mode) == 0o700
+    assert funciones_artefactos.leer_artefacto(clave) == b"libro"
+
+
+def test_enlace_no_se_acepta_como_carpeta(tmp_path):
+    destino = tmp_path / "destino"
+    destino.mkdir()
+    enlace = tmp_path / "enlace"
+    enlace.symlink_to(destino)
+    with pytest.raises(DirectorioInseguro):
+        funciones_directorios.directorio_privado(enlace)
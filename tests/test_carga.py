@@ -0,0 +1,19 @@
+# Lectores de Excel: calamine devuelve las celdas como openpyxl
+
+import sys
+import types
+
+from funciones_carga import LECTORES
+
+
+def test_calamine_entrega_enteros_y_vacios_como_openpyxl(monkeypatch):
+    filas = [["Sede Operativa", "Local", "Inventario en campo"], [123.0, "", 4.5], [True, 7.0, ""]]
+    hoja = types.SimpleNamespace(to_python=lambda skip_empty_area: filas)
+    libro = types.SimpleNamespace(get_sheet_by_index=lambda i: hoja)
+    monkeypatch.setitem(sys.modules, "python_calamine", types.SimpleNamespace(load_workbook=lambda f: libro))
+
+    leidas = list(LECTORES["calamine"]("archivo.xlsx"))
+    assert leidas[1] == (123, None, 4.5)
+    assert type(leidas[1][0]) is int
+    assert leidas[2] == (True, 7, None)
+    assert type(leidas[2][0]) is bool
@@ -0,0 +1,62 @@
+# Cola de trabajos: despacho, pool que no acepta trabajos y precargas aparte
+
+from concurrent.futures import Future
+
+import pytest
+
+import funciones_cola
+
+
+class _PoolCerrado:
+    def submit(self, *args):
+        raise RuntimeError("cannot schedule new futures after interpreter shutdown")
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class _PoolManual:
+    """Pool que no ejecuta nada: los trabajos terminan cuando el test lo indica."""
+
+    def __init__(self):
+        self.enviados = []
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        self.enviados.append((args, futuro))
+        return futuro
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_trabajo_que_no_se_puede_enviar_falla_y_libera_su_lugar(monkeypatch):
+    monkeypatch.setattr(funciones_cola, "crear_ejecutor", lambda procesos: _PoolCerrado())
+    cola = funciones_cola.ColaTrabajos(procesos=1, limite=5)
+
+    trabajo, nuevo = cola.enviar("clave", "OP1", print)
+    assert nuevo and trabajo.listo.is_set()
+    with pytest.raises(RuntimeError):
+        trabajo.esperar(0)
+    assert cola.resumen()["en_proceso"] == 0
+
+    # Sin quedar en _activos: el mismo pedido crea un trabajo nuevo
+    otro, nuevo = cola.enviar("clave", "OP1", print)
+    assert nuevo and otro is not trabajo
+
+
+def test_precargas_no_ocupan_el_lugar_de_los_reportes(monkeypatch):
+    pool = _PoolManual()
+    monkeypatch.setattr(funciones_cola, "crear_ejecutor", lambda procesos: pool)
+    cola = funciones_cola.ColaTrabajos(procesos=1, limite=1, limite_precarga=2)
+
+    for i in range(3):  # una al pool y dos esperando: la cola de precargas está llena
+        cola.enviar(f"precarga-{i}", "precarga", print, i, especulativo=True)
+    with pytest.raises(funciones_cola.ColaLlena):
+        cola.enviar("precarga-3", "precarga", print, 3, especulativo=True)
+
+    # El reporte se admite igual y pasa delante de las precargas que esperan
+    reporte, _ = cola.enviar("reporte", "OP1", print, "op1")
+    assert cola.estado(reporte)["posicion"] == 1
+    pool.enviados[0][1].set_result(None)
+    assert pool.enviados[-1][0] == ("op1",)
@@ -0,0 +1,197 @@
+# Escritores del libro: el parche del XML da lo mismo que openpyxl
+
+import re
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+import funciones_artefactos
+import funciones_cache
+import funciones_escritura
+from benchmark.datos import generar_conjunto
+from funciones_asistencia import construir_asistencia
+from funciones_llenado import compilar_especificacion, dato, formula
+from funciones_op1 import construir_op1
+from funciones_op2 import construir_op2
+from funciones_plantilla import obtener_plantilla
+
+
+CONSTRUCTORES = {
+    "ASISTENCIA": (construir_asistencia, ["asc", "nom", "acc"]),
+    "OP1": (construir_op1, ["asc_fa", "asc_inst", "nom_inst"]),
+    "OP2": (construir_op2, ["acc_fa", "acc_inst"]),
+}
+
+
+@pytest.fixture(autouse=True)
+def carpetas(tmp_path, monkeypatch):
+    monkeypatch.setattr(funciones_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(funciones_artefactos, "ARTEFACTOS_DIR", str(tmp_path / "artefactos"))
+
+
+@pytest.fixture(scope="module")
+def rutas(tmp_path_factory):
+    return generar_conjunto(str(tmp_path_factory.mktemp("datos")), 4, 60, 1)
+
+
+def _celdas(contenido):
+    """{coordenada: (fórmula o valor, valor en caché, estilo)} de la primera hoja."""
+    formulas = load_workbook(BytesIO(contenido)).worksheets[0]
+    calculados = load_workbook(BytesIO(contenido), data_only=True).worksheets[0]
+    celdas = {}
+    for fila, fila_calculada in zip(formulas.iter_rows(), calculados.iter_rows()):
+        for c, calculada in zip(fila, fila_calculada):
+            if c.value is None and not c.has_style:
+                continue
+            estilo = (c.number_format, *map(repr, (c.font, c.fill, c.border, c.alignment, c.protection)))
+            celdas[c.coordinate] = (c.value, calculada.value, estilo)
+    return celdas
+
+
+def _formatos(contenido):
+    """Formato condicional de la primera hoja: rango, fórmula y relleno de cada regla."""
+    ws = load_workbook(BytesIO(contenido)).worksheets[0]
+    return sorted(
+        (str(rango.sqref), regla.operator, tuple(regla.formula), regla.dxf.fill.fgColor.rgb)
+        for rango in ws.conditional_formatting for regla in rango.rules
+    )
+
+
+def _recalcula_al_abrir(contenido):
+    with zipfile.ZipFile(BytesIO(contenido)) as zf:
+        return 'fullCalcOnLoad="1"' in zf.read("xl/workbook.xml").decode("utf-8")
+
+
+def _assert_iguales(xml, opx):
+    a, b = _celdas(xml), _celdas(opx)
+    distintas = {k: (a.get(k), b.get(k)) for k in a.keys() | b.keys() if a.get(k) != b.get(k)}
+    assert not distintas, list(distintas.items())[:5]
+    assert _formatos(xml) == _formatos(opx)
+    assert _recalcula_al_abrir(xml) == _recalcula_al_abrir(opx)
+
+
+def _sin_openpyxl(*args):
+    raise AssertionError("se usó openpyxl en vez del parche del XML")
+
+
+@pytest.mark.parametrize("hoja", list(CONSTRUCTORES))
+def test_cada_hoja_igual_con_ambos_escritores(hoja, rutas, monkeypatch):
+    construir, entradas = CONSTRUCTORES[hoja]
+
+    def generar(escritor):
+        monkeypatch.setattr(funciones_escritura, "ESCRITOR", escritor)
+        plantilla = BytesIO(_a_compartidas(obtener_plantilla(hoja, rutas["plantilla"]).getvalue()))
+        out, _, detalle = construir(plantilla, *[rutas[k] for k in entradas])
+        return out.getvalue(), detalle
+
+    with monkeypatch.context() as m:
+        m.setattr(funciones_escritura, "_escribir_openpyxl", _sin_openpyxl)
+        xml, detalle_xml = generar("xml")
+    opx, detalle_opx = generar("openpyxl")
+
+    _assert_iguales(xml, opx)
+    assert detalle_xml["validaciones"] == detalle_opx["validaciones"]
+    pd.testing.assert_frame_equal(detalle_xml["tabla"], detalle_opx["tabla"])
+
+
+# ============================================================
+# PLANTILLA HECHA A MANO: CADENAS EN LÍNEA Y CELDAS QUE FALTAN
+# ============================================================
+
+ESPEC = compilar_especificacion({
+    "hoja": "H",
+    "claves": ["A"],
+    "normalizar": lambda v: v,  # sin normalizar: un texto mal leído no encuentra su clave
+    "columnas": {
+        "B": dato("f", "n"),
+        "C": formula("=B{r}*2"),
+        "D": formula('=IF(C{r}>2,"OK","ERR")'),
+    },
+    "validaciones": ["D"],
+})
+
+
+def _a_compartidas(contenido, en_linea=()):
+    """Pasa los textos en línea a la tabla de cadenas compartidas (salvo las celdas `en_linea`).
+
+    openpyxl escribe los textos en línea; las plantillas hechas en Excel usan sharedStrings.
+    """
+    with zipfile.ZipFile(BytesIO(contenido)) as zo:
+        partes = {i.filename: zo.read(i.filename) for i in zo.infolist()}
+    cadenas = []
+
+    def compartir(m):
+        if m.group(1) in en_linea:
+            return m.group(0)
+        cadenas.append(m.group(3))
+        return f'<c r="{m.group(1)}"{m.group(2)} t="s"><v>{len(cadenas) - 1}</v></c>'
+
+    celda = re.compile(r'<c r="([A-Z]+\d+)"((?:\s+s="\d+")?)\s+t="inlineStr"><is><t[^>]*>([^<]*)</t></is></c>')
+    for nombre in [n for n in partes if n.startswith("xl/worksheets/sheet")]:
+        partes[nombre] = celda.sub(compartir, partes[nombre].decode("utf-8")).encode("utf-8")
+    assert cadenas and "xl/sharedStrings.xml" not in partes
+    partes["xl/sharedStrings.xml"] = (
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        + "".join(f'<si><t xml:space="preserve">{t}</t></si>' for t in cadenas) + "</sst>"
+    ).encode("utf-8")
+    partes["[Content_Types].xml"] = partes["[Content_Types].xml"].replace(b"</Types>", (
+        '<Override PartName="/xl/sharedStrings.xml" ContentType='
+        '"application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'
+    ).encode("utf-8"))
+    partes["xl/_rels/workbook.xml.rels"] = partes["xl/_rels/workbook.xml.rels"].replace(b"</Relationships>", (
+        '<Relationship Id="rIdCadenas" Target="sharedStrings.xml" Type='
+        '"http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>'
+    ).encode("utf-8"))
+
+    final = BytesIO()
+    with zipfile.ZipFile(final, "w", zipfile.ZIP_DEFLATED) as zd:
+        for nombre, datos in partes.items():
+            zd.writestr(nombre, datos)
+    return final.getvalue()
+
+
+def _plantilla():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "H"
+    ws.append(["Sede", "Cantidad", "Doble", "Estado"])
+    ws["A2"] = "Lima"                       # texto en línea; B2 con estilo, C y D no existen
+    ws["B2"].font = Font(bold=True)
+    ws["B2"].number_format = "0.00"
+    ws["A3"] = "Cusco"                      # texto compartido, sin otras celdas
+    ws["B4"] = "sin clave"                  # fila sin clave: no se toca
+    ws["A6"] = " PIURA "                    # en línea; la fila 5 no existe en la plantilla
+    ws["D6"] = "viejo"
+    ws["A7"] = "Tacna"                      # clave que no está en los datos: 0
+    out = BytesIO()
+    wb.save(out)
+    contenido = _a_compartidas(out.getvalue(), en_linea={"A2", "A6"})
+
+    with zipfile.ZipFile(BytesIO(contenido)) as zf:
+        hoja = zf.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert hoja.count('t="inlineStr"') == 2 and hoja.count('t="s"') == 8 and '<row r="5"' not in hoja
+    return contenido
+
+
+def test_cadenas_en_linea_y_celdas_ausentes_igual_con_ambos_escritores():
+    plantilla = _plantilla()
+    fuentes = {"f": pd.DataFrame({"n": [1, 2, 3, 9]}, index=["Lima", "Cusco", " PIURA ", "Otra"])}
+
+    xml, _, llenado_xml, valores_xml = funciones_escritura._escribir_xml(BytesIO(plantilla), ESPEC, fuentes)
+    opx, _, llenado_opx, valores_opx = funciones_escritura._escribir_openpyxl(BytesIO(plantilla), ESPEC, fuentes)
+
+    assert llenado_xml == llenado_opx
+    assert llenado_xml["filas"] == [2, 3, 6, 7]
+    assert valores_xml == valores_opx
+    _assert_iguales(xml, opx)
+
+    ws = load_workbook(BytesIO(xml), data_only=True)["H"]
+    assert [(ws[f"B{r}"].value, ws[f"C{r}"].value, ws[f"D{r}"].value) for r in (2, 3, 6, 7)] == [
+        (1, 2, "ERR"), (2, 4, "OK"), (3, 6, "OK"), (0, 0, "ERR"),
+    ]
+    assert (ws["A2"].value, ws["A6"].value, ws["B4"].value) == ("Lima", " PIURA ", "sin clave")
+    assert ws["B2"].font.bold and ws["B2"].number_format == "0.00"
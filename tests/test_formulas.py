@@ -0,0 +1,295 @@
+# Cálculo de fórmulas en Python: cada operador y función soportados, con
+# celdas vacías, textos y errores como los trata Excel
+
+import re
+import zipfile
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from funciones_formulas import ErrorExcel, calcular_valores, guardar_con_valores, xml_celda
+
+
+def calcular(formula, **celdas):
+    """Valor de `formula` escrita en Z2, con las celdas de la fila 2 dadas (A=..., B=...)."""
+    columnas = {ord(letra) - 64: [(2, valor)] for letra, valor in celdas.items()}
+    columnas[26] = [(2, formula)]
+    valores, completo = calcular_valores(columnas, 2, "X")
+    return valores.get((2, "Z")) if completo else "sin calcular"
+
+
+def test_referencia_a_celda_vacia_vale_cero():
+    valores, completo = calcular_valores({1: [(2, "=B2")]}, 2, "X")
+    assert completo
+    assert valores[(2, "A")] == 0.0
+    assert not isinstance(valores[(2, "A")], ErrorExcel)
+
+
+def test_rama_de_if_con_celda_vacia_y_formula_que_depende_de_ella():
+    columnas = {1: [(2, "=IF(C2>0,B2,1)"), (3, "=A2+1")], 3: [(2, 5.0)]}
+    valores, completo = calcular_valores(columnas, 3, "X")
+    assert completo
+    assert valores[(2, "A")] == 0.0
+    assert valores[(3, "A")] == 1.0
+
+
+def test_valor_en_cache_de_celda_vacia_no_es_error():
+    valores, _ = calcular_valores({18: [(2, "=P2")]}, 2, "OP2")
+    xml = xml_celda("R", 2, "", valores[(2, "R")], "P2")
+    assert xml == '<c r="R2"><f>P2</f><v>0</v></c>'
+
+
+# ============================================================
+# ARITMÉTICA
+# ============================================================
+
+@pytest.mark.parametrize("formula, esperado", [
+    ("=A2+B2", 5.0),
+    ("=A2-B2", 1.0),
+    ("=A2*B2", 6.0),
+    ("=A2/B2", 1.5),
+    ("=A2^B2", 9.0),
+    ("=-A2", -3.0),
+    ("=+A2", 3.0),
+    ("=A2+B2*2", 7.0),
+    ("=(A2+B2)*2", 10.0),
+    ("=2^3^2", 64.0),     # ^ se evalúa de izquierda a derecha
+    ("=-2^2", 4.0),       # el signo se aplica antes que ^
+    ("=10-2-3", 5.0),
+    ("=1.5E2+0.5", 150.5),
+])
+def test_operadores_aritmeticos(formula, esperado):
+    assert calcular(formula, A=3, B=2) == esperado
+
+
+def test_referencias_absolutas_y_a_la_misma_hoja():
+    columnas = {1: [(1, 10), (2, 3)], 26: [(2, "=$A$1*A2"), (3, "='X'!A2+X!A1")]}
+    valores, completo = calcular_valores(columnas, 3, "X")
+    assert completo
+    assert valores[(2, "Z")] == 30.0
+    assert valores[(3, "Z")] == 13.0
+
+
+def test_celda_vacia_vale_cero_en_aritmetica():
+    assert calcular("=A2+1") == 1.0
+    assert calcular("=A2*5") == 0.0
+
+
+def test_texto_numerico_se_convierte_y_el_resto_da_value():
+    assert calcular("=A2+1", A="3") == 4.0
+    assert calcular("=A2+1", A="abc") == "#VALUE!"
+    assert isinstance(calcular("=A2+1", A="abc"), ErrorExcel)
+
+
+def test_logicos_valen_uno_y_cero():
+    assert calcular("=TRUE+1") == 2.0
+    assert calcular("=A2*10", A=False) == 0.0
+
+
+def test_division_por_cero_y_por_celda_vacia():
+    assert calcular("=A2/0", A=1) == "#DIV/0!"
+    assert calcular("=A2/B2", A=1) == "#DIV/0!"
+    assert isinstance(calcular("=A2/B2", A=1), ErrorExcel)
+
+
+def test_resultados_no_finitos_dan_num():
+    assert calcular("=10^400") == "#NUM!"
+    assert calcular("=(0-8)^0.5") == "#NUM!"
+
+
+def test_errores_se_propagan_y_gana_el_primero():
+    assert calcular("=A2+1", A=ErrorExcel("#N/A")) == "#N/A"
+    assert calcular("=A2/0+B2", B=ErrorExcel("#N/A")) == "#DIV/0!"
+    assert calcular("=B2+A2/0", B=ErrorExcel("#N/A")) == "#N/A"
+    assert calcular("=-A2", A=ErrorExcel("#REF!")) == "#REF!"
+
+
+def test_constante_de_texto_con_comillas():
+    assert calcular('="a""b"') == 'a"b'
+
+
+# ============================================================
+# COMPARACIONES
+# ============================================================
+
+@pytest.mark.parametrize("formula, esperado", [
+    ("=A2=B2", False),
+    ("=A2<>B2", True),
+    ("=A2<B2", False),
+    ("=A2>B2", True),
+    ("=A2<=B2", False),
+    ("=A2>=B2", True),
+    ("=A2>=3", True),
+    ("=A2+1>B2*2", False),   # la comparación va después de la aritmética
+])
+def test_comparaciones_numericas(formula, esperado):
+    assert calcular(formula, A=3, B=2) is esperado
+
+
+def test_textos_sin_distinguir_mayusculas():
+    assert calcular("=A2=B2", A="Lima", B="LIMA") is True
+    assert calcular('=A2<"b"', A="A") is True
+
+
+def test_orden_entre_tipos_numero_texto_logico():
+    assert calcular('=A2<"0"', A=100) is True
+    assert calcular('="z"<TRUE') is True
+    assert calcular("=A2=B2", A=1, B=True) is False
+
+
+def test_celda_vacia_toma_el_tipo_del_otro_lado():
+    assert calcular("=A2=0") is True
+    assert calcular('=A2=""') is True
+    assert calcular("=A2=FALSE") is True
+    assert calcular("=A2=B2") is True
+    assert calcular("=A2<1") is True
+
+
+def test_comparacion_con_error_da_el_error():
+    assert calcular("=A2=1", A=ErrorExcel("#N/A")) == "#N/A"
+
+
+# ============================================================
+# FUNCIONES
+# ============================================================
+
+def test_if_con_dos_y_tres_argumentos():
+    assert calcular('=IF(A2>0,"OK","ERR")', A=1) == "OK"
+    assert calcular('=IF(A2>0,"OK","ERR")', A=0) == "ERR"
+    assert calcular("=IF(A2>0,10)", A=0) is False
+    assert calcular("=IF(A2,1,2)", A=5) == 1.0
+
+
+def test_if_con_condicion_vacia_texto_o_error():
+    assert calcular("=IF(A2,1,2)") == 2.0
+    assert calcular("=IF(A2,1,2)", A="sí") == "#VALUE!"
+    assert calcular("=IF(A2,1,2)", A=ErrorExcel("#DIV/0!")) == "#DIV/0!"
+
+
+def test_if_solo_propaga_el_error_de_la_rama_elegida():
+    assert calcular("=IF(A2>0,B2,1/0)", A=1, B=7) == 7.0
+    assert calcular("=IF(A2>0,B2,1/0)", A=0, B=7) == "#DIV/0!"
+
+
+@pytest.mark.parametrize("valor, esperado", [(3, True), (2, False), (2.9, False), (-3, True), (None, False), (True, True)])
+def test_isodd(valor, esperado):
+    assert calcular("=ISODD(A2)", A=valor) is esperado
+
+
+def test_isodd_de_texto_no_numerico():
+    assert calcular("=ISODD(A2)", A="x") == "#VALUE!"
+
+
+@pytest.mark.parametrize("formula, esperado", [
+    ("=ROUND(2.5,0)", 3.0),
+    ("=ROUND(-2.5,0)", -3.0),
+    ("=ROUND(1.234,2)", 1.23),
+    ("=ROUND(1.235,2)", 1.24),
+    ("=ROUND(1234,-2)", 1200.0),
+    ("=ROUND(A2/3,1)", 3.3),
+    ("=ROUND(A2,0)", 10.0),
+])
+def test_round(formula, esperado):
+    assert calcular(formula, A=10) == pytest.approx(esperado)
+
+
+def test_round_de_error_o_texto():
+    assert calcular("=ROUND(1/0,2)") == "#DIV/0!"
+    assert calcular("=ROUND(A2,2)", A="x") == "#VALUE!"
+
+
+# ============================================================
+# DEPENDENCIAS ENTRE CELDAS Y LO QUE NO SE CALCULA
+# ============================================================
+
+def test_formulas_que_dependen_de_otras_columnas_y_de_su_propia_columna():
+    columnas = {
+        1: [(1, 5), (2, "=A1+1"), (3, "=A2+1")],   # acumula sobre su propia columna
+        2: [(3, "=A3*2")],
+        3: [(3, "=B3-A3")],
+    }
+    valores, completo = calcular_valores(columnas, 3, "X")
+    assert completo
+    assert (valores[(2, "A")], valores[(3, "A")], valores[(3, "B")], valores[(3, "C")]) == (6.0, 7.0, 14.0, 7.0)
+
+
+def test_referencia_fuera_de_la_hoja_es_vacia():
+    assert calcular("=A9+1") == 1.0
+
+
+@pytest.mark.parametrize("formula", [
+    "=SUM(A2:B2)",     # rangos y funciones no soportadas
+    "=A2&B2",          # concatenación
+    "=Otra!A2",        # otra hoja
+    "=IF(A2)",         # cantidad de argumentos
+])
+def test_formulas_no_soportadas_quedan_sin_calcular(formula):
+    assert calcular(formula, A=1, B=2) == "sin calcular"
+
+
+def test_referencia_circular_queda_sin_calcular():
+    valores, completo = calcular_valores({1: [(2, "=B2")], 2: [(2, "=A2")]}, 2, "X")
+    assert not completo
+    assert valores == {}
+
+
+def test_referencia_a_una_fecha_queda_sin_calcular():
+    assert calcular("=A2+1", A=datetime(2024, 1, 1)) == "sin calcular"
+
+
+def test_solo_queda_sin_calcular_lo_que_depende_de_lo_no_soportado():
+    valores, completo = calcular_valores({1: [(2, "=SUM(C2:D2)")], 2: [(2, "=A2+1")], 3: [(2, "=5*2")]}, 2, "X")
+    assert not completo
+    assert valores == {(2, "C"): 10.0}
+
+
+# ============================================================
+# VALORES EN EL XML Y RECÁLCULO AL ABRIR
+# ============================================================
+
+@pytest.mark.parametrize("valor, xml", [
+    (2.0, '<c r="A2" s="1"><f>X</f><v>2</v></c>'),
+    (0.25, '<c r="A2" s="1"><f>X</f><v>0.25</v></c>'),
+    (True, '<c r="A2" s="1" t="b"><f>X</f><v>1</v></c>'),
+    ("a<b", '<c r="A2" s="1" t="str"><f>X</f><v>a&lt;b</v></c>'),
+    (ErrorExcel("#DIV/0!"), '<c r="A2" s="1" t="e"><f>X</f><v>#DIV/0!</v></c>'),
+])
+def test_xml_celda_por_tipo_de_valor(valor, xml):
+    assert xml_celda("A", 2, ' s="1" t="n"', valor, "X") == xml
+
+
+def _libro(formulas):
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"], ws["A2"] = 2, 3
+    for celda, formula in formulas.items():
+        ws[celda] = formula
+    return wb
+
+
+def _calc_pr(contenido):
+    with zipfile.ZipFile(contenido) as zf:
+        return re.search(r"<calcPr[^>]*>", zf.read("xl/workbook.xml").decode("utf-8")).group(0)
+
+
+def test_libro_completo_no_pide_recalcular_al_abrir():
+    wb = _libro({"B1": "=A1*A2", "B2": '=IF(B1>5,"OK","ERR")'})
+    contenido, valores = guardar_con_valores(wb)
+    assert wb.calculation.fullCalcOnLoad is False
+    assert 'fullCalcOnLoad="1"' not in _calc_pr(contenido)
+    assert valores["Sheet"] == {(1, "B"): 6.0, (2, "B"): "OK"}
+    ws = load_workbook(contenido, data_only=True).active
+    assert (ws["B1"].value, ws["B2"].value) == (6, "OK")
+
+
+def test_formula_sin_calcular_deja_el_recalculo_al_abrir():
+    wb = _libro({"B1": "=A1*A2", "B2": "=SUM(A1:A2)"})
+    contenido, valores = guardar_con_valores(wb)
+    assert wb.calculation.fullCalcOnLoad is True
+    assert 'fullCalcOnLoad="1"' in _calc_pr(contenido)
+    # Lo que sí se calculó queda en caché; la otra fórmula, sin valor
+    ws = load_workbook(contenido, data_only=True).active
+    assert (ws["B1"].value, ws["B2"].value) == (6, None)
+    assert valores["Sheet"] == {(1, "B"): 6.0}
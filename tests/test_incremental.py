@@ -0,0 +1,68 @@
+# Regeneración incremental: estado guardado y filas que se pueden parchear
+
+from io import BytesIO
+
+import numpy as np
+from openpyxl import Workbook, load_workbook
+
+from funciones_formulas import ErrorExcel
+from funciones_incremental import _a_json, _de_json, actualizar_libro
+
+
+def test_estado_en_json_conserva_claves_y_errores():
+    estado = {
+        "version": 2,
+        "espec": "e",
+        "plantilla": "p",
+        "parte": "xl/worksheets/sheet1.xml",
+        "filas": [2, 3],
+        "claves": [("lima", "ie 1"), ("cusco", "ie 2")],
+        "datos": {3: [np.int64(4), 2.5]},
+        "valores": {(2, "E"): ErrorExcel("#DIV/0!"), (3, "E"): 0.5, (2, "F"): "OK", (3, "F"): None},
+    }
+    leido = _de_json(_a_json(estado))
+    assert leido["claves"] == estado["claves"]
+    assert leido["datos"] == {3: [4.0, 2.5]}
+    assert leido["valores"] == estado["valores"]
+    assert isinstance(leido["valores"][(2, "E")], ErrorExcel)
+    assert not isinstance(leido["valores"][(2, "F")], ErrorExcel)
+
+
+def _libro(filas):
+    """Libro con la hoja X: {fila: {letra: valor}} (claves numéricas: sin cadenas compartidas)."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "X"
+    for fila, celdas in filas.items():
+        for letra, valor in celdas.items():
+            ws[f"{letra}{fila}"] = valor
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def _estado():
+    return {
+        "parte": "xl/worksheets/sheet1.xml",
+        "filas": [2, 3],
+        "claves": [10, 20],
+        "datos": {2: [1.0, 2.0]},
+        "valores": {(2, "C"): 2.0, (3, "C"): 4.0},
+    }
+
+
+def test_fila_completa_se_parchea():
+    filas = {2: {"A": 10, "B": 1, "C": "=B2*2"}, 3: {"A": 20, "B": 2, "C": "=B3*2"}}
+    resultado = actualizar_libro(_libro(filas), _estado(), {"hoja": "X"}, {2: [1.0, 5.0]})
+    assert resultado is not None
+    contenido, valores, cambios = resultado
+    assert cambios == [(3, 20)]
+    assert valores[(3, "C")] == 10.0
+    ws = load_workbook(BytesIO(contenido))["X"]
+    assert ws["B3"].value == 5
+
+
+def test_fila_sin_una_celda_de_datos_genera_la_hoja_completa():
+    # La fila 3 tiene clave y fórmula pero no la celda B: no se puede parchear
+    filas = {2: {"A": 10, "B": 1, "C": "=B2*2"}, 3: {"A": 20, "C": "=B3*2"}}
+    assert actualizar_libro(_libro(filas), _estado(), {"hoja": "X"}, {2: [1.0, 5.0]}) is None
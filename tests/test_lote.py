@@ -0,0 +1,12 @@
+# Procesamiento por lotes: búsqueda de carpetas de entrada
+
+from lote_pe3 import buscar_carpetas
+
+
+def test_la_carpeta_de_salida_se_omite_por_partes_de_la_ruta(tmp_path):
+    for carpeta in ["region1", "out", "out/region1", "output2", "outbox"]:
+        (tmp_path / carpeta).mkdir(exist_ok=True)
+        (tmp_path / carpeta / "ASC - POSTULANTES.xlsx").touch()
+
+    encontradas = buscar_carpetas(str(tmp_path), excluir=str(tmp_path / "out"))
+    assert sorted(encontradas) == sorted(str(tmp_path / c) for c in ["region1", "output2", "outbox"])
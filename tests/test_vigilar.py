@@ -0,0 +1,47 @@
+# Vigilancia de carpeta: el final no mezcla reportes nuevos con uno que falló
+
+import os
+
+import pytest
+
+import funciones_artefactos
+import funciones_cache
+from benchmark.datos import generar_conjunto
+from vigilar_pe3 import cargar_estado, firma_carpeta, procesar
+
+
+@pytest.fixture
+def carpetas(tmp_path, monkeypatch):
+    monkeypatch.setattr(funciones_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(funciones_artefactos, "ARTEFACTOS_DIR", str(tmp_path / "artefactos"))
+    entrada, salida = tmp_path / "entrada", tmp_path / "salida"
+    rutas = generar_conjunto(str(entrada), 3, 50, 1)
+    return str(entrada), str(salida), rutas.pop("plantilla"), rutas
+
+
+def test_final_pendiente_mientras_falla_un_reporte(carpetas, tmp_path):
+    entrada, salida, plantilla, rutas = carpetas
+    estado = procesar(entrada, salida, firma_carpeta(entrada), {}, plantilla)
+    final = os.path.join(salida, "PE - Reporte_Final.xlsx")
+    publicado = os.path.getmtime(final)
+
+    # Cambia una entrada de ASISTENCIA y la de OP1 queda ilegible
+    otras = generar_conjunto(str(tmp_path / "otras"), 3, 50, 2)
+    with open(otras["asc"], "rb") as f, open(rutas["asc"], "wb") as g:
+        g.write(f.read())
+    with open(rutas["asc_fa"], "rb") as f:
+        fa = f.read()
+    with open(rutas["asc_fa"], "wb") as f:
+        f.write(b"no es un libro")
+
+    estado = procesar(entrada, salida, firma_carpeta(entrada), estado, plantilla)
+    assert estado["regenerados"] == ["ASISTENCIA"] and list(estado["errores"]) == ["OP1"]
+    assert estado["final_pendiente"]
+    assert os.path.getmtime(final) == publicado
+
+    # Al corregirse OP1 se publica el final aunque su libro no cambie
+    with open(rutas["asc_fa"], "wb") as f:
+        f.write(fa)
+    estado = procesar(entrada, salida, firma_carpeta(entrada), cargar_estado(salida), plantilla)
+    assert not estado["errores"] and not estado["final_pendiente"]
+    assert os.path.getmtime(final) != publicado
@@ -0,0 +1,235 @@
+# vigilar_pe3.py
+# ============================================================
+# Vigilancia de una carpeta de entrada (sin Streamlit)
+#
+# Uso:
+#   python vigilar_pe3.py ENTRADA --salida SALIDA [--intervalo S] [--espera S] [--datos csv,parquet,json]
+#
+# Revisa ENTRADA cada `intervalo` segundos con os.stat (tamaño, fechas e
+# inodo de cada .xlsx; no se lee ningún archivo). Cuando algo cambia espera
+# a que la carpeta quede `espera` segundos sin cambios (las copias suelen
+# llegar en ráfagas), clasifica los archivos con las reglas de la app y
+# regenera solo los reportes cuyas entradas cambiaron, más el final si
+# cambió alguno. Si algún reporte falla, el final no se regenera (mezclaría
+# reportes nuevos con el anterior del que falló) y queda pendiente hasta
+# que todos se publiquen. Cada salida se publica en SALIDA con un
+# reemplazo atómico y al final se escribe SALIDA/estado.json, con lo que se
+# sigue desde ahí si el proceso se reinicia.
+# ============================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from funciones_artefactos import clave_combinada
+from funciones_cache import firma_archivo
+from funciones_clasificacion import clasificar_archivos, fragmentos
+from funciones_errores import ErrorReporte
+from funciones_exportacion import FORMATOS, leer_formatos, serializar_tabla
+from funciones_paralelo import NOMBRES_SALIDA, REPORTES, reportes_disponibles
+from funciones_reportes import PLANTILLA_PATH, generar_final, generar_reporte
+from lote_pe3 import archivos_de, escribir_atomico
+
+
+ARCHIVO_ESTADO = "estado.json"
+
+
+# ============================================================
+# FUNCIONES AUXILIARES
+# ============================================================
+
+def ahora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def firma_carpeta(carpeta):
+    """{ruta: firma_archivo} de los .xlsx de la carpeta (sin leer su contenido)."""
+    firmas = {}
+    for ruta in archivos_de(carpeta):
+        try:
+            firmas[ruta] = firma_archivo(ruta)
+        except FileNotFoundError:
+            pass  # se borró o se renombró mientras se listaba
+    return firmas
+
+
+def firma_reporte(hoja, clasificados, firmas, plantilla, formatos):
+    """Identifica las entradas de un reporte: cambia si cambia alguno de sus archivos o la plantilla."""
+    partes = [hoja, plantilla, *formatos]
+    for clave in REPORTES[hoja][1]:
+        for ruta in fragmentos(clasificados[clave]):
+            partes += [clave, ruta.name, firmas[ruta]]
+    return clave_combinada(*partes)
+
+
+def cargar_estado(salida):
+    """Estado de la última publicación (vacío si no hay o no se puede leer)."""
+    try:
+        with open(os.path.join(salida, ARCHIVO_ESTADO), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_estado(salida, estado):
+    escribir_atomico(
+        os.path.join(salida, ARCHIVO_ESTADO), json.dumps(estado, ensure_ascii=False, indent=2).encode("utf-8")
+    )
+
+
+# ============================================================
+# REGENERACIÓN
+# ============================================================
+
+def procesar(entrada, salida, firmas, estado, plantilla_path=PLANTILLA_PATH, formatos=()):
+    """
+    Regenera y publica los reportes cuyas entradas cambiaron respecto de
+    `estado` (lo que devuelve cargar_estado) y devuelve el estado nuevo.
+    Un reporte que falla conserva su salida anterior y se reintenta en el
+    siguiente cambio.
+    """
+    clasificados = clasificar_archivos(sorted(firmas))
+    plantilla = firma_archivo(plantilla_path)
+    publicadas = dict(estado.get("firmas", {}))
+    errores = {}
+    regenerados = []
+    os.makedirs(salida, exist_ok=True)
+
+    for hoja in reportes_disponibles(clasificados):
+        firma = firma_reporte(hoja, clasificados, firmas, plantilla, formatos)
+        if publicadas.get(hoja) == firma:
+            continue
+        destino = os.path.join(salida, NOMBRES_SALIDA[hoja])
+        t = time.perf_counter()
+        try:
+            # El libro publicado antes permite reescribir solo las filas que cambiaron
+            anterior = destino if os.path.exists(destino) else None
+            resultado = generar_reporte(hoja, clasificados, plantilla_path, anterior=anterior)
+            if resultado["filas_cambiadas"] == [] and all(
+                os.path.exists(os.path.splitext(destino)[0] + FORMATOS[f]) for f in formatos
+            ):
+                # Archivos reescritos con los mismos datos: lo publicado sigue al día
+                publicadas[hoja] = firma
+                print(f"   {hoja}: sin cambios en los datos")
+                continue
+            for formato in formatos:
+                escribir_atomico(os.path.splitext(destino)[0] + FORMATOS[formato],
+                                 serializar_tabla(resultado["tabla"], formato))
+            escribir_atomico(destino, resultado["contenido"])
+        except ErrorReporte as e:
+            errores[hoja] = str(e)
+            print(f"{hoja}: {e}")  # el mensaje ya trae su ❌
+            continue
+        except Exception as e:
+            errores[hoja] = f"Error inesperado: {e}"
+            print(f"❌ {hoja}: error inesperado: {e}")
+            continue
+        publicadas[hoja] = firma
+        regenerados.append(hoja)
+        cambios = resultado["filas_cambiadas"]
+        detalle = "completo" if cambios is None else f"{len(cambios)} filas cambiaron"
+        print(f"✅ {hoja} publicado ({round(time.perf_counter() - t, 2)} s, {detalle})")
+        for aviso in resultado["avisos"]:
+            print(f"   {aviso}")
+
+    informes = {hoja: os.path.join(salida, NOMBRES_SALIDA[hoja]) for hoja in REPORTES}
+    final = os.path.join(salida, NOMBRES_SALIDA["FINAL"])
+    pendiente = bool(regenerados or estado.get("final_pendiente"))
+    if all(os.path.exists(r) for r in informes.values()) and (pendiente or not os.path.exists(final)):
+        if errores:
+            # Mezclaría reportes nuevos con la versión anterior de los que fallaron
+            print(f"⚠️  FINAL no se regenera: falló {', '.join(errores)}; queda pendiente")
+            pendiente = True
+        else:
+            t = time.perf_counter()
+            try:
+                escribir_atomico(final, generar_final(informes, plantilla_path)["contenido"])
+                print(f"✅ FINAL publicado ({round(time.perf_counter() - t, 2)} s)")
+                pendiente = False
+            except Exception as e:
+                errores["FINAL"] = str(e)
+                print(f"❌ FINAL: {e}")
+                pendiente = True
+
+    nuevo = {
+        "fecha": ahora(),
+        "entrada": os.path.abspath(entrada),
+        "archivos": {ruta.name: clave for clave, archivos in clasificados.items()
+                     for ruta in fragmentos(archivos)},
+        "firmas": publicadas,
+        "regenerados": regenerados,
+        "errores": errores,
+        "final_pendiente": pendiente,
+    }
+    guardar_estado(salida, nuevo)
+    return nuevo
+
+
+def vigilar(entrada, salida, plantilla_path=PLANTILLA_PATH, intervalo=2.0, espera=5.0, formatos=(), ciclos=None):
+    """
+    Revisa `entrada` cada `intervalo` segundos y, tras `espera` segundos sin
+    cambios, llama a procesar. `ciclos` limita las revisiones (None: sin fin).
+    """
+    estado = cargar_estado(salida)
+    vistas = None       # firmas de la última revisión
+    procesadas = None   # firmas con las que se procesó por última vez
+    ultimo_cambio = time.monotonic()
+    plantilla = None
+    avisado = False     # ya se anunció la ráfaga de cambios en curso
+
+    ciclo = 0
+    while ciclos is None or ciclo < ciclos:
+        ciclo += 1
+        firmas = firma_carpeta(entrada)
+        firma_plantilla = firma_archivo(plantilla_path)
+        if firmas != vistas or firma_plantilla != plantilla:
+            if vistas is not None and not avisado:
+                print(f"🔔 {ahora()} cambios en {entrada}; esperando que terminen de copiarse...")
+                avisado = True
+            vistas, plantilla = firmas, firma_plantilla
+            ultimo_cambio = time.monotonic()
+        elif (firmas, plantilla) != procesadas and time.monotonic() - ultimo_cambio >= espera:
+            print(f"⚙️  {ahora()} procesando {len(firmas)} archivos")
+            estado = procesar(entrada, salida, firmas, estado, plantilla_path, formatos)
+            procesadas = (firmas, plantilla)
+            avisado = False
+            if not estado["regenerados"] and not estado["errores"]:
+                print("   nada nuevo que publicar")
+        if ciclos is None or ciclo < ciclos:
+            time.sleep(intervalo)
+    return estado
+
+
+# ============================================================
+# PROGRAMA PRINCIPAL
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenera los reportes PE cuando cambian los archivos de una carpeta.")
+    parser.add_argument("entrada", help="Carpeta donde se dejan los archivos exportados")
+    parser.add_argument("--salida", required=True, help="Carpeta donde se publican los reportes")
+    parser.add_argument("--plantilla", default=PLANTILLA_PATH, help="Plantilla base (.xlsx)")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre revisiones de la carpeta")
+    parser.add_argument("--espera", type=float, default=5.0, help="Segundos sin cambios antes de regenerar")
+    parser.add_argument("--datos", default="", help="Publicar también los datos de cada reporte (csv,parquet,json)")
+    args = parser.parse_args(argv)
+    try:
+        formatos = leer_formatos(args.datos)
+    except ValueError as e:
+        parser.error(str(e))
+    if not os.path.isdir(args.entrada):
+        parser.error(f"No existe la carpeta de entrada: {args.entrada}")
+
+    print(f"👀 Vigilando {args.entrada} → {args.salida} (Ctrl+C para terminar)")
+    try:
+        vigilar(args.entrada, args.salida, args.plantilla, args.intervalo, args.espera, formatos)
+    except KeyboardInterrupt:
+        print("👋 Vigilancia detenida")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())